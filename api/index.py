@@ -1,36 +1,104 @@
 import sys
 import os
 import json
+import time
+import logging
+from http.server import BaseHTTPRequestHandler
 
-# প্রজেক্টের রুট ডিরেক্টরি path-এ যোগ করুন যাতে bot.py import করা যায়
+# মডিউল লোডের সময় শুধু stdlib; telegram, psycopg2 ও হ্যান্ডলার মডিউল প্রথম আপডেটে লোড হয়
+_MODULE_START = time.perf_counter()
+
+# প্রজেক্টের রুট ডিরেক্টরি path-এ যোগ করুন যাতে bot.py import করা যায়
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# আপনার bot.py ফাইল থেকে application অবজেক্টটি import করুন
-from bot import application
-
-# Vercel-এর অনুরোধ হ্যান্ডেল করার জন্য হ্যান্ডলার ফাংশন
-async def handler(request, response):
-    """
-    Vercel serverless function entry point.
-    Handles incoming webhook requests from Telegram.
-    """
-    try:
-        # Vercel-এর request অবজেক্ট থেকে body ডেটা পড়ুন
-        body_bytes = await request.body()
-        body_str = body_bytes.decode('utf-8')
-        
-        # JSON ডেটা পার্স করুন
-        update_json = json.loads(body_str)
-        
-        # python-telegram-bot লাইব্রেরিকে আপডেটটি দিন
-        await application.update_webhook_request(update_json)
-        
-        # Telegram-কে জানান যে অনুরোধটি সফল হয়েছে
-        response.set_status(200)
-        return response
-        
-    except Exception as e:
-        # যদি কোনো সমস্যা হয়, তা Vercel লগে দেখান
-        print(f"Error handling request: {e}")
-        response.set_status(500) # Internal Server Error
-        return response
+logger = logging.getLogger(__name__)
+
+# --- সার্ভারলেস এন্ট্রি পয়েন্ট (Vercel) ---
+# একটি ওয়ার্ম কন্টেইনারে মডিউলটি লোডেড থাকে, তাই ইভেন্ট লুপ, Application এবং
+# db_handler-এর কানেকশন পুল মডিউল-লেভেল ভেরিয়েবলে রেখে পরের রিকোয়েস্টে আবার ব্যবহার হয়।
+# মাইগ্রেশন এখানে চলে না (release ধাপে `python manage.py migrate`)। post_init চলে না, তাই প্রতিটি আপডেটের
+# আগে bot.serverless_warmup() ইন-মেমরি স্টেট (রেফারেল গ্রাফ, TrxID ফিল্টার) গরম রাখে; /broadcast এখানে বন্ধ,
+# আর পর্যায়ক্রমিক জবগুলো ক্রনে manage.py দিয়ে চালাতে হয় (bot.py-র serverless_warmup-এর মন্তব্য দেখুন)।
+_loop = None
+_application = None
+_timings = {}
+
+
+def _get_loop():
+    global _loop
+    import asyncio
+
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+async def get_application():
+    """প্রথম কলে bot ইম্পোর্ট করে Application তৈরি ও initialize করে; পরে একই অবজেক্ট দেয়।"""
+    global _application
+    if _application is not None:
+        return _application
+
+    started = time.perf_counter()
+    import bot
+    imported = time.perf_counter()
+    application = bot.build_application(serverless=True)
+    built = time.perf_counter()
+    await application.initialize()
+    initialized = time.perf_counter()
+
+    _timings.update({
+        'import_ms': (imported - started) * 1000,
+        'build_ms': (built - imported) * 1000,
+        'initialize_ms': (initialized - built) * 1000,
+    })
+    logger.info(f"Serverless cold start: {_timings}")
+    _application = application
+    return _application
+
+
+async def process_webhook_payload(payload):
+    """একটি Telegram আপডেট সম্পূর্ণ প্রসেস করে, রেসপন্সের আগেই persistence লিখে ফেলে।"""
+    from telegram import Update
+
+    application = await get_application()
+    import bot
+    await bot.serverless_warmup()
+    update = Update.de_json(payload, application.bot)
+    await application.process_update(update)
+    # রেসপন্সের পর কন্টেইনার ফ্রিজ হতে পারে, তাই ব্যাকগ্রাউন্ডে লেখার উপর ভরসা করা যায় না
+    await application.persistence.write_through(application)
+
+
+class handler(BaseHTTPRequestHandler):
+    """Vercel Python রানটাইমের HTTP হ্যান্ডলার।"""
+
+    def do_POST(self):
+        cold = _application is None
+        started = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+            _get_loop().run_until_complete(process_webhook_payload(payload))
+            status = 200
+        except Exception as e:
+            # যদি কোনো সমস্যা হয়, তা Vercel লগে দেখান; 500 পেলে Telegram পরে আবার পাঠাবে
+            logger.error(f"Error handling request: {e}")
+            status = 500
+
+        if cold:
+            _timings['first_request_ms'] = (time.perf_counter() - started) * 1000
+        self.send_response(status)
+        self.end_headers()
+
+    def do_GET(self):
+        """হেলথ চেক: ওয়ার্ম কিনা এবং কোল্ড-স্টার্টের সময়গুলো (ms)।"""
+        body = json.dumps({'warm': _application is not None, 'timings': _timings}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_timings['module_load_ms'] = (time.perf_counter() - _MODULE_START) * 1000
@@ -0,0 +1,56 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import db_handler
+
+logger = logging.getLogger(__name__)
+
+# --- ডেটাবেস এক্সিকিউটর ---
+# psycopg2 ব্লকিং ড্রাইভার, তাই কুয়েরিগুলো আলাদা থ্রেডে চালানো হয় যাতে PTB ইভেন্ট লুপ আটকে না যায়।
+# থ্রেড সংখ্যা পুলের max সাইজের সমান — এর বেশি থ্রেড থাকলে তারা শুধু পুলে অপেক্ষা করত।
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=db_handler.DB_POOL_MAX_SIZE,
+            thread_name_prefix="db",
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """Application বন্ধের সময় কল করা হয় (post_shutdown)।"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run_db(func, *args, **kwargs):
+    """যেকোনো সিঙ্ক্রোনাস DB ফাংশন ডেটাবেস এক্সিকিউটরে চালিয়ে ফলাফল await করে।"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _to_async(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+# --- db_handler-এর একই সিগনেচারের async সংস্করণ ---
+get_user_balance = _to_async(db_handler.get_user_balance)
+update_balance = _to_async(db_handler.update_balance)
+add_ledger_entry = _to_async(db_handler.add_ledger_entry)
+get_user_data = _to_async(db_handler.get_user_data)
+withdraw = _to_async(db_handler.withdraw)
+get_pending_page = _to_async(db_handler.get_pending_page)
+review_withdrawals = _to_async(db_handler.review_withdrawals)
+record_verification_request = _to_async(db_handler.record_verification_request)
+set_premium_status = _to_async(db_handler.set_premium_status)
@@ -0,0 +1,43 @@
+import math
+import hashlib
+import threading
+
+# --- Bloom ফিল্টার ---
+# "এই কী আগে দেখা হয়েছে কি না" প্রশ্নের মেমোরি-সাশ্রয়ী উত্তর: False মানে নিশ্চিতভাবে নতুন,
+# True মানে সম্ভবত দেখা (false positive হার capacity ও error_rate দিয়ে ঠিক হয়)। মোছা যায় না।
+# তাই True এলে আসল উৎসে (DB) নিশ্চিত করতে হয়; False এলে সেই লুকআপ বাদ দেওয়া যায়।
+
+
+class BloomFilter:
+    """থ্রেড-সেফ Bloom ফিল্টার (str কী); একটি blake2b হ্যাশ থেকে double hashing-এ k টি বিট।"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+
+    def clear(self):
+        with self._lock:
+            self._bits = bytearray(len(self._bits))
+            self.count = 0
@@ -1,22 +1,37 @@
 import os
+import time
+import asyncio
 import logging
-import psycopg2
-import psycopg2.errors # ডেটাবেস মাইগ্রেশনের জন্য দরকার
+import datetime
+from decimal import Decimal, InvalidOperation
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes, ConversationHandler # <<< ConversationHandler যোগ করা হয়েছে
+from telegram.request import HTTPXRequest
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, TypeHandler, filters, ContextTypes, ConversationHandler # <<< ConversationHandler যোগ করা হয়েছে
 
 # **মডুলার ফাইলগুলি আমদানি করা**
 # আপনার Conversation Handlers এর জন্য প্রয়োজনীয় ফাংশন এবং কনস্ট্যান্ট যোগ করা হলো:
-try:
-    from profile_handler import profile_menu, handle_wallet_input, PROFILE_STATE 
-except ImportError:
-    # যদি profile_command না থাকে, তাহলে শুধু profile_menu ইম্পোর্ট করুন
-    from profile_handler import profile_menu, handle_profile_input, PROFILE_STATE
-    
+from db_handler import connect_db, release_db, init_pool, close_pool, pool_stats, compact_ledger
+from user_cache import user_cache
+from async_db import run_db, shutdown_executor, set_premium_status
+from migrator import migrate
+from persistence import PostgresPersistence
+from notifier import notifier, digest_callback
+from queue_handler import queue_command, queue_callback
+from broadcast_handler import broadcast_command, broadcast_callback, resume_broadcasts, pause_broadcasts, disable_broadcasts
+from expiry_handler import expiry_sweep_job, EXPIRY_SWEEP_INTERVAL
+from menu_router import MenuRouter
+from message_templates import Template, MARKDOWN_V2
+from history_handler import history_command, history_callback
+from profile_handler import handle_wallet_input, handle_profile_input, PROFILE_STATE
+
 from refer_handler import refer_command
-from verify_handler import start_verify, verify_method_selection, submit_txn_id, cancel_conversation, SELECT_METHOD, SUBMIT_TNX, verify_admin_action_handler
-from withdraw_handler import withdraw_command, handle_withdraw_amount, handle_withdraw_wallet, cancel_withdraw_conversation, WITHDRAW_AMOUNT_INPUT, WITHDRAW_WALLET_INPUT, withdraw_admin_action_handler
-# import task_handler  # WIP (অপরিবর্তিত)
+from verify_handler import verify_command, start_verify_flow, submit_tnx_form, handle_tnx_submission, cancel_conversation, SELECT_METHOD, SUBMIT_TNX, admin_verify_callback, warm_tnx_filter
+from withdraw_handler import withdraw_command, handle_withdraw_amount, handle_withdraw_wallet, cancel_withdraw_conversation, WITHDRAW_AMOUNT_INPUT, WITHDRAW_WALLET_INPUT, withdraw_admin_action_handler, withdraw_bulk_command, withdraw_bulk_callback
+from task_handler import task_command, task_callback, task_review_callback, add_task_command, end_task_command
+from statement_handler import reconcile_command
+from rate_limiter import rate_limiter, rate_limit_updates
+from commission_handler import settle_commissions, premium_event, commission_audit_job, PREMIUM_PRICE, COMMISSION_AUDIT_HOUR
+from fraud_handler import referral_graph, rebuild_referral_graph, referral_graph_job, holds_command, holds_callback, REFERRAL_GRAPH_REBUILD_INTERVAL
 
 
 # লগিং সেটআপ
@@ -36,166 +51,98 @@ PORT = int(os.environ.get("PORT", "8080"))
 WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
 # বোনাস কনস্ট্যান্ট (আপনার দেওয়া মান অনুযায়ী)
 REFERRAL_BONUS_JOINING = 40.00 
+# লেজার কমপ্যাক্টশন জব কত সেকেন্ড পরপর চলবে
+LEDGER_COMPACT_INTERVAL = int(os.environ.get("LEDGER_COMPACT_INTERVAL", "60"))
+# Telegram একসাথে কতগুলো ওয়েবহুক রিকোয়েস্ট পাঠাবে (setWebhook max_connections)
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "40"))
+# সার্ভারলেস মোডে একটি ইনভোকেশন একটিই আপডেট চালায়, তাই ছোট HTTP পুল যথেষ্ট
+SERVERLESS_HTTP_POOL_SIZE = int(os.environ.get("SERVERLESS_HTTP_POOL_SIZE", "8"))
 
 # -----------------
-# ২. ডেটাবেস কানেকশন ও ইউজার টেবিল তৈরি/পড়া (অপরিবর্তিত)
+# ২. ডেটাবেস কানেকশন ও স্কিমা
 # -----------------
-
-Python
-
-# ... (উপরের অংশ ঠিক থাকবে)
-
-# DATABASE_URL ভেরিয়েবলটি (যা os.environ.get দিয়ে লোড করা) ঠিক থাকবে
-DATABASE_URL = os.environ.get("DATABASE_URL") 
-# ...
-
-def connect_db():
-    """Render ডেটাবেসের সাথে যুক্ত হতে হয়"""
-    try:
-        # Vercel Environment থেকে সরাসরি ভেরিয়েবল লোড করুন (অতিরিক্ত নিরাপত্তা)
-        db_url = os.environ.get("DATABASE_URL") 
-        
-        if not db_url:
-            logger.error("DATABASE_URL এনভায়রনমেন্ট ভেরিয়েবলটি সেট করা নেই")
-            return None
-
-        conn = psycopg2.connect(db_url) # নতুন লোড করা ভেরিয়েবলটি ব্যবহার করুন
-        return conn
-        
-    except Exception as e:
-        # সংযোগ ব্যর্থ হলে ত্রুটিটি Vercel লগে দেখান
-        logger.error(f"ডেটাবেসের সাথে সংযোগে সমস্যা: {e}")
-        return None
-
-def create_table_if_not_exists():
-    """ইউজারদের ডেটাবেসে সংরক্ষণ করার জন্য টেবিল তৈরি করে"""
-    conn = None
-    cursor = None
-    try:
-        conn = connect_db()
-        if conn:
-            cursor = conn.cursor()
-
-            # ১. প্রধান টেবিল তৈরি করুন
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    status TEXT DEFAULT 'free',
-                    is_premium BOOLEAN DEFAULT FALSE,
-                    expiry_date DATE,
-                    join_date DATE DEFAULT CURRENT_DATE,
-                    referral_count INTEGER DEFAULT 0,
-                    referred_by BIGINT,
-                    premium_balance DECIMAL(10, 2),
-                    free_income DECIMAL(10, 2),
-                    refer_balance DECIMAL(10, 2),
-                    salary_balance DECIMAL(10, 2),
-                    total_withdraw DECIMAL(10, 2),
-                    wallet_address TEXT,
-                    referrer_id BIGINT
-                );
-            """)
-            
-            # ডেটাবেসে পরিবর্তন সেভ (কমিট) করা আবশ্যক
-            conn.commit()
-            
-            # ২. অনুপস্থিত কলামগুলো যোগ করুন (যদি আগে টেবিল তৈরি হয়ে থাকে)
-            columns_to_add = [
-                ('premium_balance', 'DECIMAL(10, 2)'),
-                ('free_income', 'DECIMAL(10, 2)'),
-                ('refer_balance', 'DECIMAL(10, 2)'),
-                ('salary_balance', 'DECIMAL(10, 2)'),
-                ('total_withdraw', 'DECIMAL(10, 2)'),
-                ('wallet_address', 'TEXT'),
-                ('referrer_id', 'BIGINT')
-            ]
-
-            for column_name, column_type in columns_to_add:
-                try:
-                    # ALTER TABLE... ADD COLUMN কমান্ড চালান
-                    cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} {column_type}")
-                    conn.commit()
-                    # logger.info(f"কলাম যুক্ত করা হয়েছে: {column_name}")
-
-                except Exception as e:
-                    # যদি কলাম আগে থেকেই থাকে, তবে এই অংশটি ত্রুটি উপেক্ষা করবে
-                    if 'already exists' in str(e):
-                        conn.rollback()
-                        continue
-                    else:
-                        logger.warning(f"অন্যান্য ALTER TABLE ত্রুটি: {e}")
-                        conn.rollback() # ত্রুটি হলে Rollback করুন
-
-            logger.info("ডেটাবেস টেবিল ও কলাম সফলভাবে তৈরি বা ভেরিফাই করা হয়েছে।")
-
-    except Exception as e:
-        # সংযোগ বা টেবিল তৈরি ব্যর্থ হলে ত্রুটিটি Vercel লগে দেখাবে
-        logger.error(f"প্রধান টেবিল অপারেশনে সমস্যা: {e}")
-        if conn:
-            conn.rollback() # প্রধান ত্রুটি হলে Rollback করুন
-        return False # ফেইল হলে False রিটার্ন করুন
-
-    finally:
-        # সংযোগ এবং কার্সর বন্ধ করা
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    return True # সফল হলে True রিটার্ন করুন
+# সংযোগ db_handler-এর শেয়ার্ড কানেকশন পুল থেকে আসে (connect_db / release_db)।
+# স্কিমা migrations/ ফোল্ডারে থাকে; main() চালুর সময় migrator.migrate() শুধু ভার্সন চেক করে
+# এবং বাকি থাকা মাইগ্রেশন থাকলে সেগুলো প্রয়োগ করে (python manage.py migrate-ও একই কাজ করে)।
 
 # ----------------------------------------------------
-# ৩. ইউজার রেজিস্ট্রেশন ও রেফারেল বোনাস লজিক (অপরিবর্তিত)
+# ৩. ইউজার রেজিস্ট্রেশন ও রেফারেল বোনাস লজিক
 # ----------------------------------------------------
-def register_user(user_id, referrer_id=None):
-    """নতুন ইউজারকে রেজিস্টার করে এবং রেফারিকে বোনাস প্রদান করে (যদি থাকে)"""
+# একটি স্টেটমেন্টেই রেজিস্ট্রেশন ও বোনাস: ON CONFLICT DO NOTHING থাকায় একই ইউজারের
+# একসাথে আসা একাধিক /start-এর মধ্যে কেবল একটিই INSERT করতে পারে, তাই বোনাস একবারই যায়।
+# referrer_id কেবল তখনই সেভ হয় যখন রেফারার আসলেই আছে, যাতে free_referrals কাউন্টার
+# এবং reconcile_referral_counters() একই নিয়মে গণনা করে।
+# %(hold)s (fraud_handler.referral_graph.assess()-এর কারণ) থাকলে বোনাস লেজারে না গিয়ে referral_holds-এ আটকে থাকে।
+REGISTER_USER_SQL = """
+    WITH new_user AS (
+        INSERT INTO users (user_id, status, referrer_id)
+        VALUES (%(user_id)s, 'start', (SELECT user_id FROM users WHERE user_id = %(referrer_id)s))
+        ON CONFLICT (user_id) DO NOTHING
+        RETURNING referrer_id
+    ), bonus AS (
+        UPDATE users
+        SET free_referrals = free_referrals + 1
+        WHERE user_id = (SELECT referrer_id FROM new_user)
+        RETURNING user_id
+    ), credit AS (
+        INSERT INTO ledger_entries (user_id, kind, amount, ref)
+        SELECT user_id, 'refer_balance', %(bonus)s, 'join:' || %(user_id)s FROM bonus
+        WHERE %(hold)s::text IS NULL
+    ), held AS (
+        INSERT INTO referral_holds (user_id, referrer_id, amount, reason)
+        SELECT %(user_id)s, user_id, %(bonus)s, %(hold)s FROM bonus
+        WHERE %(hold)s::text IS NOT NULL
+    ), unblocked AS (
+        -- ব্লক করা ইউজার আবার /start দিলে ব্রডকাস্টে ফেরত আসে
+        UPDATE users SET is_blocked = FALSE WHERE user_id = %(user_id)s AND is_blocked
+    )
+    SELECT EXISTS (SELECT 1 FROM new_user), (SELECT user_id FROM bonus)
+"""
+
+
+def register_user(user_id, referrer_id=None, hold=None):
+    """
+    নতুন ইউজারকে রেজিস্টার করে এবং রেফারিকে বোনাস প্রদান করে (যদি থাকে)।
+    hold (সন্দেহের কারণ) দিলে বোনাস referral_holds-এ আটকে থাকে, অ্যাডমিন /holds থেকে ছাড়েন।
+    রিটার্ন: (is_new, bonus_paid) — bonus_paid মানে রেফারার পাওয়া গেছে ও বোনাস দেওয়া বা আটকানো হয়েছে;
+    পুরনো ইউজার হলে (False, False); ত্রুটি হলে None।
+    """
     conn = connect_db()
     if not conn:
-        return False
+        return None
 
     cursor = conn.cursor()
-    
-    # ১. ইউজারকে খুঁজে বের করা: ইউজার কি আগেই রেজিস্টার করা?
-    cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (user_id,))
-    existing_user = cursor.fetchone()
-
-    if existing_user:
-        cursor.close()
-        conn.close()
-        return True
-
-    # ২. নতুন ইউজার রেজিস্টার করা
     try:
-        cursor.execute("""
-            INSERT INTO users (user_id, status, referrer_id) 
-            VALUES (%s, %s, %s)
-        """, (user_id, 'start', referrer_id))
-        
+        cursor.execute(REGISTER_USER_SQL, {
+            'user_id': user_id,
+            'referrer_id': referrer_id,
+            'bonus': REFERRAL_BONUS_JOINING,
+            'hold': hold,
+        })
+        is_new, bonus_referrer_id = cursor.fetchone()
         conn.commit()
-        logger.info(f"New user {user_id} registered. Referrer ID: {referrer_id}")
-
-        # ৩. রেফারিকে বোনাস দেওয়া (যদি referrer_id বৈধ হয়)
-        if referrer_id:
-            cursor.execute("SELECT user_id FROM users WHERE user_id = %s", (referrer_id,))
-            if cursor.fetchone():
-                # রেফারিকে রেফার ব্যালেন্সে জয়েনিং বোনাস যোগ করা
-                cursor.execute(
-                    "UPDATE users SET refer_balance = refer_balance + %s WHERE user_id = %s",
-                    (REFERRAL_BONUS_JOINING, referrer_id)
-                )
-                conn.commit()
+        bonus_paid = bonus_referrer_id is not None
+        if bonus_paid:
+            user_cache.invalidate(bonus_referrer_id)
+
+        if is_new:
+            logger.info(f"New user {user_id} registered. Referrer ID: {referrer_id}")
+            if bonus_paid and hold:
+                logger.warning(f"Referral joining bonus for referrer {referrer_id} held ({hold})")
+            elif bonus_paid:
                 logger.info(f"Referral joining bonus of {REFERRAL_BONUS_JOINING} BDT given to referrer {referrer_id}")
-            else:
+            elif referrer_id:
                 logger.warning(f"Referrer ID {referrer_id} not found in database.")
 
-        return True
+        return is_new, bonus_paid
 
     except Exception as e:
         logger.error(f"User registration or referral update failed for {user_id}: {e}")
         conn.rollback()
-        return False
+        return None
     finally:
         cursor.close()
-        conn.close()
+        release_db(conn)
 
 # -----------------
 # ৪. বাটন ডিজাইন (অপরিবর্তিত)
@@ -216,6 +163,16 @@ premium_inline_keyboard = [
 ]
 premium_inline_markup = InlineKeyboardMarkup(premium_inline_keyboard)
 
+# গ) স্ক্রিন টেমপ্লেট (message_templates.py) — একবার কম্পাইল, শুধু ইউজারের নাম প্রতিবার escape হয়
+START_TEMPLATE = Template(
+    "👋 স্বাগতম, *{first_name}*!\n\n"
+    "আমরা আপনাকে অনলাইনে সহজে উপার্জন করার একটি সুযোগ দিচ্ছি।\n"
+    "আমাদের প্রিমিয়াম এবং ফ্রি টাস্কগুলো সম্পন্ন করে আপনি উপার্জন শুরু করতে পারেন।\n\n"
+    "🚀 *শুরু করার জন্য নিচের মেনু ব্যবহার করুন।*\n"
+    "👤 প্রোফাইল তৈরি করতে বাটনটি ব্যবহার করুন।\n"
+    "📢 রেফার করে অতিরিক্ত বোনাস পেতে পারেন (প্রতি সফল জয়েনিংয়ে *{bonus} BDT*!)।"
+).bind(bonus=REFERRAL_BONUS_JOINING)
+
 # -----------------
 # ৫. হ্যান্ডলার ফাংশন (অপরিবর্তিত)
 # -----------------
@@ -239,23 +196,17 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except ValueError:
             pass
 
-    # ২. ইউজারকে রেজিস্টার করা ও রেফারেল লজিক চালানো
-    register_user(user.id, referrer_id)
+    # ২. ইউজারকে রেজিস্টার করা ও রেফারেল লজিক চালানো (রেফারার সন্দেহজনক হলে বোনাস আটকে থাকে)
+    hold = referral_graph.assess(referrer_id) if referrer_id else None
+    registered = await run_db(register_user, user.id, referrer_id, hold)
+    if registered and all(registered):
+        referral_graph.add(user.id, referrer_id)
 
     # ৩. মেসেজ তৈরি ও পাঠানো
-    message = (
-        f"👋 স্বাগতম, **{user.first_name}**!\n\n"
-        f"আমরা আপনাকে অনলাইনে সহজে উপার্জন করার একটি সুযোগ দিচ্ছি।\n"
-        f"আমাদের প্রিমিয়াম এবং ফ্রি টাস্কগুলো সম্পন্ন করে আপনি উপার্জন শুরু করতে পারেন।\n\n"
-        f"🚀 **শুরু করার জন্য নিচের মেনু ব্যবহার করুন।**\n"
-        f"👤 প্রোফাইল তৈরি করতে বাটনটি ব্যবহার করুন।\n"
-        f"📢 রেফার করে অতিরিক্ত বোনাস পেতে পারেন (প্রতি সফল জয়েনিংয়ে **{REFERRAL_BONUS_JOINING} BDT**!)।"
-    )
-
     await update.message.reply_text(
-        message,
+        START_TEMPLATE.render(first_name=user.first_name),
         reply_markup=main_menu_markup,
-        parse_mode='Markdown'
+        parse_mode=MARKDOWN_V2
     )
 
 
@@ -267,20 +218,26 @@ async def premium_service_button(update: Update, context: ContextTypes.DEFAULT_T
     )
 
 
+async def home_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """🏠 প্রধান মেনু বাটন"""
+    await update.message.reply_text("আপনি প্রধান মেনুতে আছেন।", reply_markup=main_menu_markup)
+
+
+async def how_it_works_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """💡 কিভাবে কাজ করে? বাটন"""
+    await update.message.reply_text("এই বটটি একটি প্রিমিয়াম কন্টেন্ট অ্যাক্সেস প্রদানকারী বট। আপনি প্রিমিয়াম প্ল্যান কিনে আমাদের এক্সক্লুসিভ চ্যানেলে যুক্ত হতে পারেন।")
+
+
+async def support_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """📞 সাপোর্ট বাটন"""
+    await update.message.reply_text("সাপোর্টের জন্য এই ইউজারনেমে যোগাযোগ করুন: @Your_Support_Username")
+
+
 async def handle_button_clicks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """সাধারণ মেনু বাটন হ্যান্ডলার"""
-    text = update.message.text
-    
-    if text == "🏠 প্রধান মেনু (Home)":
-        await update.message.reply_text("আপনি প্রধান মেনুতে আছেন।", reply_markup=main_menu_markup)
-    elif text == "💡 কিভাবে কাজ করে?":
-        await update.message.reply_text("এই বটটি একটি প্রিমিয়াম কন্টেন্ট অ্যাক্সেস প্রদানকারী বট। আপনি প্রিমিয়াম প্ল্যান কিনে আমাদের এক্সক্লুসিভ চ্যানেলে যুক্ত হতে পারেন।")
-    elif text == "📞 সাপোর্ট":
-        await update.message.reply_text("সাপোর্টের জন্য এই ইউজারনেমে যোগাযোগ করুন: @Your_Support_Username")
-    else:
-        # এই হ্যান্ডলারটি এখন Conversation Handlers দ্বারা ওভাররাইড হবে, তাই এটি শুধু ফলব্যাক হিসেবে কাজ করবে।
-        await update.message.reply_text("দুঃখিত, আমি এই কমান্ডটি বুঝিনি। দয়া করে মেনু বাটন ব্যবহার করুন।")
-    
+    """ফলব্যাক: মেনু রাউটার বা কোনো কনভার্সেশন যে টেক্সট ধরেনি"""
+    await update.message.reply_text("দুঃখিত, আমি এই কমান্ডটি বুঝিনি। দয়া করে মেনু বাটন ব্যবহার করুন।")
+
+
 async def handle_inline_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """ইনলাইন বাটনে ক্লিক করলে কী হবে তা পরিচালনা করে"""
     query = update.callback_query
@@ -295,88 +252,338 @@ async def handle_inline_callbacks(update: Update, context: ContextTypes.DEFAULT_
         )
 
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stats — অ্যাডমিনের জন্য রানটাইম মেট্রিক্স (DB পুল ইত্যাদি)"""
+    if str(update.effective_user.id) != str(ADMIN_ID):
+        return
+
+    pool = pool_stats()
+    cache = user_cache.stats()
+    message = (
+        "📊 DB Pool\n"
+        f"size: {pool.get('size', 0)}/{pool.get('max_size', 0)} "
+        f"(idle {pool.get('idle', 0)}, in use {pool.get('in_use', 0)})\n"
+        f"acquires: {pool.get('acquires', 0)}, waits: {pool.get('waits', 0)}, timeouts: {pool.get('timeouts', 0)}\n"
+        f"wait avg/max: {pool.get('wait_avg_ms', 0.0):.1f}/{pool.get('wait_max_ms', 0.0):.1f} ms\n"
+        f"created: {pool.get('created', 0)}, discarded: {pool.get('discarded', 0)}\n\n"
+        "👤 User Cache\n"
+        f"size: {cache['size']}/{cache['max_size']}, hit rate: {cache['hit_rate']:.1%}\n"
+        f"hits: {cache['hits']}, misses: {cache['misses']}, "
+        f"evictions: {cache['evictions']}, invalidations: {cache['invalidations']}"
+    )
+
+    notices = notifier.stats()
+    message += (
+        "\n\n📨 Notifications\n"
+        f"queue: {notices['queue']}, digest pending: {notices['pending_digest']}, digests: {notices['digests']}\n"
+        f"sent: {notices['sent']}, failed: {notices['failed']}, dropped: {notices['dropped']}\n"
+        f"retries: {notices['retries']}, rate limited: {notices['rate_limited']}"
+    )
+
+    limits = rate_limiter.stats()
+    throttled_by = ", ".join(f"{name}: {count}" for name, count in sorted(limits['by_budget'].items(), key=lambda item: -item[1])[:8])
+    message += (
+        "\n\n🚦 Rate Limit\n"
+        f"allowed: {limits['allowed']}, throttled: {limits['throttled']}, global: {limits['throttled_global']}\n"
+        f"warned: {limits['warned']}, users: {limits['users']}, evictions: {limits['evictions']}"
+        + (f"\n{throttled_by}" if throttled_by else "")
+    )
+
+    # সার্ভারলেস মোডে (api/index.py) PTB-র সাধারণ প্রসেসর থাকে, তাই আপডেট মেট্রিক্স নেই
+    processor = context.application.update_processor
+    if hasattr(processor, "stats"):
+        updates = processor.stats()
+        routes = sorted(updates['routes'].items(), key=lambda item: item[1]['count'], reverse=True)
+        route_lines = "\n".join(
+            f"{label}: {r['count']} (err {r['errors']}) avg/p95/max {r['avg_ms']:.0f}/{r['p95_ms']:.0f}/{r['max_ms']:.0f} ms"
+            for label, r in routes[:10]
+        )
+        message += (
+            "\n\n📥 Updates\n"
+            f"queue: {updates['depth']}, pending: {updates['pending']}/{updates['max_pending']} (peak {updates['max_depth']})\n"
+            f"running: {updates['running']}/{updates['concurrency']}, active users: {updates['active_keys']}\n"
+            f"processed: {updates['processed']}, put waits: {updates['put_waits']}, rejected (503): {updates['rejected']}\n"
+            f"{route_lines}"
+        )
+    await update.message.reply_text(message)
+
+
+async def set_premium_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /setpremium <user_id> <days> [amount] — অ্যাডমিন প্রিমিয়াম চালু করে (days=0 হলে বন্ধ)।
+    amount = ইউজারের দেওয়া টাকা, রেফার কমিশনের ভিত্তি (না দিলে PREMIUM_PRICE)।
+    """
+    if str(update.effective_user.id) != str(ADMIN_ID):
+        return
+
+    try:
+        target_user_id = int(context.args[0])
+        days = int(context.args[1])
+        amount = Decimal(context.args[2]) if len(context.args) > 2 else PREMIUM_PRICE
+    except (IndexError, ValueError, InvalidOperation):
+        await update.message.reply_text("ব্যবহার: /setpremium <user_id> <days> [amount]")
+        return
+
+    is_premium = days > 0
+    expiry_date = (datetime.date.today() + datetime.timedelta(days=days)) if is_premium else None
+    changed = await set_premium_status(target_user_id, is_premium, expiry_date)
+
+    if changed is None:
+        await update.message.reply_text(f"❌ ইউজার {target_user_id} খুঁজে পাওয়া যায়নি বা আপডেট ব্যর্থ হয়েছে।")
+    elif is_premium:
+        referral_graph.mark_active(target_user_id)
+        settled = await run_db(settle_commissions, [(premium_event(target_user_id, expiry_date), target_user_id, amount)])
+        commission = f"\n💸 রেফার কমিশন: {settled[0]} জন, মোট {settled[1]} টাকা" if settled and settled[0] else ""
+        await update.message.reply_text(f"✅ ইউজার {target_user_id} প্রিমিয়াম, মেয়াদ: {expiry_date}{commission}")
+    else:
+        await update.message.reply_text(f"✅ ইউজার {target_user_id}-এর প্রিমিয়াম বন্ধ করা হয়েছে।")
+
+
 # -----------------
-# ৬. মূল ফাংশন (পরিবর্তিত: Conversation Handlers সহ)
+# ৬. অ্যাপ্লিকেশন লাইফসাইকেল ও ব্যাকগ্রাউন্ড জব
 # -----------------
 
-def main():
-    """বট অ্যাপ্লিকেশন শুরু করে"""
-    
-    # ডেটাবেস সংযোগ না পেলে বট চলতে পারবে না
-    if not BOT_TOKEN or not DATABASE_URL:
-        logger.error("BOT_TOKEN or DATABASE_URL is missing. Please check Render environment variables.")
+async def compact_ledger_job(context: ContextTypes.DEFAULT_TYPE):
+    """নতুন লেজার এন্ট্রিগুলো user_balances-এ যোগ করে (JobQueue থেকে নিয়মিত চলে)"""
+    compacted, failed = await run_db(compact_ledger)
+    if compacted:
+        logger.info(f"Ledger compaction: {compacted} entries folded into user_balances")
+    if failed:
+        logger.warning("Ledger compaction stopped early; the rest is retried on the next run")
+
+
+async def on_startup(application: Application):
+    """Application চালুর সময় DB পুল খোলে এবং ব্যাকগ্রাউন্ড জব চালু করে"""
+    init_pool()
+    await notifier.start(application.bot)
+    await resume_broadcasts(application.bot)
+    await run_db(rebuild_referral_graph)
+    warmed = await run_db(warm_tnx_filter)
+    if warmed is not None:
+        logger.info(f"TrxID filter warmed with {warmed} submissions")
+
+    if application.job_queue is None:
+        logger.warning("JobQueue পাওয়া যায়নি (python-telegram-bot[job-queue] ইনস্টল করুন); লেজার কমপ্যাক্টশন, মেয়াদ সুইপ, রেফারেল গ্রাফ রিবিল্ড ও কমিশন অডিট চলবে না।")
+    else:
+        application.job_queue.run_repeating(compact_ledger_job, interval=LEDGER_COMPACT_INTERVAL, first=LEDGER_COMPACT_INTERVAL)
+        application.job_queue.run_repeating(expiry_sweep_job, interval=EXPIRY_SWEEP_INTERVAL, first=0)
+        application.job_queue.run_repeating(
+            referral_graph_job, interval=REFERRAL_GRAPH_REBUILD_INTERVAL, first=REFERRAL_GRAPH_REBUILD_INTERVAL
+        )
+        application.job_queue.run_daily(commission_audit_job, time=datetime.time(hour=COMMISSION_AUDIT_HOUR))
+
+
+# সার্ভারলেস মোডে post_init (on_startup) ও JobQueue চলে না: ইন-মেমরি স্টেট প্রথম আপডেটে গরম করা হয়, আর
+# রেফারেল গ্রাফ REFERRAL_GRAPH_REBUILD_INTERVAL পার হলে পরের আপডেটে আবার লোড হয় (কন্টেইনার যতক্ষণ ওয়ার্ম)।
+# notifier ওয়ার্কার চালু হয় না — notify() তখন সরাসরি পাঠায়; ব্রডকাস্ট বন্ধ (broadcast_handler)।
+# লেজার কমপ্যাক্টশন, মেয়াদ সুইপ ও কমিশন অডিট ক্রন থেকে: python manage.py compact-ledger / sweep-expiry /
+# recompute-commissions --apply।
+_serverless_graph_built_at = None
+_serverless_warm_lock = asyncio.Lock()
+
+
+async def serverless_warmup():
+    """প্রতিটি সার্ভারলেস আপডেটের আগে (api/index.py); কাজ শুধু প্রথমবার ও গ্রাফ পুরনো হলে।"""
+    global _serverless_graph_built_at
+    now = time.monotonic()
+    if _serverless_graph_built_at is not None and now - _serverless_graph_built_at < REFERRAL_GRAPH_REBUILD_INTERVAL:
         return
+    async with _serverless_warm_lock:
+        if _serverless_graph_built_at is None:
+            warmed = await run_db(warm_tnx_filter)
+            if warmed is not None:
+                logger.info(f"TrxID filter warmed with {warmed} submissions")
+        elif time.monotonic() - _serverless_graph_built_at < REFERRAL_GRAPH_REBUILD_INTERVAL:
+            return
+        if await run_db(rebuild_referral_graph) is not None:
+            _serverless_graph_built_at = time.monotonic()
+            logger.info(f"Referral graph loaded: {referral_graph.stats()}")
+
+
+async def on_stop(application: Application):
+    """বট বন্ধের আগে (HTTP ক্লায়েন্ট তখনও খোলা) ব্রডকাস্ট চেকপয়েন্ট করে ও কিউতে থাকা নোটিফিকেশন পাঠিয়ে দেয়"""
+    await pause_broadcasts()
+    await notifier.stop()
+
+
+async def on_shutdown(application: Application):
+    """Application বন্ধের সময় DB এক্সিকিউটর ও পুলের সব কানেকশন বন্ধ করে"""
+    shutdown_executor()
+    close_pool()
+
+
+# -----------------
+# ৭. মূল ফাংশন (পরিবর্তিত: Conversation Handlers সহ)
+# -----------------
+
+def build_application(serverless=False):
+    """
+    হ্যান্ডলারসহ Application তৈরি করে (চালু করে না)।
+    serverless=True হলে (api/index.py) Updater, আপডেট কিউ ও ব্যাকগ্রাউন্ড জব বাদ থাকে —
+    প্রতিটি রিকোয়েস্টে আপডেট সরাসরি process_update() দিয়ে চালানো হয়।
+    """
+    persistence = PostgresPersistence()
+    builder = Application.builder().token(BOT_TOKEN).persistence(persistence)
+    if serverless:
+        # getUpdates কখনো চলে না, তাই আলাদা HTTP ক্লায়েন্ট (ও SSL কনটেক্সট) তৈরি না করে একটিই শেয়ার করা হয়
+        request = HTTPXRequest(connection_pool_size=SERVERLESS_HTTP_POOL_SIZE)
+        builder = builder.updater(None).request(request).get_updates_request(request)
+        disable_broadcasts()
+    else:
+        # সীমিত আপডেট কিউ + per-user ক্রম বজায় রেখে সমান্তরাল প্রসেসিং (update_processor.py)।
+        # মডিউলটি tornado টানে, তাই শুধু run_webhook-এর পথে ইম্পোর্ট হয় — সার্ভারলেস কোল্ড-স্টার্টে নয়
+        from update_processor import build_update_pipeline
+        update_queue, update_processor = build_update_pipeline()
+        builder = (
+            builder
+            .update_queue(update_queue)
+            .concurrent_updates(update_processor)
+            .post_init(on_startup)
+            .post_stop(on_stop)
+            .post_shutdown(on_shutdown)
+        )
+    application = builder.build()
+    if not serverless:
+        # আপডেট শেষেই user_data/কনভার্সেশন DB-তে — একাধিক ওয়ার্কার একই স্টেট দেখে (persistence.py)
+        update_processor.after_update = lambda: persistence.write_through(application)
+
+    # অ্যান্টি-স্প্যাম: সব হ্যান্ডলারের আগে (group -1); বাজেট শেষ হলে বাকি হ্যান্ডলার ও DB কল চলে না (rate_limiter.py)
+    application.add_handler(TypeHandler(Update, rate_limit_updates), group=-1)
 
-    create_table_if_not_exists()
-    
-    application = Application.builder().token(BOT_TOKEN).build()
-    
     # হ্যান্ডলার যুক্ত করা:
     application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("setpremium", set_premium_command))
+    application.add_handler(CommandHandler("queue", queue_command))
+    application.add_handler(CommandHandler("withdrawbulk", withdraw_bulk_command))
+    application.add_handler(CommandHandler("broadcast", broadcast_command))
+    application.add_handler(CommandHandler("addtask", add_task_command))
+    application.add_handler(CommandHandler("endtask", end_task_command))
+    application.add_handler(CommandHandler("reconcile", reconcile_command))
+    application.add_handler(CommandHandler("holds", holds_command))
     
     # --- মডুলার এবং রেজেক্স হ্যান্ডলার ---
+
+    # মেনু বাটন লেবেল -> হ্যান্ডলার (menu_router.py); নতুন বাটন এখানে register() করলেই হয়
+    menu_router = MenuRouter(main_menu_keyboard)
     
     # ১. Conversation Handlers (আসল কোড থেকে তৈরি করা হয়েছে)
     
     # PROFILE Conversation Handler 
-    # (আপনার profile_handler.py থেকে profile_menu ইম্পোর্ট করা হয়েছে)
+    # (আপনার profile_handler.py থেকে handle_wallet_input ইম্পোর্ট করা হয়েছে)
     profile_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex("^👤 PROFILE 👤$"), profile_menu)], # <-- profile_menu ব্যবহার করা হলো
+        entry_points=[
+            menu_router.entry("👤 PROFILE 👤", handle_wallet_input),
+            CallbackQueryHandler(handle_wallet_input, pattern='^set_wallet$'),
+        ],
         states={
             PROFILE_STATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_profile_input)],
         },
         fallbacks=[], # এখানে ক্যানসেল বাটন যোগ করতে পারেন
+        name="profile_conversation",
+        persistent=True,
     )
     application.add_handler(profile_conv_handler) # <<< Indentation ফিক্স করা হয়েছে
     
     # VERIFY Conversation Handler
     verify_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex("^💾 VERIFY ✅$"), start_verify)],
+        entry_points=[
+            menu_router.entry("💾 VERIFY ✅", verify_command),
+            CallbackQueryHandler(start_verify_flow, pattern='^verify_start$'),
+        ],
         states={
-            SELECT_METHOD: [CallbackQueryHandler(verify_method_selection, pattern='^(method_bkash|method_nagad|method_rocket)$')],
-            SUBMIT_TNX: [MessageHandler(filters.TEXT & ~filters.COMMAND, submit_txn_id)],
+            SELECT_METHOD: [CallbackQueryHandler(submit_tnx_form, pattern='^method_(Bkash|Nagad)$')],
+            SUBMIT_TNX: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_tnx_submission)],
         },
         fallbacks=[CommandHandler("cancel", cancel_conversation)],
+        name="verify_conversation",
+        persistent=True,
     )
     application.add_handler(verify_conv_handler) # <<< Indentation ফিক্স করা হয়েছে
 
     # WITHDRAW Conversation Handler
     # (আপনার withdraw_handler.py থেকে withdraw_command ইম্পোর্ট করা হয়েছে)
     withdraw_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex("^🏦 WITHDRAW 🏦$"), withdraw_command)], # <-- withdraw_command ব্যবহার করা হলো
+        entry_points=[menu_router.entry("🏦 WITHDRAW 🏦", withdraw_command)], # <-- withdraw_command ব্যবহার করা হলো
         states={
             WITHDRAW_AMOUNT_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_withdraw_amount)],
             WITHDRAW_WALLET_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_withdraw_wallet)],
         },
         fallbacks=[CommandHandler("cancel", cancel_withdraw_conversation)],
+        name="withdraw_conversation",
+        persistent=True,
     )
     application.add_handler(withdraw_conv_handler) # <<< Indentation ফিক্স করা হয়েছে
+    # প্রতিটি আপডেটের আগে এদের স্টেট DB থেকে মেলানো হয় (অন্য ওয়ার্কার/কন্টেইনারের লেখা)
+    persistence.track_conversations(profile_conv_handler, verify_conv_handler, withdraw_conv_handler)
     
     
-    # ২. প্রিমিয়াম সার্ভিস হ্যান্ডলার
-    application.add_handler(MessageHandler(filters.Regex("^⭐️ প্রিমিয়াম সার্ভিস$"), premium_service_button))
-    
-    # ৩. রেফার হ্যান্ডলার 
-    application.add_handler(MessageHandler(filters.Regex("^📢 REFER 🎁$"), refer_command)) 
-
-    # ৪. অন্যান্য WIP হ্যান্ডলার (আপনার আসল কোড অনুসারে)
-    # application.add_handler(MessageHandler(filters.Regex("^🏅 TASK 🏅$"), task_handler.task_command))
-    # application.add_handler(MessageHandler(filters.Regex("^📜 HISTORY 📜$"), history_handler.history_command))
+    # ২-৪. সাধারণ মেনু বাটন: একটিই হ্যান্ডলার, লেবেল দিয়ে dict লুকআপ (menu_router.py)
+    menu_router.register("🏠 প্রধান মেনু (Home)", home_button)
+    menu_router.register("⭐️ প্রিমিয়াম সার্ভিস", premium_service_button)
+    menu_router.register("📢 REFER 🎁", refer_command)
+    menu_router.register("💡 কিভাবে কাজ করে?", how_it_works_button)
+    menu_router.register("📞 সাপোর্ট", support_button)
+    menu_router.register("🏅 TASK 🏅", task_command)
+    menu_router.register("📜 HISTORY 📜", history_command)
+    application.add_handler(menu_router.handler())
+    if menu_router.unrouted():
+        logger.info(f"মেনু বাটন এখনো হ্যান্ডলার ছাড়া: {', '.join(menu_router.unrouted())}")
     
     
     # ৫. Admin Action Handlers (SyntaxWarning ফিক্স করে যোগ করা হলো)
     
     # Verify Admin Handler (r'...' যোগ করা হয়েছে)
-    application.add_handler(CallbackQueryHandler(verify_admin_action_handler, pattern=r'^(verify_accept|verify_reject)_(\d+)$'))
+    application.add_handler(CallbackQueryHandler(admin_verify_callback, pattern=r'^(verify_accept|verify_reject)_(\d+)_(\d+)$'))
     
     # Withdraw Admin Handler (r'...' যোগ করা হয়েছে)
     application.add_handler(CallbackQueryHandler(withdraw_admin_action_handler, pattern=r'^(withdraw_accept|withdraw_reject)_(\d+)_([\d\.]+)$'))
+
+    # Withdraw Bulk Handler (/withdrawbulk কনফার্ম)
+    application.add_handler(CallbackQueryHandler(withdraw_bulk_callback, pattern=r'^wbulk_(ok|cancel)$'))
+
+    # ব্রডকাস্ট কনফার্ম/থামানো (broadcast_handler.py)
+    application.add_handler(CallbackQueryHandler(broadcast_callback, pattern=r'^bcast_(ok|cancel|stop)_(\d+)$'))
+
+    # অ্যাডমিন নোটিফিকেশন digest-এর পেজ/রিভিউ বাটন (notifier.py)
+    application.add_handler(CallbackQueryHandler(digest_callback, pattern=r'^digest_(page|open)_(\d+)_(\d+)$'))
+
+    # টাস্ক সম্পন্ন বাটন (task_handler.py)
+    application.add_handler(CallbackQueryHandler(task_callback, pattern=r'^task_done_(\d+)$'))
+    application.add_handler(CallbackQueryHandler(task_review_callback, pattern=r'^taskrev_(ok|no)_(\d+)_(\d+)$'))
+
+    # আটকে থাকা রেফারেল বোনাস ছাড়া/বাতিল (fraud_handler.py)
+    application.add_handler(CallbackQueryHandler(holds_callback, pattern=r'^hold_(release|void)_(\d+)$'))
+
+    # HISTORY পেজ নেভিগেশন (history_handler.py)
+    application.add_handler(CallbackQueryHandler(history_callback, pattern=r'^hist_(next|prev)_(\d+)_(\d)_(\d+)$'))
+
+    # অ্যাডমিন রিভিউ কিউ: পেজ নেভিগেশন ও পেজ-ভিত্তিক বাল্ক সিদ্ধান্ত (queue_handler.py)
+    application.add_handler(CallbackQueryHandler(queue_callback, pattern=r'^queue(bulk)?_(withdraw|verify)_'))
     
     
     # ৬. অবশিষ্ট টেক্সট মেসেজ এবং অন্যান্য হ্যান্ডলার
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_button_clicks))
     application.add_handler(CallbackQueryHandler(handle_inline_callbacks))
     
+    return application
+
+
+def main():
+    """বট অ্যাপ্লিকেশন শুরু করে"""
+    
+    # ডেটাবেস সংযোগ না পেলে বট চলতে পারবে না
+    if not BOT_TOKEN or not DATABASE_URL:
+        logger.error("BOT_TOKEN or DATABASE_URL is missing. Please check Render environment variables.")
+        return
+
+    # persistence Application.initialize-এ (post_init-এর আগে) লোড হয়, তাই স্কিমা আগেই চেক করা হয়
+    init_pool()
+    if migrate() is None:
+        logger.error("ডেটাবেস মাইগ্রেশন ব্যর্থ হয়েছে। লগ চেক করুন।")
+
+    application = build_application()
+
     # Railway-এর জন্য Webhook Mode-এ পরিবর্তন করা হলো
     try:
         # Railway-তে 0.0.0.0 তে সব অনুরোধ শুনতে হয়
@@ -384,6 +591,8 @@ def main():
             listen="0.0.0.0",
             port=PORT,
             url_path="",
+            webhook_url=WEBHOOK_URL or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
         )
         logger.info(f"বট চলছে... (Webhook Mode) Port: {PORT}")
     except Exception as e:
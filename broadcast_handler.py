@@ -0,0 +1,430 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter, Forbidden, BadRequest, NetworkError
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db
+from async_db import run_db
+from notifier import notifier, TokenBucket, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# --- মাস ব্রডকাস্ট (/broadcast) ---
+# ইউজার আইডি সার্ভার-সাইড কার্সর (WITH HOLD) থেকে ব্যাচে আসে — fetchall বা দীর্ঘ ট্রানজেকশন নেই।
+# সীমিত সংখ্যক ওয়ার্কার BROADCAST_RATE এবং notifier-এর গ্লোবাল বাকেট মেনে পাঠায়।
+# অগ্রগতি broadcasts টেবিলে চেকপয়েন্ট হয়; বট রিস্টার্ট হলে 'running' ব্রডকাস্ট last_user_id
+# থেকে আবার চলে (ক্র্যাশের মুহূর্তে পাঠানো কয়েকটি মেসেজ দ্বিতীয়বার যেতে পারে)।
+ADMIN_ID = os.environ.get("ADMIN_ID")
+BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", "20"))  # মেসেজ/সেকেন্ড
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", "8"))
+BROADCAST_FETCH_SIZE = int(os.environ.get("BROADCAST_FETCH_SIZE", "1000"))
+BROADCAST_CHECKPOINT_INTERVAL = float(os.environ.get("BROADCAST_CHECKPOINT_INTERVAL", "5"))
+BROADCAST_MAX_RETRIES = 3
+
+# সার্ভারলেস মোডে (api/index.py) ব্যাকগ্রাউন্ড টাস্ক রিকোয়েস্টের সাথেই থেমে যায় এবং রিস্টার্টে আবার শুরু
+# করার post_init-ও চলে না — তাই সেখানে /broadcast বন্ধ (bot.build_application disable_broadcasts() ডাকে)
+_broadcasts_enabled = True
+BROADCAST_UNSUPPORTED_TEXT = "⚠️ সার্ভারলেস মোডে ব্রডকাস্ট চলে না। স্থায়ী ওয়ার্কার (python bot.py) থেকে /broadcast দিন।"
+
+
+def disable_broadcasts():
+    global _broadcasts_enabled
+    _broadcasts_enabled = False
+
+# --- ডেটাবেস ---
+
+def create_broadcast(admin_chat_id, status_message_id, text):
+    """নতুন ব্রডকাস্ট সারি তৈরি করে। রিটার্ন: (broadcast_id, মোট প্রাপক) বা None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO broadcasts (admin_chat_id, status_message_id, text, total)
+                VALUES (%s, %s, %s, (SELECT count(*) FROM users WHERE NOT is_blocked))
+                RETURNING broadcast_id, total
+                """,
+                (admin_chat_id, status_message_id, text)
+            )
+            created = cur.fetchone()
+        conn.commit()
+        return created
+    except Exception as e:
+        logger.error(f"Error creating broadcast: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+BROADCAST_COLUMNS = ("broadcast_id", "admin_chat_id", "status_message_id", "text", "status",
+                     "last_user_id", "total", "sent", "failed", "blocked")
+
+
+def get_running_broadcasts():
+    """রিস্টার্টের পর আবার চালানোর জন্য 'running' ব্রডকাস্টগুলো (ডিকশনারি তালিকা)।"""
+    conn = connect_db()
+    if not conn:
+        return []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {', '.join(BROADCAST_COLUMNS)} FROM broadcasts WHERE status = 'running' ORDER BY broadcast_id"
+            )
+            rows = [dict(zip(BROADCAST_COLUMNS, row)) for row in cur.fetchall()]
+        conn.rollback()
+        return rows
+    except Exception as e:
+        logger.error(f"Error loading running broadcasts: {e}")
+        conn.rollback()
+        return []
+    finally:
+        release_db(conn)
+
+
+def save_checkpoint(broadcast_id, last_user_id, sent, failed, blocked, blocked_ids, status='running'):
+    """অগ্রগতি ও ব্লক করা ইউজারদের এক ট্রানজেকশনে লেখে। সফল হলে True।"""
+    conn = connect_db()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cur:
+            if blocked_ids:
+                cur.execute("UPDATE users SET is_blocked = TRUE WHERE user_id = ANY(%s)", (list(blocked_ids),))
+            cur.execute(
+                """
+                UPDATE broadcasts
+                SET last_user_id = %s, sent = %s, failed = %s, blocked = %s, status = %s, updated_at = now()
+                WHERE broadcast_id = %s
+                """,
+                (last_user_id, sent, failed, blocked, status, broadcast_id)
+            )
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving broadcast {broadcast_id} checkpoint: {e}")
+        conn.rollback()
+        return False
+    finally:
+        release_db(conn)
+
+
+class UserIdStream:
+    """
+    ব্লক না করা ইউজারদের আইডি user_id ক্রমে সার্ভার-সাইড কার্সর থেকে ব্যাচে দেয়।
+    WITH HOLD কার্সর কমিটের সময় ফলাফল তৈরি করে রাখে, তাই ব্রডকাস্ট চলাকালীন কোনো
+    ট্রানজেকশন খোলা থাকে না (ভ্যাকুয়াম আটকায় না); শুধু পুলের একটি কানেকশন ধরা থাকে।
+    মেথডগুলো ব্লকিং — run_db দিয়ে কল করতে হবে।
+    """
+
+    def __init__(self, broadcast_id, after_user_id=0, fetch_size=BROADCAST_FETCH_SIZE):
+        self.name = f"broadcast_{broadcast_id}"
+        self.after_user_id = after_user_id
+        self.fetch_size = fetch_size
+        self._conn = None
+        self._cur = None
+
+    def open(self):
+        self._conn = connect_db()
+        if not self._conn:
+            raise RuntimeError("No database connection for broadcast stream")
+        self._cur = self._conn.cursor(name=self.name, withhold=True)
+        self._cur.execute(
+            "SELECT user_id FROM users WHERE NOT is_blocked AND user_id > %s ORDER BY user_id",
+            (self.after_user_id,)
+        )
+        self._conn.commit()
+
+    def fetch(self):
+        return [row[0] for row in self._cur.fetchmany(self.fetch_size)]
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            if self._cur is not None:
+                self._cur.close()
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Error closing {self.name}: {e}")
+            self._conn.rollback()
+        finally:
+            release_db(self._conn)
+            self._conn = self._cur = None
+
+
+# --- পাঠানোর ইঞ্জিন ---
+
+class BroadcastJob:
+    def __init__(self, bot, row):
+        self.bot = bot
+        self.broadcast_id = row['broadcast_id']
+        self.admin_chat_id = row['admin_chat_id']
+        self.status_message_id = row['status_message_id']
+        self.text = row['text']
+        self.total = row['total']
+        self.sent = row['sent']
+        self.failed = row['failed']
+        self.blocked = row['blocked']
+        self.last_user_id = row['last_user_id']
+        self.halt = None  # None, 'cancelled' (অ্যাডমিন) বা 'paused' (বট বন্ধ হচ্ছে)
+        self.task = None
+
+        self._bucket = TokenBucket(BROADCAST_RATE, max(1, int(BROADCAST_RATE)))
+        self._inflight = OrderedDict()  # user_id -> done (পাঠানোর ক্রমে)
+        self._blocked_ids = []
+        self._started = time.monotonic()
+        self._processed_at_start = self.processed
+
+    @property
+    def processed(self):
+        return self.sent + self.failed + self.blocked
+
+    async def _reserve(self):
+        # আগে ব্রডকাস্টের নিজস্ব হার, তারপর বটের মোট হার (নোটিফিকেশনের সাথে ভাগ করা)
+        for bucket in (self._bucket, notifier.global_bucket):
+            delay = bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def _send(self, user_id):
+        for attempt in range(BROADCAST_MAX_RETRIES + 1):
+            await self._reserve()
+            try:
+                await self.bot.send_message(chat_id=user_id, text=self.text)
+                self.sent += 1
+                return
+            except RetryAfter as e:
+                retry_after = retry_after_seconds(e.retry_after)
+                logger.warning(f"Broadcast {self.broadcast_id} hit flood limit, pausing {retry_after:.0f}s")
+                self._bucket.pause(retry_after)
+                notifier.global_bucket.pause(retry_after)
+            except Forbidden:
+                # বট ব্লক করা বা অ্যাকাউন্ট মুছে ফেলা — পরের ব্রডকাস্টে বাদ যাবে
+                self.blocked += 1
+                self._blocked_ids.append(user_id)
+                return
+            except BadRequest as e:
+                if "chat not found" in str(e).lower():
+                    self.blocked += 1
+                    self._blocked_ids.append(user_id)
+                else:
+                    self.failed += 1
+                return
+            except NetworkError:
+                await asyncio.sleep(min(2 ** attempt, 10))
+        self.failed += 1
+
+    async def _worker(self, queue):
+        while True:
+            user_id = await queue.get()
+            try:
+                # থামানো হলে বাকি আইডি পাঠানো হয় না এবং "শেষ" ধরা হয় না, তাই কার্সর সেখানেই থামে
+                if self.halt is None:
+                    await self._send(user_id)
+                    self._inflight[user_id] = True
+            except Exception as e:
+                self.failed += 1
+                self._inflight[user_id] = True
+                logger.error(f"Broadcast {self.broadcast_id} error for user {user_id}: {e}")
+            finally:
+                queue.task_done()
+
+    def _advance_cursor(self):
+        # ক্রমানুসারে শেষ হওয়া আইডিগুলো পার হয়ে কার্সর এগোয়; এর আগের সবাই নিশ্চিতভাবে প্রসেসড
+        while self._inflight:
+            user_id, done = next(iter(self._inflight.items()))
+            if not done:
+                break
+            self._inflight.popitem(last=False)
+            self.last_user_id = user_id
+
+    async def _checkpoint(self, status='running'):
+        self._advance_cursor()
+        blocked_ids, self._blocked_ids = self._blocked_ids, []
+        saved = await run_db(
+            save_checkpoint, self.broadcast_id, self.last_user_id,
+            self.sent, self.failed, self.blocked, blocked_ids, status
+        )
+        if not saved:
+            self._blocked_ids.extend(blocked_ids)
+        await self._report(status)
+
+    def progress_text(self, status='running'):
+        elapsed = max(time.monotonic() - self._started, 0.001)
+        rate = (self.processed - self._processed_at_start) / elapsed
+        remaining = max(self.total - self.processed, 0)
+        eta = f"{int(remaining / rate // 60)}m {int(remaining / rate % 60)}s" if rate > 0 else "—"
+        title = {'running': "📣 ব্রডকাস্ট চলছে", 'done': "✅ ব্রডকাস্ট শেষ", 'cancelled': "⏹ ব্রডকাস্ট থামানো হয়েছে"}[status]
+        return (
+            f"{title} (#{self.broadcast_id})\n\n"
+            f"পাঠানো: {self.sent} / {self.total}\n"
+            f"ব্লকড: {self.blocked}, ব্যর্থ: {self.failed}\n"
+            f"গতি: {rate:.1f} মেসেজ/সেকেন্ড, বাকি সময়: {eta if status == 'running' else '—'}"
+        )
+
+    async def _report(self, status='running'):
+        if not self.status_message_id:
+            return
+        markup = None
+        if status == 'running':
+            markup = InlineKeyboardMarkup([[
+                InlineKeyboardButton("⏹ থামান", callback_data=f"bcast_stop_{self.broadcast_id}")
+            ]])
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.admin_chat_id,
+                message_id=self.status_message_id,
+                text=self.progress_text(status),
+                reply_markup=markup,
+            )
+        except Exception as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Could not update broadcast {self.broadcast_id} status message: {e}")
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(BROADCAST_CHECKPOINT_INTERVAL)
+            await self._checkpoint()
+
+    async def run(self):
+        stream = UserIdStream(self.broadcast_id, self.last_user_id)
+        queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 4)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(BROADCAST_CONCURRENCY)]
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            await run_db(stream.open)
+            while self.halt is None:
+                user_ids = await run_db(stream.fetch)
+                if not user_ids:
+                    break
+                for user_id in user_ids:
+                    if self.halt is not None:
+                        break
+                    self._inflight[user_id] = False
+                    await queue.put(user_id)
+            await queue.join()
+        except Exception as e:
+            logger.error(f"Broadcast {self.broadcast_id} stopped by error: {e}")
+            self.halt = self.halt or 'paused'
+            await queue.join()
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(reporter, *workers, return_exceptions=True)
+            await run_db(stream.close)
+
+        # 'paused' হলে 'running' থেকে যায় যাতে পরের স্টার্টে আবার চলে
+        status = {None: 'done', 'cancelled': 'cancelled', 'paused': 'running'}[self.halt]
+        await self._checkpoint(status)
+        logger.info(f"Broadcast {self.broadcast_id} {status}: sent {self.sent}, blocked {self.blocked}, failed {self.failed}")
+
+
+_jobs = {}  # broadcast_id -> BroadcastJob
+
+
+def _start_job(bot, row):
+    job = BroadcastJob(bot, row)
+    job.task = asyncio.create_task(job.run(), name=f"broadcast:{job.broadcast_id}")
+    job.task.add_done_callback(lambda _: _jobs.pop(job.broadcast_id, None))
+    _jobs[job.broadcast_id] = job
+    return job
+
+
+async def resume_broadcasts(bot):
+    """post_init: ক্র্যাশ বা রিস্টার্টে থেমে যাওয়া ব্রডকাস্টগুলো আবার চালু করে।"""
+    for row in await run_db(get_running_broadcasts):
+        logger.info(f"Resuming broadcast {row['broadcast_id']} after user {row['last_user_id']}")
+        _start_job(bot, row)
+
+
+async def pause_broadcasts(timeout=15.0):
+    """post_stop: চলমান ব্রডকাস্ট থামিয়ে চেকপয়েন্ট লেখে (স্ট্যাটাস 'running' থাকে)।"""
+    jobs = list(_jobs.values())
+    for job in jobs:
+        job.halt = job.halt or 'paused'
+    if jobs:
+        await asyncio.wait([job.task for job in jobs], timeout=timeout)
+
+
+# --- হ্যান্ডলার ---
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/broadcast <মেসেজ> — সব (ব্লক না করা) ইউজারকে মেসেজ পাঠায় (কনফার্মের পর)"""
+    if str(update.effective_user.id) != str(ADMIN_ID):
+        return
+
+    if not _broadcasts_enabled:
+        await update.message.reply_text(BROADCAST_UNSUPPORTED_TEXT)
+        return
+    parts = update.message.text.split(None, 1)
+    if len(parts) < 2 or not parts[1].strip():
+        await update.message.reply_text("ব্যবহার: /broadcast <মেসেজ>")
+        return
+    if _jobs:
+        await update.message.reply_text(f"একটি ব্রডকাস্ট (#{next(iter(_jobs))}) এখনো চলছে।")
+        return
+
+    context.user_data['broadcast_text'] = parts[1]
+    keyboard = [[
+        InlineKeyboardButton("📣 হ্যাঁ, সবাইকে পাঠান", callback_data="bcast_ok_0"),
+        InlineKeyboardButton("↩️ না", callback_data="bcast_cancel_0"),
+    ]]
+    await update.message.reply_text(
+        f"নিচের মেসেজটি সব ইউজারকে পাঠানো হবে:\n\n{parts[1]}",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+
+async def broadcast_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """ব্রডকাস্ট কনফার্ম/বাতিল এবং চলমান ব্রডকাস্ট থামানো"""
+    query = update.callback_query
+    if str(query.from_user.id) != str(ADMIN_ID):
+        await query.answer("আপনি এই অ্যাকশনের জন্য অনুমোদিত নন।")
+        return
+
+    _, action, broadcast_id = query.data.split('_')
+    if action == 'stop':
+        job = _jobs.get(int(broadcast_id))
+        if job is None:
+            await query.answer("এই ব্রডকাস্টটি আর চলছে না।")
+            return
+        job.halt = 'cancelled'
+        await query.answer("থামানো হচ্ছে...")
+        return
+
+    text = context.user_data.pop('broadcast_text', None)
+    if action == 'cancel' or text is None:
+        await query.answer()
+        await query.edit_message_text("ব্রডকাস্ট বাতিল করা হলো।")
+        return
+    if _jobs:
+        await query.answer("আরেকটি ব্রডকাস্ট চলছে।", show_alert=True)
+        return
+    if not _broadcasts_enabled:
+        await query.answer()
+        await query.edit_message_text(BROADCAST_UNSUPPORTED_TEXT)
+        return
+
+    await query.answer()
+    created = await run_db(create_broadcast, query.message.chat_id, query.message.message_id, text)
+    if created is None:
+        await query.edit_message_text("❌ ডেটাবেস সমস্যা — ব্রডকাস্ট শুরু হয়নি।")
+        return
+    broadcast_id, total = created
+
+    job = _start_job(context.bot, {
+        'broadcast_id': broadcast_id, 'admin_chat_id': query.message.chat_id,
+        'status_message_id': query.message.message_id, 'text': text, 'total': total,
+        'sent': 0, 'failed': 0, 'blocked': 0, 'last_user_id': 0,
+    })
+    logger.info(f"Admin {query.from_user.id} started broadcast {broadcast_id}")
+    await query.edit_message_text(job.progress_text())
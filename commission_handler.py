@@ -0,0 +1,273 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from decimal import Decimal, ROUND_DOWN
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db
+from user_cache import user_cache
+from async_db import run_db
+
+logger = logging.getLogger(__name__)
+
+# --- 💸 মাল্টি-লেভেল রেফারেল কমিশন ---
+# প্রিমিয়াম চালু বা ভেরিফাই accept হলে ইউজারের রেফারার-চেইনের ওপরের COMMISSION_RATES-এর সমান লেভেল পর্যন্ত
+# প্রত্যেকে base × রেট কমিশন পান (লেভেল ১ = সরাসরি রেফারার, REFER স্ক্রিনের 25%)। চেইন (পূর্বপুরুষের তালিকা)
+# AncestorCache-এ থাকে — referrer_id রেজিস্ট্রেশনের পর বদলায় না, তাই ইনভ্যালিডেশন লাগে না; মিস হলে একটি
+# রিকার্সিভ CTE পুরো চেইন আনে। এক বা একাধিক ইভেন্টের সব কমিশন একটি INSERT (unnest) — প্রতি ইভেন্টে একবার লেখা।
+# ref = 'commission:<ইভেন্ট>:<লেভেল>' ইউনিক (migrations/0013_commissions.sql), তাই আবার সেটল করলে দ্বিগুণ হয় না।
+#
+# সেটলমেন্ট মূল সিদ্ধান্তের ট্রানজেকশনের পরে চলে; মাঝে প্রসেস থামলে নাইটলি অডিট (commission_audit_job /
+# python manage.py recompute-commissions) পুরো রেফারেল ফরেস্ট এক পাসে হিসাব করে বাদ পড়া কমিশন বসিয়ে দেয়।
+COMMISSION_RATES = tuple(
+    Decimal(rate) for rate in os.environ.get("COMMISSION_RATES", "0.25,0.05,0.02").split(",") if rate.strip()
+)
+# /setpremium-এ টাকার পরিমাণ না দিলে প্রিমিয়ামের কমিশনের ভিত্তি (0 = কমিশন নেই)
+PREMIUM_PRICE = Decimal(os.environ.get("PREMIUM_PRICE", "0"))
+ANCESTOR_CACHE_SIZE = int(os.environ.get("ANCESTOR_CACHE_SIZE", "50000"))
+COMMISSION_AUDIT_HOUR = int(os.environ.get("COMMISSION_AUDIT_HOUR", "3"))  # UTC
+AUDIT_FETCH_SIZE = 10000
+_CENT = Decimal("0.01")
+
+
+def commission_ref(event, level):
+    return f"commission:{event}:{level}"
+
+
+def compute_commissions(event, ancestors, base, rates=COMMISSION_RATES):
+    """একটি ইভেন্টের [(recipient, amount, ref)]; শূন্য টাকার লেভেল বাদ (পয়সা নিচে রাউন্ড)।"""
+    base = Decimal(str(base))
+    entries = []
+    for level, (recipient, rate) in enumerate(zip(ancestors, rates), start=1):
+        amount = (base * rate).quantize(_CENT, rounding=ROUND_DOWN)
+        if amount > 0:
+            entries.append((recipient, amount, commission_ref(event, level)))
+    return entries
+
+
+class AncestorCache:
+    """user_id -> রেফারার-চেইন (কাছের থেকে দূরে, সর্বোচ্চ depth জন) এর থ্রেড-সেফ LRU ক্যাশ।"""
+
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            chain = self._data.get(user_id)
+            if chain is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self._hits += 1
+            return chain
+
+    def set(self, user_id, chain):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[user_id] = chain
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0,
+            }
+
+
+ancestor_cache = AncestorCache(max_size=ANCESTOR_CACHE_SIZE)
+
+# ব্যাচের যেসব ইউজারের চেইন ক্যাশে নেই তাদের সবার চেইন একটি স্টেটমেন্টে (প্রতি লেভেলে একটি ইনডেক্স লুকআপ)
+ANCESTORS_SQL = """
+    WITH RECURSIVE chain (origin, user_id, level) AS (
+        SELECT user_id, referrer_id, 1 FROM users
+        WHERE user_id = ANY(%(user_ids)s) AND referrer_id IS NOT NULL
+        UNION ALL
+        SELECT c.origin, u.referrer_id, c.level + 1
+        FROM chain c JOIN users u ON u.user_id = c.user_id
+        WHERE c.level < %(depth)s AND u.referrer_id IS NOT NULL
+    )
+    SELECT origin, user_id FROM chain ORDER BY origin, level
+"""
+
+SETTLE_COMMISSIONS_SQL = """
+    INSERT INTO ledger_entries (user_id, kind, amount, ref)
+    SELECT recipient, 'refer_balance', amount, ref
+    FROM unnest(%(recipients)s::bigint[], %(amounts)s::numeric[], %(refs)s::text[]) AS c (recipient, amount, ref)
+    ON CONFLICT (ref) WHERE ref LIKE 'commission:%%' DO NOTHING
+    RETURNING user_id, amount
+"""
+
+
+def _load_ancestors(cur, user_ids, depth):
+    """ক্যাশ-মিস ইউজারদের চেইন DB থেকে এনে ক্যাশে রাখে; {user_id: chain}।"""
+    cur.execute(ANCESTORS_SQL, {'user_ids': list(user_ids), 'depth': depth})
+    chains = {user_id: [] for user_id in user_ids}
+    for origin, ancestor in cur.fetchall():
+        chains[origin].append(ancestor)
+    for user_id, chain in chains.items():
+        chains[user_id] = tuple(chain)
+        ancestor_cache.set(user_id, chains[user_id])
+    return chains
+
+
+def settle_commissions(events, rates=COMMISSION_RATES):
+    """
+    কমিশন ইভেন্ট সেটল করে। events: [(event, user_id, base)] — event ইউনিক নাম (যেমন 'verify:123')।
+    সব ইভেন্টের সব লেভেল একটি INSERT-এ; আগে সেটল হওয়া ref বাদ যায়।
+    রিটার্ন: (নতুন এন্ট্রির সংখ্যা, মোট টাকা); ত্রুটিতে None।
+    """
+    events = [(event, user_id, base) for event, user_id, base in events if base and Decimal(str(base)) > 0]
+    if not events or not rates:
+        return 0, Decimal("0")
+    conn = connect_db()
+    if not conn:
+        return None
+
+    credited = []
+    try:
+        with conn.cursor() as cur:
+            chains = {}
+            for _, user_id, _ in events:
+                chain = ancestor_cache.get(user_id)
+                if chain is not None:
+                    chains[user_id] = chain
+            missing = {user_id for _, user_id, _ in events} - chains.keys()
+            if missing:
+                chains.update(_load_ancestors(cur, missing, len(rates)))
+
+            entries = [
+                entry
+                for event, user_id, base in events
+                for entry in compute_commissions(event, chains[user_id], base, rates)
+            ]
+            if entries:
+                recipients, amounts, refs = zip(*entries)
+                cur.execute(SETTLE_COMMISSIONS_SQL, {
+                    'recipients': list(recipients), 'amounts': list(amounts), 'refs': list(refs),
+                })
+                credited = cur.fetchall()
+        conn.commit()
+        return len(credited), sum((amount for _, amount in credited), Decimal("0"))
+    except Exception as e:
+        logger.error(f"Error settling commissions for {[event for event, _, _ in events][:10]}: {e}")
+        conn.rollback()
+        credited = []
+        return None
+    finally:
+        user_cache.invalidate(*{user_id for user_id, _ in credited})
+        release_db(conn)
+
+
+def premium_event(user_id, expiry_date):
+    """প্রিমিয়াম চালুর ইভেন্ট নাম: একই মেয়াদে আবার /setpremium দিলে একই নাম, তাই কমিশন একবারই।"""
+    return f"premium:{user_id}:{expiry_date:%Y%m%d}"
+
+
+# --- নাইটলি রিকম্পিউট/অডিট ---
+# পুরো রেফারেল ফরেস্ট এক পাসে: users থেকে প্যারেন্ট পয়েন্টার (একবার স্ট্রিম), তারপর প্রতিটি accept হওয়া
+# ভেরিফাই ইভেন্টের চেইন মেমরিতে হেঁটে প্রত্যাশিত কমিশন, লেজারে থাকা commission:verify:* এর সাথে মেলানো।
+# প্রিমিয়াম ইভেন্টের ভিত্তি কোথাও রাখা হয় না, তাই সেগুলোর শুধু প্রাপক (চেইনের সঠিক লেভেল) যাচাই হয়।
+
+def _stream(conn, name, query):
+    cur = conn.cursor(name=name)
+    cur.itersize = AUDIT_FETCH_SIZE
+    cur.execute(query)
+    return cur
+
+
+def audit_commissions(verify_amount, apply=False, rates=COMMISSION_RATES):
+    """
+    সব কমিশন এক পাসে নতুন করে হিসাব করে লেজারের সাথে মেলায়। apply=True হলে বাদ পড়া কমিশন বসানো হয়
+    (ON CONFLICT-এ নিরাপদ)। রিটার্ন: stats ডিকশনারি; ত্রুটিতে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+    started = time.monotonic()
+    stats = {'users': 0, 'events': 0, 'expected': 0, 'missing': 0, 'mismatched': 0, 'orphaned': 0, 'inserted': 0}
+    try:
+        parent = {}
+        with _stream(conn, "commission_forest", "SELECT user_id, referrer_id FROM users WHERE referrer_id IS NOT NULL") as cur:
+            for user_id, referrer_id in cur:
+                parent[user_id] = referrer_id
+        stats['users'] = len(parent)
+
+        existing = {}
+        with _stream(conn, "commission_ledger", "SELECT ref, user_id, amount FROM ledger_entries WHERE ref LIKE 'commission:%'") as cur:
+            for ref, user_id, amount in cur:
+                existing[ref] = (user_id, amount)
+
+        def ancestors(user_id):
+            chain, node = [], user_id
+            while len(chain) < len(rates) and node in parent:
+                node = parent[node]
+                chain.append(node)
+            return chain
+
+        missing = []
+        with _stream(conn, "commission_events", "SELECT request_id, user_id, amount FROM verify_requests WHERE status = 'accept'") as cur:
+            for request_id, user_id, amount in cur:
+                stats['events'] += 1
+                base = amount if amount is not None else verify_amount
+                for recipient, expected, ref in compute_commissions(f"verify:{request_id}", ancestors(user_id), base, rates):
+                    stats['expected'] += 1
+                    found = existing.pop(ref, None)
+                    if found is None:
+                        missing.append((recipient, expected, ref))
+                    elif found[0] != recipient or found[1] != expected:
+                        stats['mismatched'] += 1
+                        logger.warning(f"Commission {ref}: ledger {found}, expected ({recipient}, {expected})")
+
+        # বাকি থাকা কমিশন: ভেরিফাই হলে রিকোয়েস্টটি আর accept নয় (শুধু গোনা হয়); প্রিমিয়াম হলে প্রাপক
+        # চেইনের সেই লেভেলে আছেন কি না
+        for ref, (recipient, _) in existing.items():
+            _, kind, *source, level = ref.split(":")
+            if kind == 'verify':
+                stats['orphaned'] += 1
+            elif kind == 'premium':
+                chain = ancestors(int(source[0]))
+                if int(level) > len(chain) or chain[int(level) - 1] != recipient:
+                    stats['mismatched'] += 1
+                    logger.warning(f"Commission {ref}: recipient {recipient} is not level {level} of {source[0]}")
+        conn.rollback()
+
+        stats['missing'] = len(missing)
+        if apply and missing:
+            with conn.cursor() as cur:
+                recipients, amounts, refs = zip(*missing)
+                cur.execute(SETTLE_COMMISSIONS_SQL, {
+                    'recipients': list(recipients), 'amounts': list(amounts), 'refs': list(refs),
+                })
+                credited = cur.fetchall()
+            conn.commit()
+            stats['inserted'] = len(credited)
+            user_cache.invalidate(*{user_id for user_id, _ in credited})
+        stats['seconds'] = round(time.monotonic() - started, 2)
+        return stats
+    except Exception as e:
+        logger.error(f"Error auditing commissions: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+async def commission_audit_job(context: ContextTypes.DEFAULT_TYPE):
+    """নাইটলি: বাদ পড়া ভেরিফাই কমিশন বসানো ও অমিল লগ করা (JobQueue থেকে দিনে একবার)"""
+    from verify_handler import VERIFY_AMOUNT
+    stats = await run_db(audit_commissions, VERIFY_AMOUNT, True)
+    if stats is not None:
+        logger.info(f"Commission audit: {stats}")
@@ -1,226 +1,755 @@
 import os
+import time
+import threading
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import logging
 
+from user_cache import user_cache
+
 logger = logging.getLogger(__name__)
 
-# ডেটাবেস সংযোগের URL এনভায়রনমেন্ট ভেরিয়েবল থেকে নেওয়া
+# ডেটাবেস সংযোগের URL এনভায়রনমেন্ট ভেরিয়েবল থেকে নেওয়া
 DATABASE_URL = os.environ.get("DATABASE_URL")
+DB_SSLMODE = os.environ.get("DB_SSLMODE", "prefer")
+
+# পুল সেটিংস (এনভায়রনমেন্ট ভেরিয়েবল দিয়ে পরিবর্তন করা যায়)
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", "5"))  # সেকেন্ড
+DB_POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", "300"))  # এর বেশি অলস থাকলে বন্ধ
+DB_POOL_HEALTHCHECK_AFTER = float(os.environ.get("DB_POOL_HEALTHCHECK_AFTER", "30"))  # এর বেশি অলস থাকলে SELECT 1
+
+
+# --- কানেকশন পুল ---
+class PoolTimeout(Exception):
+    """নির্দিষ্ট সময়ের মধ্যে পুল থেকে কানেকশন পাওয়া যায়নি।"""
+
+
+class ConnectionPool:
+    """
+    থ্রেড-সেফ, সীমাবদ্ধ psycopg2 কানেকশন পুল।
+    প্রতিটি বাটন চাপে নতুন TCP+TLS হ্যান্ডশেক না করে আগের কানেকশন আবার ব্যবহার করে।
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, acquire_timeout=5.0,
+                 max_idle=300.0, healthcheck_after=30.0, **connect_kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.healthcheck_after = healthcheck_after
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, released_at)] — শেষে থাকা কানেকশন সবচেয়ে নতুন
+        self._size = 0  # খোলা কানেকশনের মোট সংখ্যা (idle + in use)
+        self._closed = False
+
+        # মেট্রিক্স
+        self._acquires = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn, **self.connect_kwargs)
+
+    def _discard(self, conn):
+        """পুলের বাইরে যাওয়া কানেকশন সরাসরি বন্ধ করে (release()-এ ফেরত পাঠানো যাবে না — তাহলে আবার idle-এ ঢোকে)।"""
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Dropping unhealthy pooled connection: {e}")
+            return False
+
+    def _evict_idle(self, now):
+        """min_size এর উপরের যেসব কানেকশন max_idle এর বেশি সময় অলস, সেগুলো বন্ধ করে। (_cond ধরে রেখে কল করতে হবে)"""
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            self._discard(conn)
+
+    def open(self):
+        """min_size সংখ্যক কানেকশন আগে থেকেই খুলে রাখে।"""
+        with self._cond:
+            self._closed = False
+            while self._size < self.min_size:
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+                self._created += 1
+        logger.info(f"Database pool opened (min={self.min_size}, max={self.max_size}).")
+
+    def acquire(self, timeout=None):
+        """পুল থেকে একটি কানেকশন নেয়; timeout পার হলে PoolTimeout।"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                now = time.monotonic()
+                self._evict_idle(now)
+
+                while self._idle:
+                    conn, released_at = self._idle.pop()
+                    if self._is_healthy(conn, now - released_at):
+                        return self._record_acquire(conn, started, waited)
+                    self._size -= 1
+                    self._discard(conn)
+
+                if self._size < self.max_size:
+                    # কানেকশন তৈরির সময় অন্য থ্রেড যেন আটকে না থাকে, তাই আগে জায়গা রিজার্ভ করা হয়
+                    self._size += 1
+                    break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"Timed out after {timeout:.1f}s waiting for a database connection")
+                waited = True
+                self._cond.wait(remaining)
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+            return self._record_acquire(conn, started, waited)
+
+    def _record_acquire(self, conn, started, waited):
+        wait = time.monotonic() - started
+        self._acquires += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        if waited:
+            self._waits += 1
+        return conn
+
+    def release(self, conn):
+        """কানেকশন পুলে ফেরত দেয়। অসমাপ্ত ট্রানজেকশন থাকলে rollback করা হয়।"""
+        healthy = not conn.closed
+        if healthy and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        with self._cond:
+            if healthy and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discard(conn)
+            self._cond.notify()
+
+    def close(self):
+        """সব অলস কানেকশন বন্ধ করে; ব্যবহাররত কানেকশন ফেরত আসার সময় বন্ধ হবে।"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(conn)
+            self._cond.notify_all()
+        logger.info("Database pool closed.")
+
+    def stats(self):
+        """পুলের অবস্থা ও ওয়েট মেট্রিক্স দেয়।"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'acquires': self._acquires,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_avg_ms': (self._wait_total / self._acquires * 1000) if self._acquires else 0.0,
+                'wait_max_ms': self._wait_max * 1000,
+                'created': self._created,
+                'discarded': self._discarded,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool():
+    """Application চালুর সময় একবার কল করা হয় (post_init)।"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        if not DATABASE_URL:
+            logger.error("DATABASE_URL environment variable is not set.")
+            return None
+        pool = ConnectionPool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+            max_idle=DB_POOL_MAX_IDLE,
+            healthcheck_after=DB_POOL_HEALTHCHECK_AFTER,
+            sslmode=DB_SSLMODE,
+        )
+        pool.open()
+        _pool = pool
+        return _pool
+
+
+def close_pool():
+    """Application বন্ধের সময় কল করা হয় (post_shutdown)।"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pool_stats():
+    return _pool.stats() if _pool else {}
+
 
 def connect_db():
-    """ডেটাবেসের সাথে সংযোগ স্থাপন করে।"""
+    """পুল থেকে একটি কানেকশন নেয়। কাজ শেষে অবশ্যই release_db() দিয়ে ফেরত দিতে হবে।"""
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
+        pool = _pool or init_pool()
+        if pool is None:
+            return None
+        return pool.acquire()
     except Exception as e:
         logger.error(f"Error connecting to database: {e}")
         return None
 
-def create_table_if_not_exists():
-    """ইউজার, উইথড্র রিকোয়েস্ট, এবং অন্যান্য প্রয়োজনীয় টেবিল তৈরি করে।"""
-    conn = connect_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-            # 1. ইউজার টেবিল
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    username VARCHAR(50),
-                    first_name VARCHAR(50),
-                    balance NUMERIC(10, 2) DEFAULT 0.00,
-                    wallet_address VARCHAR(100),
-                    referred_by BIGINT,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            # 2. উইথড্র রিকোয়েস্ট টেবিল (Withdrawal Requests)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS withdraw_requests (
-                    request_id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    amount NUMERIC(10, 2) NOT NULL,
-                    wallet_address VARCHAR(100) NOT NULL,
-                    status VARCHAR(20) DEFAULT 'pending', -- 'pending', 'completed', 'rejected'
-                    requested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            # 3. VERIFICATION টেবিল (যদি আপনার ভেরিফিকেশন সিস্টেম থাকে)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS verification_requests (
-                    verify_id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    txn_id VARCHAR(50) UNIQUE NOT NULL,
-                    amount NUMERIC(10, 2),
-                    status VARCHAR(20) DEFAULT 'pending', 
-                    method VARCHAR(10),
-                    requested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            conn.commit()
-            logger.info("Database tables checked/completed successfully.")
-        except Exception as e:
-            logger.error(f"Error creating tables: {e}")
-        finally:
-            conn.close()
+
+def release_db(conn):
+    """connect_db() থেকে নেওয়া কানেকশন পুলে ফেরত দেয়।"""
+    if conn is None:
+        return
+    if _pool is not None:
+        _pool.release(conn)
+    else:
+        conn.close()
+
 
 # --- হ্যান্ডলারের জন্য প্রয়োজনীয় অন্যান্য DB ফাংশন ---
 
-def get_user_balance(user_id):
-    """ইউজারের বর্তমান ব্যালেন্স দেয়।"""
+# ইউজার স্ন্যাপশটে যে কলামগুলো থাকে (PROFILE, REFER, VERIFY, WITHDRAW স্ক্রিনের সব তথ্য)
+USER_SNAPSHOT_COLUMNS = (
+    'user_id', 'username', 'first_name', 'is_premium', 'expiry_date', 'is_verified', 'verify_expiry',
+    'referrer_id', 'balance', 'premium_balance', 'free_income', 'refer_balance',
+    'salary_balance', 'total_withdraw', 'wallet_address', 'free_referrals', 'premium_referrals',
+)
+
+# লেজারের kind = কোন ব্যালেন্স (migrations/0004_ledger.sql-এর CHECK-এর সাথে মিল রাখতে হবে)
+LEDGER_KINDS = ('balance', 'premium_balance', 'free_income', 'refer_balance', 'salary_balance', 'total_withdraw')
+LEDGER_COMPACT_BATCH = int(os.environ.get("LEDGER_COMPACT_BATCH", "5000"))
+
+# ব্যালেন্স = user_balances (কমপ্যাক্ট করা যোগফল) + এখনো কমপ্যাক্ট না হওয়া এন্ট্রির যোগফল।
+# একই স্টেটমেন্টে পড়া হয়, তাই কমপ্যাক্টশন চলার সময়ও একটি এন্ট্রি দুবার বা শূন্যবার গোনা হয় না।
+_LEDGER_PENDING_SUMS = ", ".join(
+    f"SUM(amount) FILTER (WHERE kind = '{kind}') AS {kind}" for kind in LEDGER_KINDS
+)
+USER_SNAPSHOT_SQL = f"""
+    SELECT {', '.join(
+        f"COALESCE(b.{column}, 0) + COALESCE(t.{column}, 0)" if column in LEDGER_KINDS else f"u.{column}"
+        for column in USER_SNAPSHOT_COLUMNS
+    )}
+    FROM users u
+    LEFT JOIN user_balances b ON b.user_id = u.user_id
+    LEFT JOIN LATERAL (
+        SELECT {_LEDGER_PENDING_SUMS}
+        FROM ledger_entries e
+        WHERE e.user_id = u.user_id AND NOT e.compacted
+    ) t ON TRUE
+    WHERE u.user_id = %s
+"""
+
+
+def get_user_snapshot(user_id):
+    """
+    ইউজারের সারি dict হিসেবে দেয় (আগে user_cache দেখে, না পেলে DB থেকে পড়ে ক্যাশ করে)।
+    ইউজার না থাকলে {}, সংযোগ বা কুয়েরি ব্যর্থ হলে None।
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
     conn = connect_db()
     if conn:
         try:
             cur = conn.cursor()
-            cur.execute("SELECT balance FROM users WHERE user_id = %s", (user_id,))
+            cur.execute(USER_SNAPSHOT_SQL, (user_id,))
             result = cur.fetchone()
-            return result[0] if result else 0.00
+            if not result:
+                return {}
+            snapshot = dict(zip(USER_SNAPSHOT_COLUMNS, result))
+            user_cache.set(user_id, snapshot)
+            return snapshot
         except Exception as e:
-            logger.error(f"Error getting balance: {e}")
-            return 0.00
+            logger.error(f"Error getting user snapshot for {user_id}: {e}")
+            return None
         finally:
-            conn.close()
+            release_db(conn)
+
+def get_user_balance(user_id):
+    """ইউজারের বর্তমান ব্যালেন্স দেয়।"""
+    snapshot = get_user_snapshot(user_id)
+    if snapshot is None:
+        return 0.00
+    return snapshot.get('balance') or 0.00
 
-def update_balance(user_id, amount_change):
-    """ইউজারের ব্যালেন্স পরিবর্তন করে।"""
+def add_ledger_entry(user_id, kind, amount, ref=None):
+    """লেজারে একটি এন্ট্রি যোগ করে (শুধু INSERT, কোনো সারি লক হয় না)। entry_id রিটার্ন করে; ত্রুটিতে None।"""
+    if kind not in LEDGER_KINDS:
+        raise ValueError(f"Unknown ledger kind: {kind}")
     conn = connect_db()
     if conn:
         try:
             cur = conn.cursor()
             cur.execute(
-                "UPDATE users SET balance = balance + %s WHERE user_id = %s",
-                (amount_change, user_id)
+                "INSERT INTO ledger_entries (user_id, kind, amount, ref) VALUES (%s, %s, %s, %s) RETURNING entry_id",
+                (user_id, kind, amount, ref)
             )
+            entry_id = cur.fetchone()[0]
             conn.commit()
+            return entry_id
         except Exception as e:
-            logger.error(f"Error updating balance: {e}")
+            logger.error(f"Error adding ledger entry for {user_id}: {e}")
+            conn.rollback()
+            return None
         finally:
-            conn.close()
+            user_cache.invalidate(user_id)
+            release_db(conn)
+
+def update_balance(user_id, amount_change, ref=None):
+    """ইউজারের ব্যালেন্স পরিবর্তন করে (লেজারে 'balance' এন্ট্রি হিসেবে)।"""
+    return add_ledger_entry(user_id, 'balance', amount_change, ref)
             
 def get_user_data(user_id):
-    """উইথড্র এবং প্রোফাইল হ্যান্ডলারের জন্য ইউজারের ডেটা (যেমন: ওয়ালেট) দেয়।"""
-    conn = connect_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT username, first_name, wallet_address FROM users WHERE user_id = %s",
-                (user_id,)
-            )
-            result = cur.fetchone()
-            if result:
-                return {
-                    'username': result[0], 
-                    'first_name': result[1],
-                    'wallet_address': result[2] 
-                }
-            return {}
-        except Exception as e:
-            logger.error(f"Error getting user data: {e}")
-            return {}
-        finally:
-            conn.close()
+    """উইথড্র এবং প্রোফাইল হ্যান্ডলারের জন্য ইউজারের ডেটা (যেমন: ওয়ালেট) দেয়।"""
+    snapshot = get_user_snapshot(user_id)
+    if not snapshot:
+        return {}
+    return {
+        'username': snapshot['username'], 
+        'first_name': snapshot['first_name'],
+        'wallet_address': snapshot['wallet_address'] 
+    }
             
 # --- WITHDRAWAL ফাংশন ---
 
-def record_withdraw_request(user_id, amount, wallet_address):
-    """নতুন উত্তোলন অনুরোধ ডেটাবেসে সংরক্ষণ করে।"""
+def _available_balance(cur, user_id, kind='balance'):
+    cur.execute(
+        f"""
+        SELECT COALESCE((SELECT {kind} FROM user_balances WHERE user_id = %s), 0)
+             + COALESCE((SELECT SUM(amount) FROM ledger_entries
+                         WHERE user_id = %s AND kind = %s AND NOT compacted), 0)
+        """,
+        (user_id, user_id, kind)
+    )
+    return cur.fetchone()[0]
+
+def _find_withdraw_by_key(cur, idempotency_key):
+    cur.execute("SELECT request_id FROM withdraw_requests WHERE idempotency_key = %s", (idempotency_key,))
+    result = cur.fetchone()
+    return result[0] if result else None
+
+def withdraw(user_id, amount, wallet_address, idempotency_key):
+    """
+    একটি ট্রানজেকশনে ব্যালেন্স চেক করে, লেজারে ডেবিট এন্ট্রি লেখে এবং উত্তোলন অনুরোধ তৈরি করে।
+    রিটার্ন: (status, request_id) — status হলো 'created', 'duplicate' (এই key দিয়ে আগেই
+    তৈরি হয়েছে), বা 'insufficient' (request_id None); সংযোগ বা কুয়েরি ব্যর্থ হলে (None, None)।
+    """
     conn = connect_db()
-    if conn:
+    if not conn:
+        return (None, None)
+    try:
+        cur = conn.cursor()
         try:
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO withdraw_requests (user_id, amount, wallet_address) VALUES (%s, %s, %s) RETURNING request_id",
-                (user_id, amount, wallet_address)
-            )
-            request_id = cur.fetchone()[0]
+            created_id, existing_id = None, None
+            # ইউজারের সারি লক করে একই ইউজারের উইথড্রগুলো একটার পর একটা চালানো হয়। লকের পরের
+            # স্টেটমেন্টগুলো নতুন স্ন্যাপশট পায়, তাই আগের উইথড্রর ডেবিট দেখা যায়।
+            cur.execute("SELECT 1 FROM users WHERE user_id = %s FOR NO KEY UPDATE", (user_id,))
+            if cur.fetchone():
+                existing_id = _find_withdraw_by_key(cur, idempotency_key)
+                if existing_id is None and _available_balance(cur, user_id) >= amount:
+                    cur.execute(
+                        """
+                        INSERT INTO withdraw_requests (user_id, amount, wallet_address, idempotency_key)
+                        VALUES (%s, %s, %s, %s) RETURNING request_id
+                        """,
+                        (user_id, amount, wallet_address, idempotency_key)
+                    )
+                    created_id = cur.fetchone()[0]
+                    cur.execute(
+                        "INSERT INTO ledger_entries (user_id, kind, amount, ref) VALUES (%s, 'balance', %s, %s)",
+                        (user_id, -amount, f"withdraw:{created_id}")
+                    )
             conn.commit()
-            return request_id
-        except Exception as e:
-            logger.error(f"Error recording withdrawal request: {e}")
-            return None
-        finally:
-            conn.close()
-            
-def get_pending_withdrawals():
-    """অ্যাডমিনের জন্য পেন্ডিং উত্তোলন অনুরোধগুলির তালিকা দেয়।"""
+        except psycopg2.errors.UniqueViolation:
+            # একই key-এর আরেকটি অনুরোধ একই সময়ে কমিট হয়েছে
+            conn.rollback()
+            created_id, existing_id = None, _find_withdraw_by_key(cur, idempotency_key)
+            conn.rollback()
+
+        if created_id:
+            return ('created', created_id)
+        if existing_id:
+            return ('duplicate', existing_id)
+        return ('insufficient', None)
+    except Exception as e:
+        logger.error(f"Error processing withdrawal for {user_id}: {e}")
+        conn.rollback()
+        return (None, None)
+    finally:
+        user_cache.invalidate(user_id)
+        release_db(conn)
+
+# --- অ্যাডমিন রিভিউ কিউ (keyset পেজিনেশন) ---
+# পেন্ডিং সারিগুলো (requested_at, request_id) ক্রমে; 0006 মাইগ্রেশনের পার্শিয়াল ইনডেক্স
+# এই ক্রমেই সাজানো, তাই প্রতিটি পেজ ইনডেক্স থেকে শুধু limit+1টি সারি পড়ে — OFFSET বা
+# fetchall নেই। cursor হলো আগের পেজের প্রথম/শেষ request_id।
+PENDING_QUEUES = {
+    'withdraw': ("withdraw_requests", ("request_id", "user_id", "amount", "wallet_address", "requested_at")),
+    'verify': ("verify_requests", ("request_id", "user_id", "amount", "method", "tnx_id", "requested_at")),
+}
+
+
+def get_pending_page(kind, cursor=None, direction='next', limit=10):
+    """
+    একটি পেজ পেন্ডিং রিকোয়েস্ট দেয়: cursor-এর পরের (next) বা আগের (prev) সর্বোচ্চ limitটি।
+    রিটার্ন: (rows, has_more) — rows ডিকশনারির তালিকা (সবসময় পুরনো থেকে নতুন ক্রমে),
+    has_more মানে ওই দিকে আরও সারি আছে; ত্রুটিতে None।
+    """
+    table, columns = PENDING_QUEUES[kind]
+    column_list = ", ".join(columns)
+    forward = direction == 'next'
+    if cursor is None:
+        where = ""
+    else:
+        where = (
+            f"AND (requested_at, request_id) {'>' if forward else '<'} "
+            f"(SELECT requested_at, request_id FROM {table} WHERE request_id = %(cursor)s)"
+        )
+    order = "ASC" if forward else "DESC"
+    query = f"""
+        SELECT {column_list} FROM {table}
+        WHERE status = 'pending' {where}
+        ORDER BY requested_at {order}, request_id {order}
+        LIMIT %(limit)s
+    """
+
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, {'cursor': cursor, 'limit': limit + 1})
+            rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        conn.rollback()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not forward:
+            rows.reverse()
+        return rows, has_more
+    except Exception as e:
+        logger.error(f"Error fetching pending {kind} page: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+# পেজ/বাল্ক সিদ্ধান্ত: একটি স্টেটমেন্টে স্ট্যাটাস বদল ও লেজার এন্ট্রি (completed হলে
+# total_withdraw, rejected হলে টাকা ফেরত)। status = 'pending' শর্তের কারণে একই অনুরোধ
+# দুবার সিদ্ধান্ত পায় না — একসাথে চলা আরেকটি রিভিউ শুধু বাকি সারিগুলো পায়।
+REVIEW_WITHDRAWALS_SQL = """
+    WITH decided AS (
+        UPDATE withdraw_requests SET status = %(status)s
+        WHERE request_id = ANY(%(ids)s) AND status = 'pending'
+        RETURNING request_id, user_id, amount
+    ), posted AS (
+        INSERT INTO ledger_entries (user_id, kind, amount, ref)
+        SELECT user_id, %(kind)s, amount, %(ref)s || request_id FROM decided
+    )
+    SELECT request_id, user_id, amount FROM decided ORDER BY request_id
+"""
+
+WITHDRAW_REVIEW_POSTINGS = {
+    'completed': ('total_withdraw', 'withdraw:'),
+    'rejected': ('balance', 'withdraw_refund:'),
+}
+
+
+def _review_withdrawals(cur, request_ids, status):
+    kind, ref = WITHDRAW_REVIEW_POSTINGS[status]
+    cur.execute(REVIEW_WITHDRAWALS_SQL, {'status': status, 'ids': list(request_ids), 'kind': kind, 'ref': ref})
+    return cur.fetchall()
+
+
+def review_withdrawals(request_ids, status):
+    """
+    একাধিক পেন্ডিং উত্তোলন অনুরোধ এক ট্রানজেকশনে 'completed' বা 'rejected' করে
+    (রিফান্ডসহ; একক অনুরোধের সিদ্ধান্তও এটিই ব্যবহার করে)।
+    রিটার্ন: যেগুলো সত্যিই পেন্ডিং ছিল তাদের [(request_id, user_id, amount)]; ত্রুটিতে None।
+    """
+    if status not in WITHDRAW_REVIEW_POSTINGS:
+        raise ValueError(f"Unknown withdraw review status: {status}")
+    if not request_ids:
+        return []
+    conn = connect_db()
+    if not conn:
+        return None
+    decided = []
+    try:
+        with conn.cursor() as cur:
+            decided = _review_withdrawals(cur, request_ids, status)
+        conn.commit()
+        return decided
+    except Exception as e:
+        logger.error(f"Error reviewing withdrawals {list(request_ids)[:10]}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        user_cache.invalidate(*(user_id for _, user_id, _ in decided))
+        release_db(conn)
+
+# --- VERIFICATION ফাংশন (যদি আপনার ভেরিফিকেশন সিস্টেম ব্যবহার করে) ---
+def record_verification_request(user_id, txn_id, amount, method):
+    """নতুন ভেরিফিকেশন অনুরোধ ডেটাবেসে সংরক্ষণ করে।"""
     conn = connect_db()
     if conn:
         try:
             cur = conn.cursor()
             cur.execute(
-                """
-                SELECT request_id, user_id, amount, wallet_address, requested_at
-                FROM withdraw_requests
-                WHERE status = 'pending'
-                ORDER BY requested_at ASC;
-                """
+                "INSERT INTO verify_requests (user_id, tnx_id, amount, method) VALUES (%s, %s, %s, %s) RETURNING request_id",
+                (user_id, txn_id, amount, method)
             )
-            return cur.fetchall()
+            verify_id = cur.fetchone()[0]
+            conn.commit()
+            return verify_id
         except Exception as e:
-            logger.error(f"Error fetching pending withdrawals: {e}")
-            return []
+            logger.error(f"Error recording verification request: {e}")
+            return None
         finally:
-            conn.close()
+            release_db(conn)
 
-def update_withdraw_status(request_id, status):
-    """উত্তোলন অনুরোধের অবস্থা আপডেট করে।"""
+# --- রেফারাল কাউন্টার ও প্রিমিয়াম ফাংশন ---
+# users.free_referrals / premium_referrals রেফারারের সারিতে ইনক্রিমেন্টালি রাখা হয়,
+# যাতে REFER স্ক্রিনে COUNT(*) স্ক্যান না লাগে।
+
+def set_premium_status(user_id, is_premium, expiry_date=None):
+    """
+    ইউজারের প্রিমিয়াম স্ট্যাটাস সেট করে এবং স্ট্যাটাস বদলালে রেফারারের
+    free/premium রেফারাল কাউন্টার একই ট্রানজেকশনে সরিয়ে দেয়।
+    রিটার্ন: স্ট্যাটাস বদলালে True, আগের মতোই থাকলে False, ইউজার না থাকলে/ত্রুটিতে None।
+    """
     conn = connect_db()
     if conn:
         try:
             cur = conn.cursor()
             cur.execute(
-                "UPDATE withdraw_requests SET status = %s WHERE request_id = %s AND status = 'pending' RETURNING user_id",
-                (status, request_id)
+                """
+                UPDATE users u
+                SET is_premium = %s, expiry_date = %s
+                FROM (SELECT user_id, COALESCE(is_premium, FALSE) AS was_premium
+                      FROM users WHERE user_id = %s FOR UPDATE) old
+                WHERE u.user_id = old.user_id
+                RETURNING u.referrer_id, old.was_premium
+                """,
+                (is_premium, expiry_date, user_id)
             )
-            user_id = cur.fetchone()[0] if cur.rowcount > 0 else None
+            result = cur.fetchone()
+            if not result:
+                conn.rollback()
+                return None
+            referrer_id, was_premium = result
+            changed = was_premium != bool(is_premium)
+            if changed and referrer_id:
+                step = 1 if is_premium else -1
+                cur.execute(
+                    """
+                    UPDATE users
+                    SET free_referrals = GREATEST(free_referrals - %s, 0),
+                        premium_referrals = GREATEST(premium_referrals + %s, 0)
+                    WHERE user_id = %s
+                    """,
+                    (step, step, referrer_id)
+                )
             conn.commit()
-            # টাকা ফেরত দেওয়ার জন্য user_id ফেরত দেওয়া হয়
-            return (True, user_id) if user_id else (False, None)
+            user_cache.invalidate(user_id, referrer_id)
+            return changed
         except Exception as e:
-            logger.error(f"Error updating withdrawal status: {e}")
-            return (False, None)
+            logger.error(f"Error setting premium status for {user_id}: {e}")
+            conn.rollback()
+            return None
         finally:
-            conn.close()
-            
-# --- VERIFICATION ফাংশন (যদি আপনার ভেরিফিকেশন সিস্টেম ব্যবহার করে) ---
-def record_verification_request(user_id, txn_id, amount, method):
-    """নতুন ভেরিফিকেশন অনুরোধ ডেটাবেসে সংরক্ষণ করে।"""
+            release_db(conn)
+
+def reconcile_referral_counters():
+    """
+    সব ইউজারের free/premium রেফারাল কাউন্টার users.referrer_id থেকে নতুন করে গণনা করে।
+    কেবল যেসব সারির মান ভুল ছিল সেগুলো আপডেট হয়; আপডেট হওয়া সারির সংখ্যা রিটার্ন করে।
+    """
     conn = connect_db()
     if conn:
         try:
             cur = conn.cursor()
             cur.execute(
-                "INSERT INTO verification_requests (user_id, txn_id, amount, method) VALUES (%s, %s, %s, %s) RETURNING verify_id",
-                (user_id, txn_id, amount, method)
+                """
+                WITH counts AS (
+                    SELECT referrer_id,
+                           COUNT(*) FILTER (WHERE NOT COALESCE(is_premium, FALSE)) AS free_count,
+                           COUNT(*) FILTER (WHERE is_premium) AS premium_count
+                    FROM users
+                    WHERE referrer_id IS NOT NULL
+                    GROUP BY referrer_id
+                )
+                UPDATE users u
+                SET free_referrals = COALESCE(c.free_count, 0),
+                    premium_referrals = COALESCE(c.premium_count, 0)
+                FROM users x
+                LEFT JOIN counts c ON c.referrer_id = x.user_id
+                WHERE u.user_id = x.user_id
+                  AND (u.free_referrals <> COALESCE(c.free_count, 0)
+                       OR u.premium_referrals <> COALESCE(c.premium_count, 0))
+                """
             )
-            verify_id = cur.fetchone()[0]
+            fixed = cur.rowcount
             conn.commit()
-            return verify_id
+            user_cache.clear()
+            return fixed
         except Exception as e:
-            logger.error(f"Error recording verification request: {e}")
+            logger.error(f"Error reconciling referral counters: {e}")
+            conn.rollback()
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
-def update_verification_status(verify_id, status):
-    """ভেরিফিকেশন অনুরোধের অবস্থা আপডেট করে।"""
+# --- লেজার কমপ্যাক্টশন ও রিকনসিলিয়েশন ---
+
+_LEDGER_BATCH_SUMS = ", ".join(
+    f"COALESCE(SUM(amount) FILTER (WHERE kind = '{kind}'), 0) AS {kind}" for kind in LEDGER_KINDS
+)
+COMPACT_LEDGER_SQL = f"""
+    WITH batch AS (
+        SELECT entry_id FROM ledger_entries
+        WHERE NOT compacted
+        ORDER BY entry_id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ), marked AS (
+        UPDATE ledger_entries e
+        SET compacted = TRUE
+        FROM batch
+        WHERE e.entry_id = batch.entry_id
+        RETURNING e.user_id, e.kind, e.amount
+    ), sums AS (
+        SELECT user_id, {_LEDGER_BATCH_SUMS}
+        FROM marked
+        GROUP BY user_id
+    ), upsert AS (
+        INSERT INTO user_balances (user_id, {', '.join(LEDGER_KINDS)})
+        SELECT user_id, {', '.join(LEDGER_KINDS)} FROM sums
+        ON CONFLICT (user_id) DO UPDATE SET
+            {', '.join(f"{kind} = user_balances.{kind} + EXCLUDED.{kind}" for kind in LEDGER_KINDS)},
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM marked), (SELECT COUNT(*) FROM upsert)
+"""
+
+def compact_ledger(batch_size=None, max_batches=100):
+    """
+    কমপ্যাক্ট না হওয়া লেজার এন্ট্রিগুলো ব্যাচে user_balances-এ যোগ করে।
+    প্রতিটি ব্যাচ একটি স্টেটমেন্ট ও একটি ট্রানজেকশন।
+    রিটার্ন: (কমপ্যাক্ট হওয়া এন্ট্রি, ব্যর্থ ব্যাচ) — সংযোগ বা কোনো ব্যাচ ব্যর্থ হলে failed 1 (আগের ব্যাচগুলো থেকে যায়)।
+    """
+    batch_size = batch_size or LEDGER_COMPACT_BATCH
+    total = 0
+    conn = connect_db()
+    if not conn:
+        return (0, 1)
+    try:
+        cur = conn.cursor()
+        for _ in range(max_batches):
+            cur.execute(COMPACT_LEDGER_SQL, (batch_size,))
+            entries, users = cur.fetchone()
+            conn.commit()
+            total += entries
+            if entries < batch_size:
+                break
+        return (total, 0)
+    except Exception as e:
+        logger.error(f"Error compacting ledger after {total} entries: {e}")
+        conn.rollback()
+        return (total, 1)
+    finally:
+        release_db(conn)
+
+RECONCILE_LEDGER_SQL = f"""
+    WITH ledger AS (
+        SELECT user_id, {_LEDGER_BATCH_SUMS}
+        FROM ledger_entries
+        WHERE compacted
+        GROUP BY user_id
+    )
+    SELECT COALESCE(b.user_id, l.user_id)
+    FROM user_balances b
+    FULL JOIN ledger l ON l.user_id = b.user_id
+    WHERE {' OR '.join(f"COALESCE(b.{kind}, 0) <> COALESCE(l.{kind}, 0)" for kind in LEDGER_KINDS)}
+    ORDER BY 1
+"""
+
+def reconcile_ledger():
+    """
+    প্রতিটি user_balances সারি কমপ্যাক্ট হওয়া লেজার এন্ট্রির যোগফলের সমান কিনা যাচাই করে।
+    একটি REPEATABLE READ স্ন্যাপশটে চলে, তাই চলমান কমপ্যাক্টশন ফলাফলে প্রভাব ফেলে না।
+    রিটার্ন: মিল না থাকা user_id-এর তালিকা (খালি = সব ঠিক); ত্রুটিতে None।
+    """
     conn = connect_db()
     if conn:
         try:
             cur = conn.cursor()
-            cur.execute(
-                "UPDATE verification_requests SET status = %s WHERE verify_id = %s AND status = 'pending' RETURNING user_id, amount",
-                (status, verify_id)
-            )
-            result = cur.fetchone()
-            user_id = result[0] if result else None
-            amount = result[1] if result else 0.00
-            conn.commit()
-            return (True, user_id, amount) if user_id else (False, None, 0.00)
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cur.execute(RECONCILE_LEDGER_SQL)
+            mismatched = [row[0] for row in cur.fetchall()]
+            conn.rollback()
+            return mismatched
         except Exception as e:
-            logger.error(f"Error updating verification status: {e}")
-            return (False, None, 0.00)
+            logger.error(f"Error reconciling ledger: {e}")
+            conn.rollback()
+            return None
         finally:
-            conn.close()
+            release_db(conn)
@@ -0,0 +1,216 @@
+import os
+import logging
+
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db
+from user_cache import user_cache
+from async_db import run_db
+from notifier import notify
+
+logger = logging.getLogger(__name__)
+
+# --- প্রিমিয়াম/ভেরিফাই মেয়াদ সুইপার ---
+# রিড-পাথ (VERIFY, PROFILE) শুধু is_premium / is_verified ফ্ল্যাগ দেখে। এই জব JobQueue থেকে নিয়মিত চলে:
+# মেয়াদ পেরোনো ইউজারদের ফ্ল্যাগ ব্যাচে বন্ধ করে, আর EXPIRY_REMIND_HOURS-এর মধ্যে মেয়াদ ফুরোবে
+# এমন ইউজারদের একবার রিমাইন্ডার পাঠায়। দুটো কাজই migrations/0008_expiry.sql-এর পার্শিয়াল ইনডেক্স
+# ব্যবহার করে, তাই খরচ মেয়াদ ফুরোতে যাওয়া ইউজারের সংখ্যার সমানুপাতিক।
+# প্রিমিয়াম expiry_date দিন পর্যন্ত (সেই দিনসহ) চালু থাকে; ভেরিফাই verify_expiry মুহূর্তে শেষ হয়।
+EXPIRY_SWEEP_INTERVAL = int(os.environ.get("EXPIRY_SWEEP_INTERVAL", "600"))  # সেকেন্ড
+EXPIRY_SWEEP_BATCH = int(os.environ.get("EXPIRY_SWEEP_BATCH", "500"))
+EXPIRY_REMIND_HOURS = int(os.environ.get("EXPIRY_REMIND_HOURS", "24"))
+
+# FOR UPDATE SKIP LOCKED: একসাথে দুটি সুইপ (বা /setpremium) চললে একই সারি নিয়ে আটকে থাকে না
+EXPIRE_PREMIUM_SQL = """
+    WITH batch AS (
+        SELECT user_id FROM users
+        WHERE is_premium AND expiry_date < CURRENT_DATE
+        ORDER BY expiry_date, user_id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE users u SET is_premium = FALSE
+    FROM batch WHERE u.user_id = batch.user_id
+    RETURNING u.user_id, u.referrer_id, u.is_blocked
+"""
+
+# মেয়াদ শেষ হওয়া প্রিমিয়াম রেফারির জন্য রেফারারের free/premium কাউন্টার সরানো (set_premium_status-এর মতো)।
+# রেফারার নিজেও একই ব্যাচে থাকতে পারে, আর এক স্টেটমেন্টে একই সারি দুবার আপডেট করা যায় না — তাই আলাদা স্টেটমেন্ট।
+MOVE_REFERRAL_COUNTERS_SQL = """
+    UPDATE users r
+    SET free_referrals = r.free_referrals + c.n,
+        premium_referrals = GREATEST(r.premium_referrals - c.n, 0)
+    FROM (
+        SELECT referrer_id, count(*) AS n
+        FROM unnest(%s::bigint[]) AS t(referrer_id)
+        GROUP BY referrer_id
+    ) c
+    WHERE r.user_id = c.referrer_id
+"""
+
+EXPIRE_VERIFY_SQL = """
+    WITH batch AS (
+        SELECT user_id FROM users
+        WHERE is_verified AND verify_expiry <= now()
+        ORDER BY verify_expiry, user_id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE users u SET is_verified = FALSE
+    FROM batch WHERE u.user_id = batch.user_id
+    RETURNING u.user_id, u.is_blocked
+"""
+
+# রিমাইন্ডার: *_reminded_for-এ বর্তমান মেয়াদ লিখে রাখা হয়, তাই একই মেয়াদে দ্বিতীয়বার যায় না,
+# কিন্তু মেয়াদ বাড়লে (মান আর মেলে না) নতুন মেয়াদের শেষে আবার যায়
+CLAIM_PREMIUM_REMINDERS_SQL = """
+    WITH batch AS (
+        SELECT user_id FROM users
+        WHERE is_premium
+          AND expiry_date < (now() + make_interval(hours => %(hours)s))::date
+          AND premium_reminded_for IS DISTINCT FROM expiry_date
+        ORDER BY expiry_date, user_id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE users u SET premium_reminded_for = u.expiry_date
+    FROM batch WHERE u.user_id = batch.user_id
+    RETURNING u.user_id, u.expiry_date, u.is_blocked
+"""
+
+CLAIM_VERIFY_REMINDERS_SQL = """
+    WITH batch AS (
+        SELECT user_id FROM users
+        WHERE is_verified
+          AND verify_expiry <= now() + make_interval(hours => %(hours)s)
+          AND verify_reminded_for IS DISTINCT FROM verify_expiry
+        ORDER BY verify_expiry, user_id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE users u SET verify_reminded_for = u.verify_expiry
+    FROM batch WHERE u.user_id = batch.user_id
+    RETURNING u.user_id, u.verify_expiry, u.is_blocked
+"""
+
+
+# --- ডেটাবেস ---
+
+def sweep_expired(limit=EXPIRY_SWEEP_BATCH):
+    """
+    মেয়াদ পেরোনো সর্বোচ্চ limit জন প্রিমিয়াম ও limit জন ভেরিফাইড ইউজারের ফ্ল্যাগ এক ট্রানজেকশনে বন্ধ করে।
+    রিটার্ন: ([(user_id, is_blocked)] প্রিমিয়াম, [(user_id, is_blocked)] ভেরিফাই); ত্রুটিতে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+    changed = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(EXPIRE_PREMIUM_SQL, {'limit': limit})
+            premium = cur.fetchall()
+            referrers = [referrer_id for _, referrer_id, _ in premium if referrer_id]
+            if referrers:
+                cur.execute(MOVE_REFERRAL_COUNTERS_SQL, (referrers,))
+            cur.execute(EXPIRE_VERIFY_SQL, {'limit': limit})
+            verify = cur.fetchall()
+        conn.commit()
+        changed = [user_id for user_id, _, _ in premium] + referrers + [user_id for user_id, _ in verify]
+        return [(user_id, is_blocked) for user_id, _, is_blocked in premium], verify
+    except Exception as e:
+        logger.error(f"Error sweeping expired users: {e}")
+        conn.rollback()
+        return None
+    finally:
+        user_cache.invalidate(*changed)
+        release_db(conn)
+
+
+def claim_expiry_reminders(limit=EXPIRY_SWEEP_BATCH, hours=EXPIRY_REMIND_HOURS):
+    """
+    শীঘ্রই মেয়াদ ফুরোবে এমন ইউজারদের রিমাইন্ডার "পাঠানো হয়েছে" চিহ্নিত করে (একবারই পাঠানোর জন্য)।
+    রিটার্ন: ([(user_id, expiry_date, is_blocked)] প্রিমিয়াম, [(user_id, verify_expiry, is_blocked)] ভেরিফাই); ত্রুটিতে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+    params = {'limit': limit, 'hours': hours}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(CLAIM_PREMIUM_REMINDERS_SQL, params)
+            premium = cur.fetchall()
+            cur.execute(CLAIM_VERIFY_REMINDERS_SQL, params)
+            verify = cur.fetchall()
+        conn.commit()
+        return premium, verify
+    except Exception as e:
+        logger.error(f"Error claiming expiry reminders: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+# --- মেসেজ ---
+
+def premium_reminder_message(expiry_date):
+    return (
+        f"⏰ আপনার প্রিমিয়াম মেয়াদ {expiry_date:%Y-%m-%d} তারিখে শেষ হবে।\n"
+        "প্রিমিয়াম চালু রাখতে সময়মতো রিনিউ করুন।"
+    )
+
+
+def verify_reminder_message(verify_expiry):
+    return (
+        f"⏰ আপনার ভেরিফাই মেয়াদ {verify_expiry:%Y-%m-%d} তারিখে শেষ হবে।\n"
+        "মেয়াদ শেষ হলে Withdraw অপশন লক হয়ে যাবে — আবার VERIFY করুন।"
+    )
+
+
+PREMIUM_EXPIRED_MESSAGE = "⌛ আপনার প্রিমিয়াম মেয়াদ শেষ হয়েছে। আবার চালু করতে প্রিমিয়াম সার্ভিস দেখুন।"
+VERIFY_EXPIRED_MESSAGE = "⌛ আপনার ভেরিফাই মেয়াদ শেষ হয়েছে, Withdraw অপশন এখন লক। আবার VERIFY করুন।"
+
+
+# --- JobQueue জব ---
+
+async def expiry_sweep_job(context: ContextTypes.DEFAULT_TYPE):
+    """মেয়াদ পেরোনো ফ্ল্যাগ বন্ধ করে ও রিমাইন্ডার কিউ করে; ব্যাচ ভরা থাকলে পরের ব্যাচ নেয়"""
+    bot = context.bot
+    expired_premium = expired_verify = reminded = 0
+
+    # আগে মেয়াদ শেষ করা হয়, যাতে ইতিমধ্যে মেয়াদোত্তীর্ণ ইউজার রিমাইন্ডার নয়, শুধু "শেষ হয়েছে" মেসেজ পায়
+    while True:
+        swept = await run_db(sweep_expired, EXPIRY_SWEEP_BATCH)
+        if swept is None:
+            return
+        premium, verify = swept
+        for user_id, is_blocked in premium:
+            if not is_blocked:
+                await notify(bot, user_id, PREMIUM_EXPIRED_MESSAGE)
+        for user_id, is_blocked in verify:
+            if not is_blocked:
+                await notify(bot, user_id, VERIFY_EXPIRED_MESSAGE)
+        expired_premium += len(premium)
+        expired_verify += len(verify)
+        if len(premium) < EXPIRY_SWEEP_BATCH and len(verify) < EXPIRY_SWEEP_BATCH:
+            break
+
+    while True:
+        claimed = await run_db(claim_expiry_reminders, EXPIRY_SWEEP_BATCH, EXPIRY_REMIND_HOURS)
+        if claimed is None:
+            break
+        premium, verify = claimed
+        for user_id, expiry_date, is_blocked in premium:
+            if not is_blocked:
+                await notify(bot, user_id, premium_reminder_message(expiry_date))
+        for user_id, verify_expiry, is_blocked in verify:
+            if not is_blocked:
+                await notify(bot, user_id, verify_reminder_message(verify_expiry))
+        reminded += len(premium) + len(verify)
+        if len(premium) < EXPIRY_SWEEP_BATCH and len(verify) < EXPIRY_SWEEP_BATCH:
+            break
+
+    if expired_premium or expired_verify or reminded:
+        logger.info(
+            f"Expiry sweep: {expired_premium} premium and {expired_verify} verify expired, {reminded} reminder(s) queued"
+        )
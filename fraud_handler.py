@@ -0,0 +1,315 @@
+import os
+import math
+import time
+import logging
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db
+from user_cache import user_cache
+from async_db import run_db
+
+logger = logging.getLogger(__name__)
+
+# --- 🕵️ রেফারেল জালিয়াতি শনাক্তকরণ ---
+# রেফারেল গ্রাফ (রেফারি -> রেফারার প্যারেন্ট পয়েন্টার) ও প্রতিটি রেফারারের ফিচার প্রসেসের মেমোরিতে থাকে,
+# users.referrer_id থেকে স্টার্টআপে ও প্রতি REFERRAL_GRAPH_REBUILD_INTERVAL-এ নতুন করে তৈরি হয়। /start-এ
+# নতুন রেজিস্ট্রেশনের আগে assess() (O(1)) রেফারারকে যাচাই করে; সন্দেহজনক হলে register_user বোনাস লেজারে না
+# দিয়ে referral_holds-এ রাখে (migrations/0012_referral_holds.sql), অ্যাডমিন /holds থেকে ছাড়েন বা বাতিল করেন।
+# রেজিস্ট্রেশনের পর add() — দুটিই O(1): কয়েকটি dict লুকআপ ও কাউন্টার আপডেট, DB বা গ্রাফ ট্রাভার্সাল নেই।
+#
+# ফিচার ও নিয়ম (যেকোনো একটি মিললেই hold, কারণ referral_holds.reason-এ থাকে):
+#   velocity — সাম্প্রতিক জয়েনের হার: REFERRAL_VELOCITY_WINDOW সেকেন্ডের এক্সপোনেনশিয়াল-ডিকে কাউন্ট
+#   inactive — রেফারিদের কত অংশ কখনো ভেরিফাই/প্রিমিয়াম হয়নি (কমপক্ষে REFERRAL_INACTIVE_MIN জন হলে)
+#   chain    — রেফারার নিজে চেইনের কত গভীরে (রুট থেকে দূরত্ব) এবং নিজে নিষ্ক্রিয়
+# গ্রাফ প্রসেস-লোকাল; একাধিক ওয়ার্কারে প্রতিটি নিজের দেখা জয়েন গোনে, রিবিল্ডে সব মিলে যায়।
+REFERRAL_GRAPH_REBUILD_INTERVAL = int(os.environ.get("REFERRAL_GRAPH_REBUILD_INTERVAL", "3600"))
+REFERRAL_VELOCITY_WINDOW = float(os.environ.get("REFERRAL_VELOCITY_WINDOW", "3600"))  # সেকেন্ড
+REFERRAL_VELOCITY_MAX = float(os.environ.get("REFERRAL_VELOCITY_MAX", "20"))
+REFERRAL_INACTIVE_MIN = int(os.environ.get("REFERRAL_INACTIVE_MIN", "10"))
+REFERRAL_INACTIVE_SHARE = float(os.environ.get("REFERRAL_INACTIVE_SHARE", "0.9"))
+REFERRAL_CHAIN_DEPTH = int(os.environ.get("REFERRAL_CHAIN_DEPTH", "5"))
+HOLDS_LIST_LIMIT = 10
+GRAPH_FETCH_SIZE = 10000
+ADMIN_ID = os.environ.get("ADMIN_ID")
+
+HOLD_REASON_LABELS = {
+    'velocity': "দ্রুত জয়েন",
+    'inactive': "নিষ্ক্রিয় রেফারি",
+    'chain': "গভীর চেইন",
+}
+
+
+class _Referrer:
+    """একজন রেফারারের ফিচার: মোট ও সক্রিয় রেফারি, ডিকে করা জয়েন-হার ও তার শেষ আপডেটের সময়।"""
+
+    __slots__ = ("count", "active", "rate", "updated")
+
+    def __init__(self):
+        self.count = 0
+        self.active = 0
+        self.rate = 0.0
+        self.updated = 0.0
+
+
+class ReferralGraph:
+    """রেফারেল গ্রাফের ইনক্রিমেন্টাল ইনডেক্স; add/assess ইভেন্ট লুপ থেকে, load এক্সিকিউটর থেকে (শেষে এক সাথে বদলায়)।"""
+
+    def __init__(self, window=3600.0):
+        self.window = window
+        self._parent = {}     # রেফারি -> রেফারার
+        self._depth = {}      # রেফারি -> রুট থেকে দূরত্ব (রেফার ছাড়া আসা ইউজার 0, তাই রাখা হয় না)
+        self._active = set()  # ভেরিফাইড বা প্রিমিয়াম ইউজার
+        self._referrers = {}  # রেফারার -> _Referrer
+        self.loaded_at = None
+
+    def _velocity(self, stats, now):
+        return stats.rate * math.exp(-(now - stats.updated) / self.window) if stats.rate else 0.0
+
+    def add(self, user_id, referrer_id, now=None):
+        """নতুন রেফারেল জয়েন (O(1))।"""
+        now = time.monotonic() if now is None else now
+        self._parent[user_id] = referrer_id
+        self._depth[user_id] = self._depth.get(referrer_id, 0) + 1
+        stats = self._referrers.get(referrer_id)
+        if stats is None:
+            stats = self._referrers[referrer_id] = _Referrer()
+        stats.count += 1
+        stats.rate = self._velocity(stats, now) + 1.0
+        stats.updated = now
+
+    def mark_active(self, user_id):
+        """ইউজার ভেরিফাই/প্রিমিয়াম হলে (O(1)); তার রেফারারের সক্রিয় রেফারি বাড়ে।"""
+        if user_id in self._active:
+            return
+        self._active.add(user_id)
+        referrer_id = self._parent.get(user_id)
+        if referrer_id is not None and referrer_id in self._referrers:
+            self._referrers[referrer_id].active += 1
+
+    def features(self, referrer_id, now=None):
+        now = time.monotonic() if now is None else now
+        stats = self._referrers.get(referrer_id) or _Referrer()
+        return {
+            'referees': stats.count,
+            'inactive_share': (stats.count - stats.active) / stats.count if stats.count else 0.0,
+            'velocity': self._velocity(stats, now),
+            'depth': self._depth.get(referrer_id, 0),
+            'active': referrer_id in self._active,
+        }
+
+    def assess(self, referrer_id, now=None):
+        """এই রেফারারের পরের জয়েন বোনাস আটকানো উচিত কি না: কারণ ('velocity'/'inactive'/'chain') বা None (O(1))।"""
+        now = time.monotonic() if now is None else now
+        stats = self._referrers.get(referrer_id)
+        if stats is not None:
+            # এই জয়েনসহ হার
+            if self._velocity(stats, now) + 1.0 > REFERRAL_VELOCITY_MAX:
+                return 'velocity'
+            if stats.count >= REFERRAL_INACTIVE_MIN and (stats.count - stats.active) / stats.count >= REFERRAL_INACTIVE_SHARE:
+                return 'inactive'
+        if self._depth.get(referrer_id, 0) >= REFERRAL_CHAIN_DEPTH and referrer_id not in self._active:
+            return 'chain'
+        return None
+
+    def load(self, rows):
+        """
+        (user_id, referrer_id, is_active) সারি থেকে পুরো ইনডেক্স নতুন করে তৈরি করে (O(n))।
+        আগের ডিকে করা জয়েন-হার রাখা হয় (DB-তে শুধু join_date আছে, সেকেন্ডের হিসাব নেই)।
+        """
+        parent, active, referrers = {}, set(), {}
+        for user_id, referrer_id, is_active in rows:
+            if referrer_id is not None:
+                parent[user_id] = referrer_id
+            if is_active:
+                active.add(user_id)
+        for user_id, referrer_id in parent.items():
+            stats = referrers.get(referrer_id)
+            if stats is None:
+                stats = referrers[referrer_id] = _Referrer()
+                old = self._referrers.get(referrer_id)
+                if old is not None:
+                    stats.rate, stats.updated = old.rate, old.updated
+            stats.count += 1
+            if user_id in active:
+                stats.active += 1
+
+        # গভীরতা: প্যারেন্ট পয়েন্টার ধরে ওপরে উঠে মেমোইজ (প্রতিটি নোড একবার); সাইকেল থাকলে (হওয়ার কথা নয়) কাটা হয়
+        depth = {}
+        for start in parent:
+            path, node = [], start
+            while node in parent and node not in depth and len(path) <= len(parent):
+                path.append(node)
+                node = parent[node]
+            base = depth.get(node, 0)
+            for offset, node in enumerate(reversed(path), start=1):
+                depth[node] = base + offset
+
+        self._parent, self._depth, self._active, self._referrers = parent, depth, active, referrers
+        self.loaded_at = time.time()
+        return len(parent)
+
+    def stats(self):
+        return {
+            'referred': len(self._parent),
+            'referrers': len(self._referrers),
+            'max_depth': max(self._depth.values(), default=0),
+        }
+
+
+referral_graph = ReferralGraph(window=REFERRAL_VELOCITY_WINDOW)
+
+
+# --- ডেটাবেস ---
+
+def rebuild_referral_graph():
+    """users থেকে রেফারেল গ্রাফ নতুন করে লোড করে (সার্ভার-সাইড কার্সরে স্ট্রিম)। রেফারি সংখ্যা; ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor(name="referral_graph") as cur:
+            cur.itersize = GRAPH_FETCH_SIZE
+            cur.execute(
+                "SELECT user_id, referrer_id, is_verified OR COALESCE(is_premium, FALSE) FROM users "
+                "WHERE referrer_id IS NOT NULL OR is_verified OR is_premium"
+            )
+            loaded = referral_graph.load(cur)
+        conn.rollback()
+        return loaded
+    except Exception as e:
+        logger.error(f"Error rebuilding referral graph: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def get_pending_holds(limit=HOLDS_LIST_LIMIT):
+    """পেন্ডিং hold রেফারার অনুযায়ী: [(referrer_id, count, amount, reasons)] (বেশি থেকে কম); ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT referrer_id, COUNT(*), SUM(amount), string_agg(DISTINCT reason, ',')
+                FROM referral_holds WHERE status = 'pending'
+                GROUP BY referrer_id ORDER BY COUNT(*) DESC, referrer_id LIMIT %s
+                """, (limit,)
+            )
+            rows = cur.fetchall()
+        conn.rollback()
+        return rows
+    except Exception as e:
+        logger.error(f"Error fetching referral holds: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+# ছাড়া hold-এর বোনাস সাধারণ রেফারেল বোনাসের মতোই 'join:<রেফারি>' ref-এ লেজারে যায়
+RELEASE_HOLDS_SQL = """
+    WITH released AS (
+        UPDATE referral_holds SET status = 'released', decided_at = CURRENT_TIMESTAMP
+        WHERE referrer_id = %(referrer_id)s AND status = 'pending'
+        RETURNING user_id, referrer_id, amount
+    ), credit AS (
+        INSERT INTO ledger_entries (user_id, kind, amount, ref)
+        SELECT referrer_id, 'refer_balance', amount, 'join:' || user_id FROM released
+    )
+    SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM released
+"""
+VOID_HOLDS_SQL = """
+    WITH voided AS (
+        UPDATE referral_holds SET status = 'voided', decided_at = CURRENT_TIMESTAMP
+        WHERE referrer_id = %(referrer_id)s AND status = 'pending'
+        RETURNING amount
+    )
+    SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM voided
+"""
+
+
+def decide_holds(referrer_id, action):
+    """রেফারারের সব পেন্ডিং hold ছাড়ে ('release') বা বাতিল করে ('void')। রিটার্ন: (count, amount); ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RELEASE_HOLDS_SQL if action == 'release' else VOID_HOLDS_SQL, {'referrer_id': referrer_id})
+            count, amount = cur.fetchone()
+        conn.commit()
+        if action == 'release' and count:
+            user_cache.invalidate(referrer_id)
+        return count, amount
+    except Exception as e:
+        logger.error(f"Error deciding referral holds for {referrer_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+# --- জব ও অ্যাডমিন হ্যান্ডলার ---
+
+async def referral_graph_job(context: ContextTypes.DEFAULT_TYPE):
+    """রেফারেল গ্রাফ রিবিল্ড (JobQueue থেকে নিয়মিত; সক্রিয়তার পরিবর্তনও এতে ধরা পড়ে)"""
+    loaded = await run_db(rebuild_referral_graph)
+    if loaded is not None:
+        logger.info(f"Referral graph rebuilt: {referral_graph.stats()}")
+
+
+def _is_admin(update):
+    return str(update.effective_user.id) == str(ADMIN_ID)
+
+
+async def _render_holds():
+    rows = await run_db(get_pending_holds)
+    if rows is None:
+        return "❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।", None
+    if not rows:
+        return "✅ কোনো আটকে থাকা রেফারেল বোনাস নেই।", None
+
+    lines, keyboard = ["🕵️ আটকে থাকা রেফারেল বোনাস\n"], []
+    for referrer_id, count, amount, reasons in rows:
+        f = referral_graph.features(referrer_id)
+        reason_text = ", ".join(HOLD_REASON_LABELS.get(reason, reason) for reason in reasons.split(","))
+        lines.append(
+            f"👤 {referrer_id}: {count}টি · {amount:.2f} টাকা · {reason_text}\n"
+            f"    রেফারি {f['referees']}, নিষ্ক্রিয় {f['inactive_share']:.0%}, "
+            f"হার {f['velocity']:.1f}, গভীরতা {f['depth']}"
+        )
+        keyboard.append([
+            InlineKeyboardButton(f"✅ ছাড়ুন {referrer_id}", callback_data=f"hold_release_{referrer_id}"),
+            InlineKeyboardButton("❌ বাতিল", callback_data=f"hold_void_{referrer_id}"),
+        ])
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+async def holds_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/holds — সন্দেহজনক রেফারেল বোনাসের তালিকা (অ্যাডমিন)"""
+    if not _is_admin(update):
+        return
+    text, markup = await _render_holds()
+    await update.message.reply_text(text, reply_markup=markup)
+
+
+async def holds_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/holds-এর ছাড়ুন/বাতিল বাটন (hold_<release|void>_<referrer_id>)"""
+    query = update.callback_query
+    if not _is_admin(update):
+        await query.answer("আপনি এই অ্যাকশনের জন্য অনুমোদিত নন।")
+        return
+    _, action, referrer_id = query.data.split('_')
+    result = await run_db(decide_holds, int(referrer_id), action)
+    if result is None:
+        await query.answer("❌ আপডেট ব্যর্থ হয়েছে।")
+        return
+    count, amount = result
+    done = "ছাড়া" if action == 'release' else "বাতিল"
+    await query.answer(f"{count}টি বোনাস ({amount:.2f} টাকা) {done} হয়েছে।")
+    text, markup = await _render_holds()
+    await query.edit_message_text(text, reply_markup=markup)
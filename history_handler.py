@@ -0,0 +1,205 @@
+import os
+import logging
+import datetime
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db
+from async_db import run_db
+
+logger = logging.getLogger(__name__)
+
+# --- 📜 HISTORY: উত্তোলন, ভেরিফাই ও ব্যালেন্স পরিবর্তনের টাইমলাইন ---
+# তিনটি উৎস একটি স্টেটমেন্টে UNION ALL করে নতুন থেকে পুরনো ক্রমে আসে। প্রতিটি শাখা নিজের
+# কভারিং ইনডেক্সে (migrations/0009_history.sql) keyset রেঞ্জ স্ক্যান করে সর্বোচ্চ limit+1টি সারি পড়ে,
+# তাই পেজের খরচ ইতিহাসের দৈর্ঘ্যের ওপর নির্ভর করে না। OFFSET নেই।
+# টাইমলাইনের ক্রম (সময়, উৎস, id); cursor সেই তিনটি মান, বাটনের callback_data-তে থাকে।
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "10"))
+
+SOURCE_LEDGER, SOURCE_VERIFY, SOURCE_WITHDRAW = 0, 1, 2
+_MAX_ID = 2 ** 63 - 1
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# {cmp}: '<' (পুরনো দিকে) বা '>' (নতুন দিকে); {order}: DESC বা ASC।
+# লেজার শাখার শর্ত 0009-এর পার্শিয়াল ইনডেক্সের WHERE-এর সাথে হুবহু এক রাখতে হবে।
+HISTORY_SQL = """
+    SELECT src, id, ts, amount, detail, extra FROM (
+        (SELECT {withdraw} AS src, request_id AS id, requested_at AS ts, amount,
+                status::text AS detail, NULL::text AS extra
+         FROM withdraw_requests
+         WHERE user_id = %(user_id)s AND (requested_at, request_id) {cmp} (%(ts)s::timestamptz, %(withdraw_id)s)
+         ORDER BY requested_at {order}, request_id {order}
+         LIMIT %(limit)s)
+        UNION ALL
+        (SELECT {verify}, request_id, requested_at, amount, status::text, method::text
+         FROM verify_requests
+         WHERE user_id = %(user_id)s AND (requested_at, request_id) {cmp} (%(ts)s::timestamptz, %(verify_id)s)
+         ORDER BY requested_at {order}, request_id {order}
+         LIMIT %(limit)s)
+        UNION ALL
+        (SELECT {ledger}, entry_id, ts, amount, kind::text, ref
+         FROM ledger_entries
+         WHERE user_id = %(user_id)s
+           AND kind <> 'total_withdraw' AND (ref IS NULL OR ref NOT LIKE 'withdraw:%%')
+           AND (ts, entry_id) {cmp} (%(ts)s::timestamptz, %(ledger_id)s)
+         ORDER BY ts {order}, entry_id {order}
+         LIMIT %(limit)s)
+    ) timeline
+    ORDER BY ts {order}, src {order}, id {order}
+    LIMIT %(limit)s
+"""
+HISTORY_COLUMNS = ("src", "id", "ts", "amount", "detail", "extra")
+
+
+def encode_cursor(row):
+    """সারির (সময়, উৎস, id) -> callback_data-র অংশ; সময় মাইক্রোসেকেন্ডে পূর্ণসংখ্যা (float নয়, যাতে হুবহু ফেরে)।"""
+    return f"{(row['ts'] - _EPOCH) // datetime.timedelta(microseconds=1)}_{row['src']}_{row['id']}"
+
+
+def decode_cursor(ts_us, src, row_id):
+    return _EPOCH + datetime.timedelta(microseconds=int(ts_us)), int(src), int(row_id)
+
+
+def _branch_bounds(src, row_id):
+    """
+    (ts, src, id) ক্রমের cursor প্রতিটি শাখায় (ts, id) তুলনায় পরিণত হয়: একই উৎসে id নিজেই; cursor-এর
+    চেয়ে ছোট উৎসে একই সময়ের সব সারি cursor-এর আগে (MAX), বড় উৎসে পরে (0)। দুই দিকেই একই নিয়ম।
+    """
+    def bound(branch):
+        if branch == src:
+            return row_id
+        return _MAX_ID if branch < src else 0
+    return {
+        'withdraw_id': bound(SOURCE_WITHDRAW),
+        'verify_id': bound(SOURCE_VERIFY),
+        'ledger_id': bound(SOURCE_LEDGER),
+    }
+
+
+def get_history_page(user_id, cursor=None, direction='next', limit=HISTORY_PAGE_SIZE):
+    """
+    ইউজারের টাইমলাইনের একটি পেজ: cursor-এর পরের পুরনো (next) বা আগের নতুন (prev) সর্বোচ্চ limitটি।
+    cursor হলো (ts, src, id) বা None (সবচেয়ে নতুন থেকে)।
+    রিটার্ন: (rows, has_more) — rows ডিকশনারির তালিকা (সবসময় নতুন থেকে পুরনো),
+    has_more মানে ওই দিকে আরও সারি আছে; ত্রুটিতে None।
+    """
+    forward = direction == 'next'
+    if cursor is None:
+        params = {'ts': 'infinity', 'withdraw_id': _MAX_ID, 'verify_id': _MAX_ID, 'ledger_id': _MAX_ID}
+    else:
+        ts, src, row_id = cursor
+        params = {'ts': ts, **_branch_bounds(src, row_id)}
+    params.update(user_id=user_id, limit=limit + 1)
+    query = HISTORY_SQL.format(
+        cmp='<' if forward else '>',
+        order='DESC' if forward else 'ASC',
+        withdraw=SOURCE_WITHDRAW, verify=SOURCE_VERIFY, ledger=SOURCE_LEDGER,
+    )
+
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = [dict(zip(HISTORY_COLUMNS, row)) for row in cur.fetchall()]
+        conn.rollback()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not forward:
+            rows.reverse()
+        return rows, has_more
+    except Exception as e:
+        logger.error(f"Error fetching history for {user_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+# --- ফরম্যাটিং ---
+
+STATUS_LABELS = {
+    'pending': "⏳ পেন্ডিং",
+    'completed': "✅ সম্পন্ন",
+    'accept': "✅ অনুমোদিত",
+    'rejected': "❌ বাতিল",
+    'reject': "❌ বাতিল",
+}
+
+LEDGER_KIND_LABELS = {
+    'balance': "ব্যালেন্স",
+    'premium_balance': "প্রিমিয়াম ব্যালেন্স",
+    'free_income': "ফ্রি ইনকাম",
+    'refer_balance': "রেফার ব্যালেন্স",
+    'salary_balance': "স্যালারি ব্যালেন্স",
+}
+
+# লেজারের ref-এর প্রিফিক্স -> ইউজারকে দেখানো কারণ
+LEDGER_REF_LABELS = {
+    'join': "রেফার বোনাস",
+    'commission': "রেফার কমিশন",
+    'task': "টাস্ক রিওয়ার্ড",
+    'withdraw_refund': "উত্তোলন ফেরত",
+    'opening': "ওপেনিং ব্যালেন্স",
+}
+
+
+def format_history_row(row):
+    when = row['ts'].strftime('%Y-%m-%d %H:%M')
+    status = STATUS_LABELS.get(row['detail'], row['detail'])
+    if row['src'] == SOURCE_WITHDRAW:
+        return f"🏦 উত্তোলন #{row['id']} · {row['amount']:.2f} টাকা · {status}\n    {when}"
+    if row['src'] == SOURCE_VERIFY:
+        return f"💾 ভেরিফাই ({row['extra'] or '-'}) · {row['amount'] or 0:.2f} টাকা · {status}\n    {when}"
+    reason = LEDGER_REF_LABELS.get((row['extra'] or '').split(':')[0], row['extra'] or "সমন্বয়")
+    sign = "➕" if row['amount'] >= 0 else "➖"
+    kind = LEDGER_KIND_LABELS.get(row['detail'], row['detail'])
+    return f"{sign} {abs(row['amount']):.2f} টাকা · {kind} · {reason}\n    {when}"
+
+
+async def _render_history(user_id, cursor, direction):
+    """পেজ এনে (text, markup) দেয়।"""
+    page = await run_db(get_history_page, user_id, cursor, direction)
+    if page is None:
+        return "❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।", None
+
+    rows, has_more = page
+    if direction == 'next':
+        has_prev, has_next = cursor is not None, has_more
+    else:
+        has_prev, has_next = has_more, True
+
+    if not rows:
+        if cursor is not None:
+            # পুরনো মেসেজের বাটন, এর মধ্যে ওই দিকে কিছু নেই — প্রথম পেজ দেখানো হয়
+            return await _render_history(user_id, None, 'next')
+        return "📜 এখনো কোনো লেনদেনের ইতিহাস নেই।", None
+
+    text = "📜 আপনার লেনদেনের ইতিহাস\n\n" + "\n".join(format_history_row(row) for row in rows)
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton("◀️ নতুন", callback_data=f"hist_prev_{encode_cursor(rows[0])}"))
+    if has_next:
+        nav.append(InlineKeyboardButton("পুরনো ▶️", callback_data=f"hist_next_{encode_cursor(rows[-1])}"))
+    return text, InlineKeyboardMarkup([nav]) if nav else None
+
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """📜 HISTORY বাটন — সবচেয়ে নতুন পেজ"""
+    text, markup = await _render_history(update.effective_user.id, None, 'next')
+    await update.message.reply_text(text, reply_markup=markup)
+
+
+async def history_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """HISTORY পেজের ◀️/▶️ বাটন (hist_<next|prev>_<ts_us>_<src>_<id>)"""
+    query = update.callback_query
+    await query.answer()
+    _, direction, ts_us, src, row_id = query.data.split('_')
+    text, markup = await _render_history(update.effective_user.id, decode_cursor(ts_us, src, row_id), direction)
+    try:
+        await query.edit_message_text(text, reply_markup=markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
@@ -0,0 +1,530 @@
+import os
+import argparse
+import datetime
+import logging
+import statistics
+import subprocess
+import sys
+import time
+
+import db_handler
+import migrator
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+
+# --- রক্ষণাবেক্ষণ কমান্ড ---
+# ব্যবহার: python manage.py <command>
+
+def migrate(args):
+    """বাকি থাকা স্কিমা মাইগ্রেশনগুলো প্রয়োগ করে।"""
+    applied = migrator.migrate(target=args.target)
+    if applied is None:
+        return 1
+    logger.info(f"Schema at version {migrator.current_version()} ({applied} migration(s) applied).")
+    return 0
+
+
+def schema_status(args):
+    """ডেটাবেসের বর্তমান ও কোডের সর্বশেষ স্কিমা ভার্সন দেখায়।"""
+    current = migrator.current_version()
+    if current is None:
+        return 1
+    latest = migrator.latest_version()
+    logger.info(f"Schema version: {current} (latest: {latest}, pending: {max(latest - current, 0)})")
+    return 0
+
+
+def reconcile_referrals(args):
+    """users.referrer_id থেকে free/premium রেফারাল কাউন্টার নতুন করে তৈরি করে।"""
+    fixed = db_handler.reconcile_referral_counters()
+    if fixed is None:
+        return 1
+    logger.info(f"Referral counters reconciled: {fixed} row(s) corrected.")
+    return 0
+
+
+def recompute_commissions(args):
+    """পুরো রেফারেল ফরেস্ট এক পাসে রেফার কমিশন নতুন করে হিসাব ও যাচাই (--apply: বাদ পড়াগুলো বসানো)।"""
+    from commission_handler import audit_commissions
+    from verify_handler import VERIFY_AMOUNT
+
+    stats = audit_commissions(VERIFY_AMOUNT, apply=args.apply)
+    if stats is None:
+        return 1
+    logger.info(f"Commission audit: {stats}")
+    return 0 if args.apply or not (stats['missing'] or stats['mismatched']) else 2
+
+
+def compact_ledger(args):
+    """কমপ্যাক্ট না হওয়া সব লেজার এন্ট্রি user_balances-এ যোগ করে; কোনো ব্যাচ ব্যর্থ হলে exit code 1।"""
+    total = 0
+    while True:
+        compacted, failed = db_handler.compact_ledger()
+        total += compacted
+        if failed:
+            logger.error(f"Ledger compaction failed after {total} entries.")
+            return 1
+        if not compacted:
+            break
+    logger.info(f"Ledger compacted: {total} entries.")
+    return 0
+
+
+def reconcile_ledger(args):
+    """user_balances লেজারের যোগফলের সাথে মেলে কিনা যাচাই করে; না মিললে exit code 1।"""
+    mismatched = db_handler.reconcile_ledger()
+    if mismatched is None:
+        return 1
+    if mismatched:
+        logger.error(f"Ledger mismatch for {len(mismatched)} user(s): {mismatched[:20]}")
+        return 1
+    logger.info("Ledger reconciled: all materialized balances match the ledger.")
+    return 0
+
+
+def sweep_expiry(args):
+    """মেয়াদ পেরোনো প্রিমিয়াম/ভেরিফাই ফ্ল্যাগ বন্ধ করে (JobQueue ছাড়া সার্ভারলেস ডিপ্লয়ে cron থেকে চালানোর জন্য; রিমাইন্ডার যায় না)।"""
+    from expiry_handler import sweep_expired, EXPIRY_SWEEP_BATCH
+
+    premium = verify = 0
+    while True:
+        swept = sweep_expired(EXPIRY_SWEEP_BATCH)
+        if swept is None:
+            return 1
+        premium += len(swept[0])
+        verify += len(swept[1])
+        if len(swept[0]) < EXPIRY_SWEEP_BATCH and len(swept[1]) < EXPIRY_SWEEP_BATCH:
+            break
+    logger.info(f"Expiry sweep: {premium} premium and {verify} verify flag(s) cleared.")
+    return 0
+
+
+# bench-bulk-withdraw: কৃত্রিম পেন্ডিং অনুরোধ তৈরি করে দুইভাবে অনুমোদনের সময় মাপে — পুরনো পথ
+# (প্রতি অনুরোধে স্ট্যাটাস UPDATE + আলাদা লেজার INSERT) বনাম একটি সেট-ভিত্তিক স্টেটমেন্ট।
+# সব কাজ একটি ট্রানজেকশনে হয় এবং শেষে ROLLBACK, তাই ডেটাবেসে কিছু থেকে যায় না।
+BENCH_USER_ID = -1
+
+_BENCH_SEED_SQL = """
+    INSERT INTO withdraw_requests (user_id, amount, wallet_address)
+    SELECT %s, 100.00, 'bench' FROM generate_series(1, %s)
+    RETURNING request_id
+"""
+
+
+def _bench_seed(cur, count):
+    cur.execute(_BENCH_SEED_SQL, (BENCH_USER_ID, count))
+    return [row[0] for row in cur.fetchall()]
+
+
+def bench_bulk_withdraw(args):
+    """count টি উত্তোলন অনুমোদনের প্রতি-অনুরোধ খরচ: একক পথ বনাম বাল্ক (সব ROLLBACK হয়)।"""
+    conn = db_handler.connect_db()
+    if not conn:
+        return 1
+    try:
+        with conn.cursor() as cur:
+            ids = _bench_seed(cur, args.count)
+            cur.execute("SAVEPOINT bench")
+            started = time.perf_counter()
+            for request_id in ids:
+                cur.execute(
+                    "UPDATE withdraw_requests SET status = 'completed' WHERE request_id = %s AND status = 'pending' RETURNING user_id, amount",
+                    (request_id,)
+                )
+                user_id, amount = cur.fetchone()
+                cur.execute(
+                    "INSERT INTO ledger_entries (user_id, kind, amount, ref) VALUES (%s, 'total_withdraw', %s, %s)",
+                    (user_id, amount, f"withdraw:{request_id}")
+                )
+            single = time.perf_counter() - started
+            cur.execute("ROLLBACK TO SAVEPOINT bench")
+
+            started = time.perf_counter()
+            decided = db_handler._review_withdrawals(cur, ids, 'completed')
+            bulk = time.perf_counter() - started
+        logger.info(
+            f"{args.count} approvals — per-request: {single * 1000:.0f} ms ({single / args.count * 1000:.3f} ms each, "
+            "excluding the per-click commit and second connection), "
+            f"bulk: {bulk * 1000:.0f} ms ({bulk / args.count * 1000:.3f} ms each, {len(decided)} decided)"
+        )
+        return 0
+    finally:
+        conn.rollback()
+        db_handler.release_db(conn)
+
+
+# bench-start: একসাথে আসা N টি /start (প্রত্যেকে নতুন, রেফার করা ইউজার) — start_command সরাসরি চালানো হয়,
+# DB কল run_db দিয়ে এক্সিকিউটরে যায়; reply_text নেটওয়ার্কে যায় না। তুলনা: একটি register_user কুয়েরির সময়
+# ও একই N টি ক্রমানুসারে। বানানো সব সারি শেষে মুছে ফেলা হয়।
+_BENCH_START_BASE_ID = 9_800_000_000
+
+
+def _bench_start_cleanup(user_ids):
+    conn = db_handler.connect_db()
+    if not conn:
+        return
+    try:
+        with conn.cursor() as cur:
+            refs = [f"join:{user_id}" for user_id in user_ids]
+            cur.execute("DELETE FROM ledger_entries WHERE ref = ANY(%s) OR user_id = ANY(%s)", (refs, user_ids))
+            cur.execute("DELETE FROM referral_holds WHERE user_id = ANY(%s) OR referrer_id = ANY(%s)", (user_ids, user_ids))
+            cur.execute("DELETE FROM user_balances WHERE user_id = ANY(%s)", (user_ids,))
+            cur.execute("DELETE FROM users WHERE user_id = ANY(%s)", (user_ids,))
+        conn.commit()
+    finally:
+        db_handler.release_db(conn)
+
+
+def bench_start(args):
+    """N টি সমান্তরাল /start-এর wall time: একটি কুয়েরির সময় ও N টি ক্রমানুসারের সাথে তুলনা (ms)।"""
+    import asyncio
+    from types import SimpleNamespace
+    import async_db
+    import bot
+
+    if db_handler.init_pool() is None:
+        return 1
+    concurrency = args.concurrency or db_handler.DB_POOL_MAX_SIZE
+    referrer_id = _BENCH_START_BASE_ID
+    used = [referrer_id]
+
+    def new_user_id():
+        used.append(used[-1] + 1)
+        return used[-1]
+
+    async def reply_text(*a, **kw):
+        pass
+
+    def start_update():
+        user_id = new_user_id()
+        user = SimpleNamespace(id=user_id, first_name="bench")
+        update = SimpleNamespace(effective_user=user, message=SimpleNamespace(reply_text=reply_text))
+        return update, SimpleNamespace(args=[str(referrer_id)])
+
+    async def run():
+        await async_db.run_db(bot.register_user, referrer_id)
+        # এক্সিকিউটর থ্রেড ও পুলের কানেকশন আগে গরম করা (কানেকশন খোলার খরচ মাপে ঢুকবে না)
+        await asyncio.gather(*(async_db.run_db(bot.register_user, referrer_id) for _ in range(concurrency)))
+
+        single = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            await async_db.run_db(bot.register_user, new_user_id(), referrer_id)
+            single.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(concurrency):
+            await bot.start_command(*start_update())
+        serial = time.perf_counter() - started
+
+        updates = [start_update() for _ in range(concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*(bot.start_command(*update) for update in updates))
+        concurrent = time.perf_counter() - started
+        return statistics.median(single), serial, concurrent
+
+    try:
+        single, serial, concurrent = asyncio.run(run())
+    finally:
+        async_db.shutdown_executor()
+        _bench_start_cleanup(used)
+    logger.info(
+        f"/start ×{concurrency} (pool max {db_handler.DB_POOL_MAX_SIZE}) — one register_user query: {single * 1000:.1f} ms, "
+        f"serial: {serial * 1000:.1f} ms, concurrent: {concurrent * 1000:.1f} ms "
+        f"({concurrent / single:.1f}× one query, {serial / concurrent:.1f}× faster than serial)"
+    )
+    return 0
+
+
+# bench-startup: প্রতিটি পরিস্থিতি নতুন ইন্টারপ্রেটারে চালানো হয় (কোল্ড কন্টেইনারের মতো)।
+# নেটওয়ার্ক কল (getMe, DB) বাদ — শুধু ইম্পোর্ট ও Application তৈরির খরচ মাপা হয়।
+STARTUP_BENCH_SCENARIOS = [
+    ("api/index.py module load", "import api.index"),
+    ("eager `import bot` (old entry)", "import bot"),
+    ("first update: import + build", "import api.index, bot; bot.build_application(serverless=True)"),
+]
+
+
+def _time_startup(statement):
+    code = (
+        "import time, warnings; warnings.simplefilter('ignore'); t = time.perf_counter(); "
+        f"{statement}; print((time.perf_counter() - t) * 1000)"
+    )
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "123456:bench")
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(args):
+    """সার্ভারলেস কোল্ড-স্টার্টের ইম্পোর্ট/বিল্ড সময় মাপে (median, ms)।"""
+    for label, statement in STARTUP_BENCH_SCENARIOS:
+        try:
+            samples = [_time_startup(statement) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            logger.error(f"{label}: failed\n{e.stderr}")
+            return 1
+        logger.info(f"{label}: median {statistics.median(samples):.1f} ms, min {min(samples):.1f} ms ({args.runs} runs)")
+    return 0
+
+
+# bench-menu-dispatch: একটি টেক্সট আপডেটের জন্য হ্যান্ডলার খুঁজে পেতে কত সময় লাগে — আগের regex চেইন
+# (প্রতিটি বাটনে একটি filters.Regex, শেষে ক্যাচ-অল) বনাম menu_router (হুবহু-টেক্সট entry + একটি dict রাউটার)।
+# কলব্যাক চলে না; শুধু PTB যেভাবে check_update() ক্রমানুসারে ডাকে সেটুকু মাপা হয়।
+_OLD_MENU_PATTERNS = ("^👤 PROFILE 👤$", "^💾 VERIFY ✅$", "^🏦 WITHDRAW 🏦$", "^⭐️ প্রিমিয়াম সার্ভিস$", "^📢 REFER 🎁$")
+_MENU_ENTRY_LABELS = ("👤 PROFILE 👤", "💾 VERIFY ✅", "🏦 WITHDRAW 🏦")
+
+
+def _first_match(handlers, update):
+    for handler in handlers:
+        if handler.check_update(update):
+            return handler
+    return None
+
+
+def bench_menu_dispatch(args):
+    """মেনু বাটন ও সাধারণ টেক্সট আপডেটে হ্যান্ডলার বাছাইয়ের গড় খরচ (µs/update): regex চেইন বনাম রাউটার।"""
+    import datetime
+    from telegram import Chat, Message, Update, User
+    from telegram.ext import MessageHandler, filters
+    from bot import main_menu_keyboard
+    from menu_router import MenuRouter
+
+    async def noop(update, context):
+        pass
+
+    fallback = MessageHandler(filters.TEXT & ~filters.COMMAND, noop)
+    old_chain = [MessageHandler(filters.Regex(pattern), noop) for pattern in _OLD_MENU_PATTERNS] + [fallback]
+
+    router = MenuRouter(main_menu_keyboard)
+    new_chain = [router.entry(label, noop) for label in _MENU_ENTRY_LABELS]
+    for label in sorted(router.labels - set(_MENU_ENTRY_LABELS)):
+        router.register(label, noop)
+    new_chain += [router.handler(), fallback]
+
+    user, chat = User(1, "bench", False), Chat(1, Chat.PRIVATE)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    texts = [label for row in main_menu_keyboard for label in row] + ["01700000000", "hello"]
+    updates = [
+        Update(i, message=Message(i, now, chat, from_user=user, text=text))
+        for i, text in enumerate(texts)
+    ]
+
+    for label, chain in (("regex chain", old_chain), ("menu router", new_chain)):
+        started = time.perf_counter()
+        for _ in range(args.count):
+            for update in updates:
+                _first_match(chain, update)
+        elapsed = time.perf_counter() - started
+        logger.info(f"{label}: {elapsed / (args.count * len(updates)) * 1e6:.2f} µs/update ({len(chain)} handlers)")
+    return 0
+
+
+# bench-render: একটি স্ক্রিনের টেক্সট ও কিবোর্ড তৈরির খরচ — প্রতিটি কলে f-string + escape_markdown +
+# নতুন InlineKeyboardMarkup বনাম message_templates.Template.render + মডিউল লোডের সময় তৈরি কিবোর্ড।
+# দুই পথেই ডাইনামিক ফিল্ড escape হয়, তাই আউটপুট একই; নেটওয়ার্ক কল নেই।
+def bench_render(args):
+    """ভেরিফাই অ্যাডমিন নোটিফিকেশন ও প্রোফাইল স্ক্রিন রেন্ডারের গড় খরচ (µs/screen)।"""
+    import datetime
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    from telegram.helpers import escape_markdown
+    from profile_handler import PROFILE_TEMPLATE, PROFILE_MARKUP
+    from verify_handler import ADMIN_VERIFY_TEMPLATE, VERIFY_AMOUNT, PAYMENT_METHOD_MARKUP, PAYMENT_NUMBER
+
+    def esc(value):
+        return escape_markdown(str(value), version=2)
+
+    def money(value):
+        return esc(format(value, '.2f'))
+
+    fields = {
+        'first_name': "Rahim_Khan (বস)", 'user_id': 123456789, 'method': "Bkash",
+        'date': datetime.datetime(2026, 1, 1, 12, 30).strftime('%Y-%m-%d %H:%M:%S'), 'tnx_id': "8N7A6B5C4D",
+    }
+    profile = {
+        'user_id': 123456789, 'premium_status': " Active", 'expiry_date_text': "2026-02-01",
+        'verify_status': " Verified (Expires: 2026-02-01)", 'premium_balance': 125.5, 'free_income': 10,
+        'refer_balance': 42.25, 'salary_balance': 0, 'total_withdraw': 300, 'wallet': "01700-000000",
+    }
+
+    def old_verify():
+        text = (
+            f"🔔 *নতুন ভেরিফাই রিকোয়েস্ট\\!* 🔔\n"
+            f"👤 *ইউজার* : *{esc(fields['first_name'])}*\n"
+            f"🆔 *ইউজার ID* : `{fields['user_id']}`\n"
+            f"🗓️ *Date* : {esc(fields['date'])}\n"
+            f"💳 *Method* : {esc(fields['method'])}\n"
+            f"💸 *Amount* : *{money(VERIFY_AMOUNT)} ৳*\n"
+            f"🔑 *Tnx ID* : `{escape_markdown(fields['tnx_id'], version=2, entity_type='code')}`"
+        )
+        markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton(f"💸 Bkash - {PAYMENT_NUMBER}", callback_data="method_Bkash")],
+            [InlineKeyboardButton(f"💰 Nagad - {PAYMENT_NUMBER}", callback_data="method_Nagad")]
+        ])
+        return text, markup
+
+    def old_profile():
+        text = (
+            f" *  * \n"
+            f"* :* `{profile['user_id']}`\n\n"
+            f"*  :* {esc(profile['premium_status'])}\n"
+            f"*  :* {esc(profile['expiry_date_text'])}\n"
+            f"*  :* {esc(profile['verify_status'])}\n\n"
+            f"*  :*\n"
+            f" Premium Balance: * {money(profile['premium_balance'])}*\n"
+            f" Free Income: * {money(profile['free_income'])}*\n"
+            f" Refer Balance: * {money(profile['refer_balance'])}*\n"
+            f" Salary Balance: * {money(profile['salary_balance'])}*\n\n"
+            f" * :* * {money(profile['total_withdraw'])}*\n"
+            f" * :* `{escape_markdown(profile['wallet'], version=2, entity_type='code')}`\n"
+        )
+        markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("   ", callback_data='set_wallet')],
+            [InlineKeyboardButton(" ", callback_data='menu_home')]
+        ])
+        return text, markup
+
+    def new_verify():
+        return ADMIN_VERIFY_TEMPLATE.render(**fields), PAYMENT_METHOD_MARKUP
+
+    def new_profile():
+        return PROFILE_TEMPLATE.render(**profile), PROFILE_MARKUP
+
+    if old_verify()[0] != new_verify()[0] or old_profile()[0] != new_profile()[0]:
+        logger.error("Template output differs from the f-string path.")
+        return 1
+
+    for label, screens in (("f-string + escape_markdown", (old_verify, old_profile)),
+                           ("Template.render", (new_verify, new_profile))):
+        started = time.perf_counter()
+        for _ in range(args.count):
+            for screen in screens:
+                screen()
+        elapsed = time.perf_counter() - started
+        logger.info(f"{label}: {elapsed / (args.count * len(screens)) * 1e6:.2f} µs/screen")
+    return 0
+
+
+def reconcile_statement(args):
+    """পেমেন্ট স্টেটমেন্টের CSV মিলিয়ে পেন্ডিং ভেরিফাই অটো-অনুমোদন (BOT_TOKEN থাকলে ইউজারদের জানানো হয়)।"""
+    import asyncio
+    from statement_handler import METHODS, reconcile_statement_file, format_reconcile_summary, notify_accepted
+
+    method = METHODS.get((args.method or "").lower())
+    if method is None or not args.file:
+        logger.error("Usage: python manage.py reconcile-statement --file statement.csv --method bkash|nagad")
+        return 1
+    decided, stats = reconcile_statement_file(args.file, method)
+    if decided is None:
+        return 1
+    logger.info(format_reconcile_summary(method, stats).replace("\n", " | "))
+
+    token = os.environ.get("BOT_TOKEN")
+    if decided and token:
+        from telegram import Bot
+
+        async def send():
+            async with Bot(token) as bot:
+                await notify_accepted(bot, decided)
+
+        asyncio.run(send())
+    elif decided:
+        logger.warning("BOT_TOKEN not set; accepted users were not notified.")
+    return 0
+
+
+# bench-reconcile: কৃত্রিম স্টেটমেন্ট (count, count/2, count/4 সারি) ডিস্কে লিখে স্ট্রিম করে মেলানো হয়; DB লাগে না।
+# সারি বাড়লে সময় রৈখিকভাবে বাড়ে কিন্তু পিক মেমোরি (tracemalloc) প্রায় একই থাকে — ইনডেক্স শুধু পেন্ডিং রিকোয়েস্টের।
+# সময় ও মেমোরি আলাদা পাসে মাপা হয় (tracemalloc নিজেই রান ধীর করে)।
+BENCH_PENDING = 5000
+
+
+def _write_statement(path, rows, tnx_keys):
+    import csv
+    keys = list(tnx_keys)
+    step = max(rows // (len(keys) + 1), 1)
+    base = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=6)))
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(("Date Time", "TrxID", "Sender", "Amount", "Balance"))
+        for i in range(rows):
+            trx = keys.pop() if keys and i % step == 0 else f"Z{i:09d}"
+            when = base + datetime.timedelta(seconds=i % 3600)
+            writer.writerow((when.strftime("%Y-%m-%d %H:%M:%S"), trx, "01700000000", "50.00", "1,000.00"))
+
+
+def bench_reconcile(args):
+    """স্টেটমেন্ট মেলানোর থ্রুপুট ও পিক মেমোরি, তিনটি আকারে।"""
+    import tempfile
+    import tracemalloc
+    from statement_handler import iter_statement, match_statement
+
+    requested_at = datetime.datetime(2026, 1, 1, 1, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=6)))
+    keys = [f"A{i:09d}" for i in range(BENCH_PENDING)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for rows in (args.count // 4, args.count // 2, args.count):
+            path = os.path.join(tmpdir, f"statement_{rows}.csv")
+            _write_statement(path, rows, keys[:BENCH_PENDING // 2])
+            started = time.perf_counter()
+            with open(path, newline="", encoding="utf-8") as lines:
+                matched, _ = match_statement(iter_statement(lines), {key: (i, 50.0, requested_at) for i, key in enumerate(keys)})
+            elapsed = time.perf_counter() - started
+
+            pending = {key: (i, 50.0, requested_at) for i, key in enumerate(keys)}
+            tracemalloc.start()
+            with open(path, newline="", encoding="utf-8") as lines:
+                match_statement(iter_statement(lines), pending)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            logger.info(
+                f"{rows} rows: {elapsed:.2f} s ({elapsed / rows * 1e6:.2f} µs/row), "
+                f"peak {peak / 1024:.0f} KiB, matched {len(matched)}/{BENCH_PENDING}"
+            )
+    return 0
+
+
+COMMANDS = {
+    'migrate': migrate,
+    'schema-status': schema_status,
+    'reconcile-referrals': reconcile_referrals,
+    'recompute-commissions': recompute_commissions,
+    'compact-ledger': compact_ledger,
+    'reconcile-ledger': reconcile_ledger,
+    'sweep-expiry': sweep_expiry,
+    'bench-startup': bench_startup,
+    'bench-start': bench_start,
+    'bench-bulk-withdraw': bench_bulk_withdraw,
+    'bench-menu-dispatch': bench_menu_dispatch,
+    'bench-render': bench_render,
+    'reconcile-statement': reconcile_statement,
+    'bench-reconcile': bench_reconcile,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bot maintenance commands")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--target', type=int, default=None, help="migrate: stop at this schema version")
+    parser.add_argument('--runs', type=int, default=5, help="bench-startup: runs per scenario; bench-start: single-query samples")
+    parser.add_argument('--concurrency', type=int, default=None, help="bench-start: parallel /start updates (default: DB_POOL_MAX_SIZE)")
+    parser.add_argument('--file', default=None, help="reconcile-statement: statement CSV path")
+    parser.add_argument('--method', default=None, help="reconcile-statement: bkash or nagad")
+    parser.add_argument('--apply', action='store_true', help="recompute-commissions: insert missing commissions")
+    parser.add_argument('--count', type=int, default=1000, help="bench-bulk-withdraw: number of requests; bench-menu-dispatch/bench-render: rounds; bench-reconcile: statement rows")
+    args = parser.parse_args(argv)
+    try:
+        return COMMANDS[args.command](args)
+    finally:
+        db_handler.close_pool()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
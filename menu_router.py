@@ -0,0 +1,73 @@
+import logging
+
+from telegram import Update
+from telegram.ext import ContextTypes, MessageHandler, filters
+
+logger = logging.getLogger(__name__)
+
+# --- রিপ্লাই-কিবোর্ড মেনু রাউটার ---
+# আগে প্রতিটি মেনু বাটনের জন্য আলাদা filters.Regex হ্যান্ডলার ছিল, আর বাকিগুলো handle_button_clicks-এর
+# if/elif চেইনে যেত — প্রতিটি টেক্সট মেসেজে সবগুলো regex একে একে চলত।
+# এখানে বাটনের লেবেল -> কলব্যাক একটি dict-এ থাকে; একটিই MessageHandler dict লুকআপে (O(1)) ঠিক করে
+# কোন কলব্যাক চলবে। লেবেল main_menu_keyboard থেকে নেওয়া হয়, তাই কিবোর্ডে নেই এমন লেবেল
+# রেজিস্টার করলে (টাইপো) বট চালুর সময়ই ValueError হয়।
+
+
+class ExactTextFilter(filters.MessageFilter):
+    """মেসেজের টেক্সট হুবহু দেওয়া লেবেলগুলোর একটি হলে মেলে (regex ছাড়া, set লুকআপ)।"""
+
+    def __init__(self, labels, name=None):
+        # labels যেকোনো কন্টেইনার হতে পারে; MenuRouter তার dict দেয়, তাই পরে রেজিস্টার করা লেবেলও মেলে
+        self.labels = labels
+        super().__init__(name=name or "ExactTextFilter", data_filter=False)
+
+    def filter(self, message):
+        return message.text in self.labels
+
+
+class MenuRouter:
+    """
+    main_menu_keyboard-এর বাটন লেবেল থেকে কলব্যাকে এক ধাপের ডিসপ্যাচ।
+
+    register(label, callback) — সাধারণ বাটন (যেমন REFER); সবগুলো handler()-এর একটি MessageHandler দিয়ে চলে।
+    entry(label, callback) — ConversationHandler-এর entry point (PROFILE, VERIFY, WITHDRAW); কনভার্সেশনের
+    স্টেট বদলাতে হয় বলে আলাদা MessageHandler লাগে, তবে regex নয়, হুবহু টেক্সট মিলিয়ে।
+    """
+
+    def __init__(self, keyboard):
+        self.labels = frozenset(label for row in keyboard for label in row)
+        self._routes = {}
+        self._entries = set()
+
+    def _check(self, label):
+        if label not in self.labels:
+            raise ValueError(f"'{label}' মেনু কিবোর্ডে নেই")
+        if label in self._routes or label in self._entries:
+            raise ValueError(f"'{label}' ইতিমধ্যে রেজিস্টার করা হয়েছে")
+
+    def register(self, label, callback=None):
+        """বাটন লেবেলের জন্য কলব্যাক যোগ করে; callback না দিলে ডেকোরেটর দেয় (@router.register(label))।"""
+        if callback is None:
+            return lambda func: self.register(label, func)
+        self._check(label)
+        self._routes[label] = callback
+        return callback
+
+    def entry(self, label, callback):
+        """ConversationHandler entry point হিসেবে বসানোর জন্য হুবহু-টেক্সট MessageHandler দেয়।"""
+        self._check(label)
+        self._entries.add(label)
+        return MessageHandler(ExactTextFilter(frozenset((label,)), name=f"MenuEntry({label})"), callback)
+
+    def handler(self):
+        """register() করা সব বাটনের জন্য একটিই MessageHandler (পরে রেজিস্টার করা লেবেলও এটি ধরবে)।"""
+        return MessageHandler(ExactTextFilter(self._routes, name="MenuRouter"), self.dispatch)
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        callback = self._routes.get(update.effective_message.text)
+        if callback is not None:
+            return await callback(update, context)
+
+    def unrouted(self):
+        """কিবোর্ডে আছে কিন্তু কোনো হ্যান্ডলার নেই এমন লেবেল (চালুর সময় লগ করার জন্য)।"""
+        return sorted(self.labels - self._routes.keys() - self._entries)
@@ -0,0 +1,100 @@
+import string
+
+from telegram.constants import ParseMode
+
+# --- MarkdownV2 মেসেজ টেমপ্লেট ---
+# স্ক্রিনের টেক্সট মডিউল লোডের সময় একবার Template(...) দিয়ে কম্পাইল হয়: স্ট্যাটিক অংশ আগেই
+# MarkdownV2-এর জন্য escape করা থাকে, render() শুধু ডাইনামিক ফিল্ড escape করে জোড়া দেয়।
+# তাই ইউজারের first_name, Tnx ID বা ওয়ালেটে '_', '*', '.' ইত্যাদি থাকলেও পার্সিং ভাঙে না।
+#
+# টেমপ্লেটের সিনট্যাক্স: *বোল্ড*, `কোড`, {field} / {field:.2f} (str.format-এর মতো)।
+# স্ট্যাটিক টেক্সটে * ও ` মার্কআপ হিসেবে থাকে; বাকি সব বিশেষ অক্ষর (. ! ( ) - ইত্যাদি)
+# নিজে থেকে escape হয়। কোড স্প্যানের ভেতরের ফিল্ডে শুধু \ ও ` escape হয় (Bot API-র নিয়ম)।
+MARKDOWN_V2 = ParseMode.MARKDOWN_V2
+
+_SPECIAL = "\\_*[]()~`>#+-=|{}.!"
+_MARKUP = "*`"
+
+# telegram.helpers.escape_markdown(version=2)-এর সমান, কিন্তু re.sub-এর বদলে str.translate (দ্রুত)
+_TEXT_TABLE = str.maketrans({ch: "\\" + ch for ch in _SPECIAL})
+_CODE_TABLE = str.maketrans({"\\": "\\\\", "`": "\\`"})
+_STATIC_TABLE = str.maketrans({ch: "\\" + ch for ch in _SPECIAL if ch not in _MARKUP})
+
+_formatter = string.Formatter()
+
+
+def escape(text):
+    """সাধারণ টেক্সট MarkdownV2-এ হুবহু দেখানোর জন্য escape করে।"""
+    return str(text).translate(_TEXT_TABLE)
+
+
+class Template:
+    """
+    একবার কম্পাইল করা MarkdownV2 টেমপ্লেট। render(**fields) ফিল্ডগুলো ফরম্যাট ও escape করে
+    পুরো টেক্সট দেয়; bind(**fields) স্থির মানগুলো (যেমন বোনাসের পরিমাণ) আগেই বসিয়ে নতুন টেমপ্লেট দেয়।
+    """
+
+    parse_mode = MARKDOWN_V2
+
+    def __init__(self, source):
+        self.source = source
+        parts = []
+        in_code = False
+        for literal, field, spec, conversion in _formatter.parse(source):
+            escaped = []
+            for i, chunk in enumerate(literal.split("`")):
+                if i:
+                    escaped.append("`")
+                    in_code = not in_code
+                escaped.append(chunk.translate(_CODE_TABLE if in_code else _STATIC_TABLE))
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"টেমপ্লেট ফিল্ড শুধু নাম হতে পারে: {{{field}}}")
+            parts.append(("".join(escaped), field, spec or "", conversion, _CODE_TABLE if in_code else _TEXT_TABLE))
+        if in_code:
+            raise ValueError(f"টেমপ্লেটে ` বন্ধ হয়নি: {source[:40]!r}")
+        self._parts = self._merge(parts)
+        self.fields = frozenset(field for _, field, _, _, _ in self._parts if field)
+
+    @staticmethod
+    def _merge(parts):
+        """ফিল্ডহীন পরপর লিটারাল এক করে, যাতে render-এ কম টুকরো জোড়া লাগে।"""
+        merged = []
+        for literal, field, spec, conversion, table in parts:
+            if merged and merged[-1][1] is None:
+                literal = merged.pop()[0] + literal
+            merged.append((literal, field, spec, conversion, table))
+        return merged
+
+    @staticmethod
+    def _format(value, spec, conversion, table):
+        if conversion == 'r':
+            value = repr(value)
+        elif conversion == 's':
+            value = str(value)
+        return format(value, spec).translate(table)
+
+    def render(self, **fields):
+        out = []
+        for literal, field, spec, conversion, table in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(self._format(fields[field], spec, conversion, table))
+        return "".join(out)
+
+    def bind(self, **fields):
+        """কিছু ফিল্ড স্থায়ীভাবে বসানো নতুন টেমপ্লেট (স্ট্যাটিক অংশের মতোই একবার escape হয়)।"""
+        bound = Template.__new__(Template)
+        bound.source = self.source
+        parts = []
+        for literal, field, spec, conversion, table in self._parts:
+            if field in fields:
+                parts.append((literal + self._format(fields[field], spec, conversion, table), None, "", None, None))
+            else:
+                parts.append((literal, field, spec, conversion, table))
+        bound._parts = self._merge(parts)
+        bound.fields = frozenset(field for _, field, _, _, _ in bound._parts if field)
+        return bound
+
+    def __str__(self):
+        """ফিল্ডহীন টেমপ্লেটের রেন্ডার করা টেক্সট।"""
+        return self.render()
@@ -0,0 +1,59 @@
+-- ইউজার টেবিল: আগের bot.py ও db_handler.py-এর দুই রকম স্কিমার সমন্বিত রূপ।
+-- পুরনো ডেটাবেসেও নিরাপদে চলে (IF NOT EXISTS), কোনো কলাম মুছে ফেলা হয় না।
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    status TEXT DEFAULT 'free',
+    is_premium BOOLEAN DEFAULT FALSE,
+    expiry_date DATE,
+    verify_expiry TIMESTAMP WITH TIME ZONE,
+    join_date DATE DEFAULT CURRENT_DATE,
+    referrer_id BIGINT,
+    balance NUMERIC(10, 2) DEFAULT 0.00,
+    premium_balance NUMERIC(10, 2) DEFAULT 0.00,
+    free_income NUMERIC(10, 2) DEFAULT 0.00,
+    refer_balance NUMERIC(10, 2) DEFAULT 0.00,
+    salary_balance NUMERIC(10, 2) DEFAULT 0.00,
+    total_withdraw NUMERIC(10, 2) DEFAULT 0.00,
+    wallet_address TEXT,
+    free_referrals INTEGER NOT NULL DEFAULT 0,
+    premium_referrals INTEGER NOT NULL DEFAULT 0
+);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS username TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS first_name TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS status TEXT DEFAULT 'free';
+ALTER TABLE users ADD COLUMN IF NOT EXISTS is_premium BOOLEAN DEFAULT FALSE;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS expiry_date DATE;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS verify_expiry TIMESTAMP WITH TIME ZONE;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS join_date DATE DEFAULT CURRENT_DATE;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS referrer_id BIGINT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS balance NUMERIC(10, 2) DEFAULT 0.00;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS premium_balance NUMERIC(10, 2) DEFAULT 0.00;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS free_income NUMERIC(10, 2) DEFAULT 0.00;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS refer_balance NUMERIC(10, 2) DEFAULT 0.00;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS salary_balance NUMERIC(10, 2) DEFAULT 0.00;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS total_withdraw NUMERIC(10, 2) DEFAULT 0.00;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS wallet_address TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS free_referrals INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS premium_referrals INTEGER NOT NULL DEFAULT 0;
+
+-- পুরনো bot.py স্কিমায় ব্যালেন্স কলামে ডিফল্ট ছিল না, তাই NULL থেকে যেত
+ALTER TABLE users ALTER COLUMN balance SET DEFAULT 0.00;
+ALTER TABLE users ALTER COLUMN premium_balance SET DEFAULT 0.00;
+ALTER TABLE users ALTER COLUMN free_income SET DEFAULT 0.00;
+ALTER TABLE users ALTER COLUMN refer_balance SET DEFAULT 0.00;
+ALTER TABLE users ALTER COLUMN salary_balance SET DEFAULT 0.00;
+ALTER TABLE users ALTER COLUMN total_withdraw SET DEFAULT 0.00;
+UPDATE users
+SET balance = COALESCE(balance, 0.00),
+    premium_balance = COALESCE(premium_balance, 0.00),
+    free_income = COALESCE(free_income, 0.00),
+    refer_balance = COALESCE(refer_balance, 0.00),
+    salary_balance = COALESCE(salary_balance, 0.00),
+    total_withdraw = COALESCE(total_withdraw, 0.00)
+WHERE balance IS NULL OR premium_balance IS NULL OR free_income IS NULL
+   OR refer_balance IS NULL OR salary_balance IS NULL OR total_withdraw IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_users_referrer_id ON users (referrer_id);
@@ -0,0 +1,21 @@
+-- উইথড্র ও ভেরিফাই রিকোয়েস্ট টেবিল।
+-- ভেরিফাই রিকোয়েস্টের একমাত্র টেবিল verify_requests (আগের verification_requests আর ব্যবহৃত হয় না)।
+CREATE TABLE IF NOT EXISTS withdraw_requests (
+    request_id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    amount NUMERIC(10, 2) NOT NULL,
+    wallet_address VARCHAR(100) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending', -- 'pending', 'completed', 'rejected'
+    requested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS verify_requests (
+    request_id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    username TEXT,
+    amount NUMERIC(10, 2),
+    method VARCHAR(20),
+    tnx_id VARCHAR(64) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending', -- 'pending', 'accept', 'reject'
+    requested_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
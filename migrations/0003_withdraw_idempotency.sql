@@ -0,0 +1,5 @@
+-- উইথড্র কনভার্সেশনের idempotency key: একই কনভার্সেশনের রিট্রাই হওয়া আপডেট
+-- দ্বিতীয়বার টাকা কাটতে পারবে না (ইউনিক ইনডেক্স দ্বিতীয় INSERT আটকে দেয়)।
+ALTER TABLE withdraw_requests ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_withdraw_requests_idempotency_key
+    ON withdraw_requests (idempotency_key);
@@ -0,0 +1,46 @@
+-- অ্যাপেন্ড-অনলি লেজার: প্রতিটি টাকার পরিবর্তন একটি নতুন সারি (kind = কোন ব্যালেন্স)।
+-- user_balances হলো কমপ্যাক্ট করা যোগফল; entries.compacted = TRUE মানে যোগফলে ধরা হয়েছে।
+-- বর্তমান ব্যালেন্স = user_balances + এখনো কমপ্যাক্ট না হওয়া এন্ট্রির যোগফল।
+CREATE TABLE IF NOT EXISTS ledger_entries (
+    entry_id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    kind VARCHAR(20) NOT NULL CHECK (kind IN (
+        'balance', 'premium_balance', 'free_income',
+        'refer_balance', 'salary_balance', 'total_withdraw'
+    )),
+    amount NUMERIC(12, 2) NOT NULL,
+    ref TEXT,
+    ts TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    compacted BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+-- প্রোফাইল/উইথড্র রিডের "টেইল" অংশ: শুধু কমপ্যাক্ট না হওয়া এন্ট্রি
+CREATE INDEX IF NOT EXISTS idx_ledger_entries_pending
+    ON ledger_entries (user_id) INCLUDE (kind, amount) WHERE NOT compacted;
+CREATE INDEX IF NOT EXISTS idx_ledger_entries_user ON ledger_entries (user_id, entry_id);
+
+CREATE TABLE IF NOT EXISTS user_balances (
+    user_id BIGINT PRIMARY KEY,
+    balance NUMERIC(12, 2) NOT NULL DEFAULT 0.00,
+    premium_balance NUMERIC(12, 2) NOT NULL DEFAULT 0.00,
+    free_income NUMERIC(12, 2) NOT NULL DEFAULT 0.00,
+    refer_balance NUMERIC(12, 2) NOT NULL DEFAULT 0.00,
+    salary_balance NUMERIC(12, 2) NOT NULL DEFAULT 0.00,
+    total_withdraw NUMERIC(12, 2) NOT NULL DEFAULT 0.00,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- users টেবিলের পুরনো ব্যালেন্স কলামগুলো ওপেনিং এন্ট্রি হিসেবে লেজারে আনা হয়।
+-- এরপর থেকে users.*balance কলামগুলো আর লেখা বা পড়া হয় না (শুধু ইতিহাসের জন্য রাখা)।
+INSERT INTO ledger_entries (user_id, kind, amount, ref)
+SELECT u.user_id, v.kind, v.amount, 'opening'
+FROM users u
+CROSS JOIN LATERAL (VALUES
+    ('balance', u.balance),
+    ('premium_balance', u.premium_balance),
+    ('free_income', u.free_income),
+    ('refer_balance', u.refer_balance),
+    ('salary_balance', u.salary_balance),
+    ('total_withdraw', u.total_withdraw)
+) AS v(kind, amount)
+WHERE COALESCE(v.amount, 0) <> 0;
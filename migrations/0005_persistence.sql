@@ -0,0 +1,10 @@
+-- PTB persistence (user_data, chat_data, bot_data ও ConversationHandler স্টেট)।
+-- kind + name + key দিয়ে একটি সারি; data JSON হিসেবে রাখা হয়।
+CREATE TABLE IF NOT EXISTS bot_persistence (
+    kind VARCHAR(20) NOT NULL, -- 'user_data', 'chat_data', 'bot_data', 'conversation'
+    name TEXT NOT NULL DEFAULT '', -- কনভার্সেশনের নাম (অন্যগুলোর জন্য '')
+    key TEXT NOT NULL, -- user/chat id বা কনভার্সেশন key (JSON)
+    data JSONB,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (kind, name, key)
+);
@@ -0,0 +1,12 @@
+-- অ্যাডমিন /queue: পেন্ডিং রিকোয়েস্টের keyset পেজিনেশন (requested_at, request_id)।
+-- পার্শিয়াল ইনডেক্সে শুধু পেন্ডিং সারি থাকে, তাই সিদ্ধান্ত হয়ে যাওয়া হাজারো সারি ইনডেক্স বড় করে না।
+-- keyset তুলনা NULL-এ কাজ করে না, তাই requested_at NOT NULL করা হয়।
+UPDATE withdraw_requests SET requested_at = 'epoch' WHERE requested_at IS NULL;
+ALTER TABLE withdraw_requests ALTER COLUMN requested_at SET NOT NULL;
+UPDATE verify_requests SET requested_at = 'epoch' WHERE requested_at IS NULL;
+ALTER TABLE verify_requests ALTER COLUMN requested_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_withdraw_requests_pending
+    ON withdraw_requests (requested_at, request_id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_verify_requests_pending
+    ON verify_requests (requested_at, request_id) WHERE status = 'pending';
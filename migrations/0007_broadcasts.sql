@@ -0,0 +1,20 @@
+-- অ্যাডমিন /broadcast: অগ্রগতি এখানে চেকপয়েন্ট হয় যাতে ক্র্যাশের পর last_user_id থেকে আবার শুরু হয়।
+-- ইউজার বট ব্লক করলে users.is_blocked = TRUE; পরের ব্রডকাস্ট তাদের বাদ দেয়, /start দিলে আবার FALSE।
+ALTER TABLE users ADD COLUMN IF NOT EXISTS is_blocked BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE TABLE IF NOT EXISTS broadcasts (
+    broadcast_id SERIAL PRIMARY KEY,
+    admin_chat_id BIGINT NOT NULL,
+    status_message_id BIGINT, -- অগ্রগতি দেখানো অ্যাডমিন মেসেজ (এডিট করা হয়)
+    text TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running', -- 'running', 'done', 'cancelled'
+    last_user_id BIGINT NOT NULL DEFAULT 0, -- এই user_id পর্যন্ত সবাইকে পাঠানো শেষ
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_broadcasts_running ON broadcasts (broadcast_id) WHERE status = 'running';
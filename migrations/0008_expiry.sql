@@ -0,0 +1,15 @@
+-- প্রিমিয়াম/ভেরিফাই মেয়াদ: রিড-পাথ শুধু is_premium / is_verified ফ্ল্যাগ দেখে,
+-- মেয়াদ শেষ হলে expiry_handler-এর সুইপার জব ফ্ল্যাগ বন্ধ করে ও রিমাইন্ডার পাঠায়।
+-- পার্শিয়াল ইনডেক্সে শুধু সক্রিয় ইউজার থাকে, তাই সুইপের খরচ মোট ইউজার নয়, মেয়াদ ফুরোতে যাওয়া ইউজারের সমানুপাতিক।
+ALTER TABLE users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN NOT NULL DEFAULT FALSE;
+-- কোন মেয়াদের জন্য রিমাইন্ডার পাঠানো হয়েছে; মেয়াদ বাড়লে মান মেলে না, তাই নতুন মেয়াদে আবার রিমাইন্ডার যায়
+ALTER TABLE users ADD COLUMN IF NOT EXISTS premium_reminded_for DATE;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS verify_reminded_for TIMESTAMP WITH TIME ZONE;
+
+UPDATE users SET is_verified = TRUE WHERE verify_expiry > now() AND NOT is_verified;
+
+-- মেয়াদ পেরোনো is_premium সারি এখানে বদলানো হয় না — সুইপার রেফারারের কাউন্টারসহ বন্ধ করবে
+CREATE INDEX IF NOT EXISTS idx_users_premium_expiry
+    ON users (expiry_date, user_id) WHERE is_premium;
+CREATE INDEX IF NOT EXISTS idx_users_verify_expiry
+    ON users (verify_expiry, user_id) WHERE is_verified;
@@ -0,0 +1,13 @@
+-- 📜 HISTORY স্ক্রিন: ইউজারের উত্তোলন, ভেরিফাই ও ব্যালেন্স পরিবর্তন একটি টাইমলাইনে (history_handler.py)।
+-- প্রতিটি উৎসে (user_id, সময় DESC, id DESC) কভারিং ইনডেক্স, স্ক্রিনে লাগা কলাম INCLUDE-এ — তাই প্রতিটি পেজ
+-- তিনটি ইনডেক্স-অনলি রেঞ্জ স্ক্যান (limit+1 সারি করে), ইতিহাস যত লম্বাই হোক।
+CREATE INDEX IF NOT EXISTS idx_withdraw_requests_history
+    ON withdraw_requests (user_id, requested_at DESC, request_id DESC) INCLUDE (amount, status);
+CREATE INDEX IF NOT EXISTS idx_verify_requests_history
+    ON verify_requests (user_id, requested_at DESC, request_id DESC) INCLUDE (amount, status, method);
+
+-- লেজারের total_withdraw (পরিসংখ্যান) ও উত্তোলন অনুরোধের ডেবিট ('withdraw:<id>') বাদ — ওগুলো উত্তোলনের সারিতেই দেখা যায়।
+-- এই শর্ত history_handler.HISTORY_SQL-এর শর্তের সাথে হুবহু মিলতে হবে, নইলে প্ল্যানার ইনডেক্সটি ব্যবহার করবে না।
+CREATE INDEX IF NOT EXISTS idx_ledger_entries_history
+    ON ledger_entries (user_id, ts DESC, entry_id DESC) INCLUDE (kind, amount, ref)
+    WHERE kind <> 'total_withdraw' AND (ref IS NULL OR ref NOT LIKE 'withdraw:%');
@@ -0,0 +1,25 @@
+-- 🏅 TASK: টাস্ক সংজ্ঞা ও ইউজারভিত্তিক সম্পন্নের রেকর্ড (task_handler.py)।
+-- tier হলো টাস্ক দেখার ন্যূনতম স্তর: free < verified < premium।
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id SERIAL PRIMARY KEY,
+    title TEXT NOT NULL,
+    url TEXT,
+    reward NUMERIC(10, 2) NOT NULL CHECK (reward >= 0),
+    tier VARCHAR(10) NOT NULL DEFAULT 'free' CHECK (tier IN ('free', 'verified', 'premium')),
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_tasks_active ON tasks (task_id) WHERE is_active;
+
+-- প্রাইমারি কী (user_id, task_id) একই সাথে "একবারই রিওয়ার্ড" ইউনিক কনস্ট্রেইন্ট এবং
+-- টাস্ক লিস্ট খোলার সময় "কোনগুলো সম্পন্ন" লুকআপের ইনডেক্স (ইনডেক্স-অনলি)।
+-- tasks-এ FOREIGN KEY নেই: ক্যাম্পেইনে হাজারো INSERT একই টাস্ক সারিতে KEY SHARE লক নিত
+-- (multixact চাপ); টাস্ক কখনো মোছা হয় না, শুধু is_active = FALSE হয়।
+CREATE TABLE IF NOT EXISTS task_completions (
+    user_id BIGINT NOT NULL,
+    task_id INTEGER NOT NULL,
+    reward NUMERIC(10, 2) NOT NULL,
+    completed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, task_id)
+);
@@ -0,0 +1,16 @@
+-- ভেরিফাই রিকোয়েস্টে একই bKash/Nagad TrxID দ্বিতীয়বার জমা বন্ধ (verify_handler.py)।
+-- tnx_key = স্বাভাবিক করা TrxID (ফাঁকা জায়গা ও '-' বাদ, বড় হাতের) — verify_handler.normalize_tnx_id-এর সাথে হুবহু মিলতে হবে।
+ALTER TABLE verify_requests ADD COLUMN IF NOT EXISTS tnx_key VARCHAR(64);
+
+-- পুরনো সারি: প্রতিটি (method, key)-এর প্রথম রিকোয়েস্টই key পায়; আগে জমা পড়া ডুপ্লিকেটগুলো ইতিহাসে থাকে
+-- কিন্তু tnx_key NULL (ইউনিক ইনডেক্সে NULL-এর সংঘর্ষ হয় না)।
+UPDATE verify_requests v SET tnx_key = first.key
+FROM (
+    SELECT DISTINCT ON (method, key) request_id, key
+    FROM (SELECT request_id, method, upper(regexp_replace(tnx_id, '[\s-]', '', 'g')) AS key FROM verify_requests) n
+    ORDER BY method, key, request_id
+) first
+WHERE v.request_id = first.request_id;
+
+-- আসল গ্যারান্টি: একাধিক ওয়ার্কার বা প্রসেসের Bloom ফিল্টারে না থাকলেও একই মেথডে একই TrxID একবারই।
+CREATE UNIQUE INDEX IF NOT EXISTS uq_verify_requests_tnx ON verify_requests (method, tnx_key);
@@ -0,0 +1,15 @@
+-- সন্দেহজনক রেফারেল বোনাস সরাসরি লেজারে না গিয়ে এখানে আটকে থাকে (fraud_handler.py)।
+-- অ্যাডমিন ছাড়লে (released) একই 'join:<user_id>' ref-এ লেজারে ক্রেডিট হয়, বাতিল করলে (voided) কিছুই না।
+-- user_id = রেফারি; প্রতিটি জয়েনে একটিই বোনাস, তাই এটিই প্রাইমারি কী।
+CREATE TABLE IF NOT EXISTS referral_holds (
+    user_id BIGINT PRIMARY KEY,
+    referrer_id BIGINT NOT NULL,
+    amount NUMERIC(10, 2) NOT NULL,
+    reason VARCHAR(20) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'released', 'voided')),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    decided_at TIMESTAMP WITH TIME ZONE
+);
+
+-- /holds তালিকা ও রেফারার-ভিত্তিক ছাড়/বাতিল: শুধু পেন্ডিং সারি
+CREATE INDEX IF NOT EXISTS idx_referral_holds_pending ON referral_holds (referrer_id) WHERE status = 'pending';
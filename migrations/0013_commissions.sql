@@ -0,0 +1,5 @@
+-- মাল্টি-লেভেল রেফারেল কমিশন (commission_handler.py): প্রতিটি ইভেন্টের প্রতিটি লেভেলের কমিশন একটি লেজার এন্ট্রি,
+-- ref = 'commission:<ইভেন্ট>:<লেভেল>' (যেমন commission:verify:123:1)। ref ইউনিক, তাই একই ইভেন্ট আবার সেটল
+-- হলে (রিট্রাই, নাইটলি রিকম্পিউট) ON CONFLICT DO NOTHING — কমিশন একবারই যায়।
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ledger_entries_commission
+    ON ledger_entries (ref) WHERE ref LIKE 'commission:%';
@@ -0,0 +1,4 @@
+-- bot_persistence সারির ভার্সন: প্রতিটি লেখায় +1। প্রতিটি আপডেটের আগে ওয়ার্কার সারিটি আবার পড়ে
+-- (persistence.refresh_user_data) এবং ভার্সন বদলালে নিজের কপি বদলে নেয় — একাধিক ওয়ার্কার/কন্টেইনারে
+-- একই ইউজারের স্টেট আলাদা হয়ে যায় না।
+ALTER TABLE bot_persistence ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
@@ -0,0 +1,15 @@
+-- টাস্ক যাচাই (task_handler.py): "✅ সম্পন্ন" চাপলেই আর রিওয়ার্ড নয়।
+-- verify_kind = 'channel': verify_target চ্যানেলে (বটকে সেখানে অ্যাডমিন হতে হবে) ইউজার সদস্য কি না
+-- getChatMember দিয়ে দেখে তবেই ক্রেডিট; 'manual': completion 'pending' থাকে, অ্যাডমিন অনুমোদনে ক্রেডিট।
+-- আগের সব টাস্ক 'manual' (যাচাইয়ের উপায় জানা নেই); আগের completion-গুলো ইতিমধ্যে ক্রেডিট হয়েছে।
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS verify_kind VARCHAR(10) NOT NULL DEFAULT 'manual'
+        CHECK (verify_kind IN ('channel', 'manual')),
+    ADD COLUMN IF NOT EXISTS verify_target TEXT;
+
+ALTER TABLE task_completions
+    ADD COLUMN IF NOT EXISTS status VARCHAR(10) NOT NULL DEFAULT 'credited'
+        CHECK (status IN ('pending', 'credited', 'rejected'));
+
+CREATE INDEX IF NOT EXISTS idx_task_completions_pending
+    ON task_completions (completed_at) WHERE status = 'pending';
@@ -0,0 +1,115 @@
+import os
+import re
+import logging
+
+from db_handler import connect_db, release_db
+
+logger = logging.getLogger(__name__)
+
+# --- স্কিমা মাইগ্রেশন ---
+# migrations/ ফোল্ডারের NNNN_name.sql ফাইলগুলো ক্রমানুসারে একবার করে চালানো হয়।
+# প্রতিটি মাইগ্রেশন নিজস্ব ট্রানজেকশনে চলে এবং schema_version টেবিলে লেখা থাকে।
+# নতুন স্কিমা পরিবর্তন = নতুন ফাইল; পুরনো ফাইল কখনো বদলানো হয় না।
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# একাধিক ওয়ার্কার একসাথে মাইগ্রেট করতে না পারে (pg_advisory_xact_lock কী)
+MIGRATION_LOCK_ID = 7242001
+
+
+def discover_migrations():
+    """migrations/ ফোল্ডার থেকে [(version, name, path)] ক্রমানুসারে দেয়।"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration version in {MIGRATIONS_DIR}")
+    return migrations
+
+
+def latest_version():
+    migrations = discover_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def _current_version(cur):
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def current_version():
+    """ডেটাবেসে প্রয়োগ করা সর্বশেষ মাইগ্রেশন ভার্সন; সংযোগ ব্যর্থ হলে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            version = _current_version(cur)
+        conn.rollback()
+        return version
+    finally:
+        release_db(conn)
+
+
+def migrate(target=None):
+    """
+    বাকি থাকা মাইগ্রেশনগুলো প্রয়োগ করে। স্কিমা আপ-টু-ডেট থাকলে শুধু একটি ভার্সন চেক হয়।
+    রিটার্ন: প্রয়োগ করা মাইগ্রেশনের সংখ্যা; সংযোগ বা মাইগ্রেশন ব্যর্থ হলে None।
+    """
+    migrations = discover_migrations()
+    if target is not None:
+        migrations = [m for m in migrations if m[0] <= target]
+
+    conn = connect_db()
+    if not conn:
+        return None
+
+    applied = 0
+    try:
+        with conn.cursor() as cur:
+            # দ্রুত পথ: স্কিমা আপ-টু-ডেট থাকলে কোনো DDL বা লক নয়
+            version = _current_version(cur)
+            conn.rollback()
+            if not migrations or version >= migrations[-1][0]:
+                return 0
+
+            for number, name, path in migrations:
+                if number <= version:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    sql = f.read()
+
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # লক পাওয়ার আগে অন্য ওয়ার্কার এটি প্রয়োগ করে থাকতে পারে
+                cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (number,))
+                if cur.fetchone():
+                    conn.rollback()
+                    continue
+
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)", (number, name))
+                conn.commit()
+                applied += 1
+                logger.info(f"Applied migration {number:04d}_{name}")
+        return applied
+    except Exception as e:
+        logger.error(f"Migration failed after {applied} applied migration(s): {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
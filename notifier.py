@@ -0,0 +1,304 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter, Forbidden, BadRequest, NetworkError
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# --- আউটবাউন্ড নোটিফিকেশন কিউ ---
+# অ্যাডমিন ও ইউজার নোটিফিকেশন হ্যান্ডলারের ভেতরে await না করে এখানে কিউ করা হয়; ব্যাকগ্রাউন্ড
+# ওয়ার্কাররা গ্লোবাল ও per-chat টোকেন বাকেট মেনে পাঠায়, RetryAfter পেলে সেই চ্যাট থামিয়ে
+# আবার চেষ্টা করে। digest চালু থাকলে একই ধরনের অনেক অ্যাডমিন নোটিফিকেশন একটি সারাংশে যায়।
+NOTIFY_WORKERS = int(os.environ.get("NOTIFY_WORKERS", "4"))
+NOTIFY_QUEUE_SIZE = int(os.environ.get("NOTIFY_QUEUE_SIZE", "10000"))
+# Telegram: বট প্রতি ~30 মেসেজ/সেকেন্ড, একটি চ্যাটে ~1 মেসেজ/সেকেন্ড
+NOTIFY_GLOBAL_RATE = float(os.environ.get("NOTIFY_GLOBAL_RATE", "25"))
+NOTIFY_CHAT_RATE = float(os.environ.get("NOTIFY_CHAT_RATE", "1"))
+NOTIFY_CHAT_BURST = int(os.environ.get("NOTIFY_CHAT_BURST", "3"))
+NOTIFY_MAX_RETRIES = int(os.environ.get("NOTIFY_MAX_RETRIES", "5"))
+# digest: 0 = বন্ধ; নাহলে এত সেকেন্ড জমিয়ে NOTIFY_DIGEST_MIN বা বেশি হলে একটি সারাংশ পাঠানো হয়
+NOTIFY_DIGEST_WINDOW = float(os.environ.get("NOTIFY_DIGEST_WINDOW", "0"))
+NOTIFY_DIGEST_MIN = int(os.environ.get("NOTIFY_DIGEST_MIN", "5"))
+NOTIFY_DIGEST_PAGE_SIZE = int(os.environ.get("NOTIFY_DIGEST_PAGE_SIZE", "10"))
+# মেমোরিতে কতগুলো সাম্প্রতিক digest রাখা হবে (পুরনোগুলোর বাটন "মেয়াদোত্তীর্ণ" দেখায়)
+NOTIFY_DIGEST_KEEP = 50
+
+DIGEST_TITLES = {
+    'verify': "নতুন ভেরিফাই রিকোয়েস্ট",
+    'withdraw': "নতুন উত্তোলন অনুরোধ",
+}
+
+# per-chat বাকেট এর বেশি হলে পূর্ণ (অলস) বাকেটগুলো মুছে ফেলা হয়
+_MAX_CHAT_BUCKETS = 5000
+
+
+class TokenBucket:
+    """
+    সরল টোকেন বাকেট। reserve() সাথে সাথে একটি টোকেন কেটে নেয় (ঋণাত্মক হতে পারে) এবং
+    কত সেকেন্ড অপেক্ষা করতে হবে তা ফেরত দেয় — তাই একসাথে অপেক্ষমাণ কলাররা ক্রমানুসারে চলে।
+    """
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_take(self):
+        """টোকেন থাকলে একটি কেটে True; না থাকলে কিছু না কেটে False (অপেক্ষা নয়, প্রত্যাখ্যান — rate_limiter.py)।"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def pause(self, seconds):
+        """RetryAfter পেলে: পরের টোকেন অন্তত `seconds` পরে।"""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+    def is_full(self):
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+def retry_after_seconds(value):
+    # PTB ভার্সনভেদে retry_after int বা timedelta
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+class Notifier:
+    def __init__(self):
+        self._bot = None
+        self._queue = None
+        self._workers = []
+        self._global = TokenBucket(NOTIFY_GLOBAL_RATE, max(1, int(NOTIFY_GLOBAL_RATE)))
+        self._chats = {}
+        self._pending_digests = {}  # (chat_id, key) -> [(line, message)]
+        self._digest_tasks = set()
+        self._digests = OrderedDict()  # digest_id -> {'chat_id', 'key', 'items'}
+        self._next_digest_id = 1
+        self._stats = {'queued': 0, 'sent': 0, 'failed': 0, 'dropped': 0, 'retries': 0, 'rate_limited': 0, 'digests': 0}
+
+    @property
+    def running(self):
+        return bool(self._workers)
+
+    @property
+    def global_bucket(self):
+        """বটের মোট পাঠানোর হার; অন্য সেন্ডার (যেমন ব্রডকাস্ট) এটিও মেনে চলে।"""
+        return self._global
+
+    async def start(self, bot):
+        """Application চালুর সময় (post_init) ওয়ার্কার চালু করে।"""
+        if self.running:
+            return
+        self._bot = bot
+        self._queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"notifier:{i}") for i in range(NOTIFY_WORKERS)
+        ]
+
+    async def stop(self, timeout=10.0):
+        """বাকি থাকা digest ও কিউ পাঠিয়ে (সর্বোচ্চ timeout সেকেন্ড) ওয়ার্কার বন্ধ করে।"""
+        if not self.running:
+            return
+        for task in list(self._digest_tasks):
+            task.cancel()
+        for chat_id, key in list(self._pending_digests):
+            self._flush_digest(chat_id, key)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Notifier stopped with {self._queue.qsize()} undelivered message(s)")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def notify(self, bot, chat_id, text, digest=None, **kwargs):
+        """
+        মেসেজ কিউ করে সাথে সাথে ফেরত আসে। digest=(key, line) দিলে digest চালু থাকলে
+        একই চ্যাটের একই key-এর মেসেজগুলো একসাথে সারাংশ হিসেবে যেতে পারে।
+        ওয়ার্কার না চললে (যেমন সার্ভারলেস মোড) সরাসরি পাঠায়।
+        """
+        message = {'chat_id': chat_id, 'text': text, 'kwargs': kwargs}
+        if not self.running:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                self._stats['sent'] += 1
+            except Exception as e:
+                self._stats['failed'] += 1
+                logger.error(f"Error sending notification to {chat_id}: {e}")
+            return
+
+        if digest is not None and NOTIFY_DIGEST_WINDOW > 0:
+            key, line = digest
+            pending = self._pending_digests.setdefault((chat_id, key), [])
+            pending.append((line, message))
+            if len(pending) == 1:
+                task = asyncio.create_task(self._digest_timer(chat_id, key))
+                self._digest_tasks.add(task)
+                task.add_done_callback(self._digest_tasks.discard)
+            return
+
+        self._enqueue(message)
+
+    def _enqueue(self, message):
+        try:
+            self._queue.put_nowait(message)
+            self._stats['queued'] += 1
+        except asyncio.QueueFull:
+            self._stats['dropped'] += 1
+            logger.warning(f"Notification queue full, dropped message to {message['chat_id']}")
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _MAX_CHAT_BUCKETS:
+                for idle in [c for c, b in self._chats.items() if b.is_full()]:
+                    del self._chats[idle]
+            bucket = self._chats[chat_id] = TokenBucket(NOTIFY_CHAT_RATE, NOTIFY_CHAT_BURST)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            except Exception as e:
+                self._stats['failed'] += 1
+                logger.error(f"Unexpected error delivering notification to {message['chat_id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message):
+        chat_id = message['chat_id']
+        for attempt in range(NOTIFY_MAX_RETRIES + 1):
+            # আগে চ্যাটের বাকেট, তারপর গ্লোবাল — যাতে অপেক্ষার সময় গ্লোবাল টোকেন আটকে না থাকে
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            delay = self._global.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+            try:
+                await self._bot.send_message(chat_id=chat_id, text=message['text'], **message['kwargs'])
+                self._stats['sent'] += 1
+                return
+            except RetryAfter as e:
+                self._stats['rate_limited'] += 1
+                retry_after = retry_after_seconds(e.retry_after)
+                logger.warning(f"Flood limit for chat {chat_id}, retrying after {retry_after:.0f}s")
+                self._chat_bucket(chat_id).pause(retry_after)
+            except (Forbidden, BadRequest) as e:
+                # ইউজার বট ব্লক করেছে বা মেসেজ অবৈধ — আবার চেষ্টা করে লাভ নেই
+                self._stats['failed'] += 1
+                logger.error(f"Notification to {chat_id} rejected: {e}")
+                return
+            except NetworkError as e:
+                logger.warning(f"Network error sending to {chat_id} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            self._stats['retries'] += 1
+
+        self._stats['failed'] += 1
+        logger.error(f"Giving up on notification to {chat_id} after {NOTIFY_MAX_RETRIES} retries")
+
+    # --- digest ---
+
+    async def _digest_timer(self, chat_id, key):
+        await asyncio.sleep(NOTIFY_DIGEST_WINDOW)
+        self._flush_digest(chat_id, key)
+
+    def _flush_digest(self, chat_id, key):
+        items = self._pending_digests.pop((chat_id, key), [])
+        if len(items) < NOTIFY_DIGEST_MIN:
+            for _, message in items:
+                self._enqueue(message)
+            return
+
+        digest_id = self._next_digest_id
+        self._next_digest_id += 1
+        self._digests[digest_id] = {'chat_id': chat_id, 'key': key, 'items': items}
+        while len(self._digests) > NOTIFY_DIGEST_KEEP:
+            self._digests.popitem(last=False)
+        self._stats['digests'] += 1
+
+        text, markup = self._digest_page(digest_id, 0)
+        self._enqueue({'chat_id': chat_id, 'text': text, 'kwargs': {'reply_markup': markup}})
+
+    def _digest_page(self, digest_id, page):
+        digest = self._digests[digest_id]
+        items = digest['items']
+        pages = (len(items) + NOTIFY_DIGEST_PAGE_SIZE - 1) // NOTIFY_DIGEST_PAGE_SIZE
+        page = max(0, min(page, pages - 1))
+        start = page * NOTIFY_DIGEST_PAGE_SIZE
+        lines = [line for line, _ in items[start:start + NOTIFY_DIGEST_PAGE_SIZE]]
+
+        title = DIGEST_TITLES.get(digest['key'], digest['key'])
+        text = f"🔔 {len(items)}টি {title} (পেজ {page + 1}/{pages})\n\n" + "\n".join(lines)
+
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"digest_page_{digest_id}_{page - 1}"))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"digest_page_{digest_id}_{page + 1}"))
+        keyboard = [nav] if nav else []
+        keyboard.append([InlineKeyboardButton("📨 এই পেজের রিভিউ খুলুন", callback_data=f"digest_open_{digest_id}_{page}")])
+        return text, InlineKeyboardMarkup(keyboard)
+
+    async def digest_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """digest-এর পেজ বদলানো বা একটি পেজের আসল রিভিউ মেসেজগুলো (বাটনসহ) পাঠানো।"""
+        query = update.callback_query
+        _, action, digest_id, page = query.data.split('_')
+        digest_id, page = int(digest_id), int(page)
+
+        digest = self._digests.get(digest_id)
+        if digest is None:
+            await query.answer("এই সারাংশের মেয়াদ শেষ।", show_alert=True)
+            return
+        if str(query.from_user.id) != str(digest['chat_id']):
+            await query.answer()
+            return
+
+        if action == 'page':
+            await query.answer()
+            text, markup = self._digest_page(digest_id, page)
+            await query.edit_message_text(text, reply_markup=markup)
+        else:
+            start = page * NOTIFY_DIGEST_PAGE_SIZE
+            items = digest['items'][start:start + NOTIFY_DIGEST_PAGE_SIZE]
+            for _, message in items:
+                self._enqueue(message)
+            await query.answer(f"{len(items)}টি রিভিউ মেসেজ পাঠানো হচ্ছে।")
+
+    def stats(self):
+        return {
+            **self._stats,
+            'queue': self._queue.qsize() if self._queue is not None else 0,
+            'pending_digest': sum(len(items) for items in self._pending_digests.values()),
+            'chats': len(self._chats),
+        }
+
+
+notifier = Notifier()
+notify = notifier.notify
+digest_callback = notifier.digest_callback
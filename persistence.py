@@ -0,0 +1,336 @@
+import os
+import json
+import asyncio
+import logging
+import datetime
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+from telegram.ext import BasePersistence, PersistenceInput
+
+from db_handler import connect_db, release_db
+from async_db import run_db
+
+logger = logging.getLogger(__name__)
+
+# --- Postgres-ভিত্তিক PTB Persistence ---
+# ConversationHandler স্টেট ও context.user_data রিস্টার্টের পরেও থাকে।
+# PTB-র update_* কলগুলো মেমরিতে জমিয়ে (একই key-এর একাধিক লেখা একটিতে মিশে যায়) একটি ট্রানজেকশনে লেখা হয়;
+# আগের লেখার সাথে হুবহু এক হলে লেখা বাদ।
+#
+# একাধিক ওয়ার্কার/সার্ভারলেস কন্টেইনার: PTB প্রতিটি আপডেটের আগে refresh_user_data ডাকে — এখানে ইউজারের
+# user_data ও ট্র্যাক করা কনভার্সেশনের স্টেট একটি কুয়েরিতে (PK লুকআপ) আবার পড়া হয়, আর সারির version
+# নিজের জানা ভার্সন থেকে আলাদা হলে (অন্য ওয়ার্কার লিখেছে) মেমরির কপি বদলে যায়। আপডেট শেষে
+# write_through() সাথে সাথে লিখে ফেলে (per-user লক তখনও ধরা), তাই পরের আপডেট যে ওয়ার্কারেই যাক
+# সর্বশেষ স্টেট পায় — স্টিকি রাউটিং লাগে না।
+# chat_data ও bot_data বট ব্যবহার করে না, তাই রাখা হয় না (প্রতি আপডেটে বাড়তি দুটি কুয়েরি বাঁচে)।
+# কনভার্সেশন কী প্রাইভেট চ্যাটের (chat_id == user_id) — বটের সব ফ্লো প্রাইভেট চ্যাটে।
+PERSISTENCE_UPDATE_INTERVAL = float(os.environ.get("PERSISTENCE_UPDATE_INTERVAL", "10"))
+
+_DELETE = object()
+
+
+# --- JSON: Decimal/datetime/date আলাদা ট্যাগে রাখা হয়, পড়ার সময় একই টাইপে ফেরে; অন্য অজানা টাইপ বাতিল ---
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f"{type(value).__name__} persist করা যায় না")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1:
+        if '__decimal__' in obj:
+            return Decimal(obj['__decimal__'])
+        if '__datetime__' in obj:
+            return datetime.datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return datetime.date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def encode_data(data):
+    return json.dumps(data, default=_json_default, sort_keys=True)
+
+
+def decode_data(text):
+    return None if text is None else json.loads(text, object_hook=_json_object_hook)
+
+
+def conversation_key(user_id):
+    """প্রাইভেট চ্যাটে ইউজারের কনভার্সেশন কী (per_chat + per_user: (chat_id, user_id))।"""
+    return json.dumps([user_id, user_id])
+
+
+def load_rows(kind, name=''):
+    """নির্দিষ্ট kind/name-এর সব সারি {key: (data_text, version)} হিসেবে দেয়।"""
+    conn = connect_db()
+    if not conn:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT key, data::text, version FROM bot_persistence WHERE kind = %s AND name = %s",
+                (kind, name)
+            )
+            rows = {key: (data, version) for key, data, version in cur.fetchall()}
+        conn.rollback()
+        return rows
+    except Exception as e:
+        logger.error(f"Error loading persisted {kind} {name}: {e}")
+        conn.rollback()
+        return {}
+    finally:
+        release_db(conn)
+
+
+def load_user_rows(user_id, conversation_names):
+    """
+    একটি ইউজারের user_data ও কনভার্সেশন সারি (PK লুকআপ, এক কুয়েরি)।
+    রিটার্ন: {(kind, name, key): (data_text, version)}; ত্রুটিতে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT kind, name, key, data::text, version FROM bot_persistence
+                WHERE (kind = 'user_data' AND name = '' AND key = %(user_key)s)
+                   OR (kind = 'conversation' AND name = ANY(%(names)s) AND key = %(conversation_key)s)
+                """,
+                {'user_key': str(user_id), 'names': list(conversation_names),
+                 'conversation_key': conversation_key(user_id)}
+            )
+            rows = {(kind, name, key): (data, version) for kind, name, key, data, version in cur.fetchall()}
+        conn.rollback()
+        return rows
+    except Exception as e:
+        logger.error(f"Error refreshing persisted data for {user_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def save_rows(pending):
+    """
+    জমে থাকা পরিবর্তনগুলো একটি ট্রানজেকশনে লেখে।
+    pending: {(kind, name, key): json_text অথবা _DELETE}
+    রিটার্ন: লেখা সারিগুলোর নতুন ভার্সন {(kind, name, key): version}; ব্যর্থ হলে None।
+    """
+    upserts = [(kind, name, key, data) for (kind, name, key), data in pending.items() if data is not _DELETE]
+    deletes = [(kind, name, key) for (kind, name, key), data in pending.items() if data is _DELETE]
+
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        versions = {}
+        with conn.cursor() as cur:
+            if upserts:
+                rows = execute_values(
+                    cur,
+                    """
+                    INSERT INTO bot_persistence (kind, name, key, data) VALUES %s
+                    ON CONFLICT (kind, name, key)
+                    DO UPDATE SET data = EXCLUDED.data, version = bot_persistence.version + 1,
+                                  updated_at = CURRENT_TIMESTAMP
+                    RETURNING kind, name, key, version
+                    """,
+                    upserts,
+                    template="(%s, %s, %s, %s::jsonb)",
+                    fetch=True
+                )
+                versions = {(kind, name, key): version for kind, name, key, version in rows}
+            if deletes:
+                execute_values(
+                    cur,
+                    """
+                    DELETE FROM bot_persistence p
+                    USING (VALUES %s) AS d(kind, name, key)
+                    WHERE p.kind = d.kind AND p.name = d.name AND p.key = d.key
+                    """,
+                    deletes
+                )
+        conn.commit()
+        return versions
+    except Exception as e:
+        logger.error(f"Error saving {len(pending)} persistence row(s): {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+class PostgresPersistence(BasePersistence):
+    """bot_persistence টেবিলে user_data ও কনভার্সেশন স্টেট রাখে; প্রতিটি আপডেটের আগে আবার পড়ে।"""
+
+    def __init__(self, update_interval=PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._pending = {}
+        self._flush_task = None
+        # (kind, name, key) -> (version, json_text): এই ওয়ার্কার সর্বশেষ যা পড়েছে/লিখেছে
+        self._known = {}
+        self._conversation_handlers = {}
+
+    def track_conversations(self, *handlers):
+        """persistent ConversationHandler-গুলো, যাদের স্টেট প্রতিটি আপডেটের আগে DB থেকে মেলানো হয়।"""
+        for handler in handlers:
+            self._conversation_handlers[handler.name] = handler
+
+    def _remember(self, row_key, data_text, version):
+        self._known[row_key] = (version, data_text)
+
+    # --- লোড ---
+    async def get_user_data(self):
+        rows = await run_db(load_rows, 'user_data')
+        for key, (data, version) in rows.items():
+            self._remember(('user_data', '', key), data, version)
+        return {int(key): decode_data(data) for key, (data, _) in rows.items()}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = await run_db(load_rows, 'conversation', name)
+        for key, (data, version) in rows.items():
+            self._remember(('conversation', name, key), data, version)
+        return {tuple(json.loads(key)): decode_data(state) for key, (state, _) in rows.items()}
+
+    # --- প্রতিটি আপডেটের আগে: অন্য ওয়ার্কারের লেখা মেলানো ---
+    def _is_stale(self, row_key, row):
+        """DB-র সারি (বা না থাকা) এই ওয়ার্কারের জানা অবস্থা থেকে আলাদা কি না; নিজের না-লেখা পরিবর্তন থাকলে নয়।"""
+        if row_key in self._pending:
+            return False
+        known = self._known.get(row_key)
+        if row is None:
+            return known is not None
+        return known is None or known[0] != row[1]
+
+    async def refresh_user_data(self, user_id, user_data):
+        names = list(self._conversation_handlers)
+        rows = await run_db(load_user_rows, user_id, names)
+        if rows is None:
+            return
+
+        row_key = ('user_data', '', str(user_id))
+        row = rows.get(row_key)
+        if self._is_stale(row_key, row):
+            user_data.clear()
+            if row is None:
+                self._known.pop(row_key, None)
+            else:
+                user_data.update(decode_data(row[0]) or {})
+                self._remember(row_key, *row)
+
+        key = conversation_key(user_id)
+        for name in names:
+            row_key = ('conversation', name, key)
+            row = rows.get(row_key)
+            if not self._is_stale(row_key, row):
+                continue
+            # PTB কনভার্সেশনের স্টেট রিফ্রেশের পাবলিক হুক দেয় না; ট্র্যাকিং এড়িয়ে (আবার লেখা না হয়) বসানো হয়
+            conversations = self._conversation_handlers[name]._conversations
+            conversation = (user_id, user_id)
+            if row is None:
+                conversations.data.pop(conversation, None)
+                self._known.pop(row_key, None)
+            else:
+                conversations.update_no_track({conversation: decode_data(row[0])})
+                self._remember(row_key, *row)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # --- লেখা (জমিয়ে রাখা হয়, _flush_pending একসাথে লেখে) ---
+    def _queue(self, kind, name, key, data):
+        row_key = (kind, name, key)
+        if data is _DELETE:
+            if row_key not in self._known and row_key not in self._pending:
+                return
+            text = _DELETE
+        else:
+            # লাইভ dict পরে বদলে যেতে পারে, তাই এখনই JSON বানিয়ে রাখা হয়
+            try:
+                text = encode_data(data)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Not persisting {kind} {name} {key}: {e}")
+                return
+            known = self._known.get(row_key)
+            if row_key not in self._pending and known is not None and known[1] == text:
+                return
+        self._pending[row_key] = text
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+    async def _save(self, pending):
+        versions = await run_db(save_rows, pending)
+        if versions is None:
+            return False
+        for row_key, data in pending.items():
+            if data is _DELETE:
+                self._known.pop(row_key, None)
+            else:
+                self._remember(row_key, data, versions.get(row_key))
+        return True
+
+    async def _flush_pending(self):
+        # PTB একই চক্রের সব update_* একসাথে gather করে; এক টিক অপেক্ষা করলে সেগুলো এক ব্যাচে আসে
+        await asyncio.sleep(0)
+        pending, self._pending = self._pending, {}
+        if pending and not await self._save(pending):
+            # ব্যর্থ হলে পরের চক্রে আবার চেষ্টা (এর মধ্যে আসা নতুন মান অগ্রাধিকার পায়)
+            for key, data in pending.items():
+                self._pending.setdefault(key, data)
+
+    async def update_user_data(self, user_id, data):
+        self._queue('user_data', '', str(user_id), data if data else _DELETE)
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        self._queue('conversation', name, json.dumps(list(key)), _DELETE if new_state is None else new_state)
+
+    async def drop_user_data(self, user_id):
+        self._queue('user_data', '', str(user_id), _DELETE)
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def flush(self):
+        """বাকি থাকা সব পরিবর্তন লিখে ফেলে (শাটডাউন ও write_through)।"""
+        if self._flush_task is not None:
+            await self._flush_task
+        pending, self._pending = self._pending, {}
+        if pending and not await self._save(pending):
+            for key, data in pending.items():
+                self._pending.setdefault(key, data)
+
+    async def write_through(self, application):
+        """একটি আপডেট শেষে: PTB-র চিহ্নিত পরিবর্তন সাথে সাথে DB-তে (পরের আপডেট অন্য ওয়ার্কারে গেলেও পায়)।"""
+        await application.update_persistence()
+        await self.flush()
@@ -1,9 +1,11 @@
 import os
 import logging
-import psycopg2
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler # ConversationHandler   
+from db_handler import connect_db, release_db, get_user_snapshot
+from user_cache import user_cache
+from async_db import run_db
+from message_templates import Template, MARKDOWN_V2
 
 # --- Conversation States ---
 #    ,     
@@ -15,55 +17,75 @@ PROFILE_STATE = 0
 #  
 logger = logging.getLogger(__name__)
 
-# --- .    ---
-#  db_handler.py     ,  circular import      
-def connect_db():
-    """Render    """
-    DATABASE_URL = os.environ.get("DATABASE_URL") 
-    try:
-        if not DATABASE_URL:
-            logger.error("DATABASE_URL environment variable is not set.")
-            return None
-            
-        conn = psycopg2.connect(DATABASE_URL, sslmode='require') 
-        return conn
-    except Exception as e:
-        logger.error(f"  : {e}")
+# --- প্রোফাইল ডেটা (সিঙ্ক্রোনাস, async_db এক্সিকিউটরে চালানো হয়) ---
+PROFILE_COLUMNS = (
+    'is_premium', 'expiry_date', 'premium_balance', 'free_income',
+    'refer_balance', 'salary_balance', 'total_withdraw', 'wallet_address',
+    'verify_expiry', 'referrer_id', 'is_verified',
+)
+
+# --- প্রোফাইল স্ক্রিনের টেমপ্লেট ও কিবোর্ড (MarkdownV2, মডিউল লোডের সময় একবার তৈরি) ---
+PROFILE_TEMPLATE = Template(
+    " *  * \n"
+    "* :* `{user_id}`\n\n"
+    "*  :* {premium_status}\n"
+    "*  :* {expiry_date_text}\n"
+    "*  :* {verify_status}\n\n"
+    "*  :*\n"
+    " Premium Balance: * {premium_balance:.2f}*\n"
+    " Free Income: * {free_income:.2f}*\n"
+    " Refer Balance: * {refer_balance:.2f}*\n"
+    " Salary Balance: * {salary_balance:.2f}*\n\n"
+    " * :* * {total_withdraw:.2f}*\n"
+    " * :* `{wallet}`\n"
+)
+PROFILE_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("   ", callback_data='set_wallet')], 
+    [InlineKeyboardButton(" ", callback_data='menu_home')]
+])
+WALLET_SAVED_TEMPLATE = Template(
+    " *!*\n\n"
+    "      : `{wallet}`"
+)
+
+
+def fetch_profile(user_id):
+    """প্রোফাইল স্ক্রিনের জন্য ইউজারের সারি দেয় (user_cache থেকে); না পেলে বা ত্রুটি হলে None।"""
+    snapshot = get_user_snapshot(user_id)
+    if not snapshot:
         return None
+    return tuple(snapshot[column] for column in PROFILE_COLUMNS)
+
+
+def save_wallet_address(user_id, wallet_address):
+    """ইউজারের ওয়ালেট ঠিকানা সেভ করে; সংযোগ ব্যর্থ হলে False।"""
+    conn = connect_db()
+    if not conn:
+        return False
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """UPDATE users SET wallet_address = %s WHERE user_id = %s""",
+            (wallet_address, user_id)
+        )
+        conn.commit()
+        return True
+    finally:
+        user_cache.invalidate(user_id)
+        cursor.close()
+        release_db(conn)
+
 
 # --- .   (  ) ---
 #  bot.py    : profile_menu
 async def handle_wallet_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """ইউজারের প্রোফাইল তথ্য দেখেন ও সেভ করেন"""
     user_id = update.effective_user.id
-    status = None
-    conn = connect_db()
-    
-    #    / 
-    if conn:
-        cursor = conn.cursor()
-        try:
-            #   SELECT    
-            cursor.execute("""
-                SELECT 
-                    is_premium, expiry_date, premium_balance, free_income, 
-                    refer_balance, salary_balance, total_withdraw, wallet_address, 
-                    expiry_date, referrer_id 
-                FROM users 
-                WHERE user_id = %s
-                """, (user_id,))
-            status = cursor.fetchone()
-        except Exception as e:
-            logger.error(f"Error fetching profile: {e}")
-            status = None
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+    status = await run_db(fetch_profile, user_id)
 
     #     
-    if status and len(status) >= 10:
+    if status and len(status) >= 11:
         is_premium = status[0]
         expiry_date = status[1]
         premium_balance = status[2]
@@ -74,39 +96,34 @@ async def handle_wallet_input(update: Update, context: ContextTypes.DEFAULT_TYPE
         wallet_address = status[7]
         verify_expiry_date = status[8] #     ,    verify_expiry_date
         referrer_id = status[9]
+        is_verified = status[10]
 
         #  
-        premium_status = " Active" if is_premium and expiry_date and expiry_date >= datetime.now().date() else " Inactive"
+        # মেয়াদ পেরোলে expiry_handler-এর সুইপার ফ্ল্যাগ বন্ধ করে, তাই তারিখ তুলনা লাগে না
+        premium_status = " Active" if is_premium else " Inactive"
         expiry_date_text = expiry_date.strftime("%Y-%m-%d") if expiry_date else "N/A"
 
         #  
         verify_status = " Not Verified"
-        if verify_expiry_date and verify_expiry_date >= datetime.now().date():
+        if is_verified and verify_expiry_date:
             verify_status = " Verified (Expires: " + verify_expiry_date.strftime("%Y-%m-%d") + ")"
 
         #    ( )
-        message = (
-            f" **  ** \n"
-            f"** :** `{user_id}`\n\n"
-            f"**  :** {premium_status}\n"
-            f"**  :** {expiry_date_text}\n"
-            f"**  :** {verify_status}\n\n"
-            f"**  :**\n"
-            f" Premium Balance: ** {premium_balance:.2f}**\n"
-            f" Free Income: ** {free_income:.2f}**\n"
-            f" Refer Balance: ** {refer_balance:.2f}**\n"
-            f" Salary Balance: ** {salary_balance:.2f}**\n\n"
-            f"***"
-            f" ** :** ** {total_withdraw:.2f}**\n"
-            f" ** :** `{wallet_address or '  '}`\n"
+        message = PROFILE_TEMPLATE.render(
+            user_id=user_id,
+            premium_status=premium_status,
+            expiry_date_text=expiry_date_text,
+            verify_status=verify_status,
+            premium_balance=premium_balance,
+            free_income=free_income,
+            refer_balance=refer_balance,
+            salary_balance=salary_balance,
+            total_withdraw=total_withdraw,
+            wallet=wallet_address or '  ',
         )
         
         #  
-        keyboard = [
-            [InlineKeyboardButton("   ", callback_data='set_wallet')], 
-            [InlineKeyboardButton(" ", callback_data='menu_home')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = PROFILE_MARKUP
         
     else:
         #    
@@ -129,19 +146,19 @@ async def handle_wallet_input(update: Update, context: ContextTypes.DEFAULT_TYPE
             return PROFILE_STATE #  
             
         # অন্যান্য কলব্যাক ক্যোয়ারি হ্যান্ডেল করুন (যেমন 'menu' বাটন)
-    else: 
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
-        )
-        return ConversationHandler.END
+        else: 
+            await query.edit_message_text(
+                message,
+                reply_markup=reply_markup,
+                parse_mode=MARKDOWN_V2
+            )
+            return ConversationHandler.END
 
     elif update.message:
         await update.message.reply_text(
             message,
             reply_markup=reply_markup,
-            parse_mode='Markdown'
+            parse_mode=MARKDOWN_V2
         )
         return ConversationHandler.END
 
@@ -157,36 +174,21 @@ async def handle_profile_input(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("        ")
         return PROFILE_STATE #   
         
-    conn = connect_db()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            #     
-            cursor.execute(
-                """UPDATE users SET wallet_address = %s WHERE user_id = %s""",
-                (wallet_address, user_id)
-            )
-            conn.commit()
-            
-            await update.message.reply_text(
-                f" **!**\n\n"
-                f"      : `{wallet_address}`",
-                parse_mode='Markdown'
-            )
-            
-            return ConversationHandler.END #  
-            
-        except Exception as e:
-            logger.error(f"Error saving wallet address for {user_id}: {e}")
-            await update.message.reply_text("      ")
-            return ConversationHandler.END #  
-            
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-                
-    else:
-        await update.message.reply_text("   ")
+    try:
+        #     
+        saved = await run_db(save_wallet_address, user_id, wallet_address)
+        if not saved:
+            await update.message.reply_text("   ")
+            return ConversationHandler.END #
+
+        await update.message.reply_text(
+            WALLET_SAVED_TEMPLATE.render(wallet=wallet_address),
+            parse_mode=MARKDOWN_V2
+        )
+        
+        return ConversationHandler.END #  
+        
+    except Exception as e:
+        logger.error(f"Error saving wallet address for {user_id}: {e}")
+        await update.message.reply_text("      ")
         return ConversationHandler.END #  
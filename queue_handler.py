@@ -0,0 +1,180 @@
+import os
+import logging
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from async_db import run_db, get_pending_page, review_withdrawals
+from notifier import notify
+from fraud_handler import referral_graph
+from message_templates import MARKDOWN_V2
+from verify_handler import review_verifications, verify_decision_message
+from withdraw_handler import withdraw_decision_message
+
+logger = logging.getLogger(__name__)
+
+# --- অ্যাডমিন রিভিউ কিউ (/queue) ---
+# পেন্ডিং উত্তোলন ও ভেরিফাই রিকোয়েস্ট পেজ আকারে দেখায় (db_handler.get_pending_page, keyset)।
+# একটি পেজের সব রিকোয়েস্ট একটি বাটনে (কনফার্মসহ) এক ট্রানজেকশনে অনুমোদন/বাতিল হয়।
+ADMIN_ID = os.environ.get("ADMIN_ID")
+QUEUE_PAGE_SIZE = int(os.environ.get("QUEUE_PAGE_SIZE", "10"))
+
+QUEUE_TITLES = {
+    'withdraw': "🏦 পেন্ডিং উত্তোলন",
+    'verify': "💾 পেন্ডিং ভেরিফাই",
+}
+
+# বাটনের action -> (withdraw স্ট্যাটাস, verify স্ট্যাটাস)
+BULK_STATUSES = {
+    'accept': ('completed', 'accept'),
+    'reject': ('rejected', 'reject'),
+}
+
+
+def _is_admin(update):
+    return str(update.effective_user.id) == str(ADMIN_ID)
+
+
+def _format_row(kind, row):
+    requested_at = row['requested_at'].strftime('%m-%d %H:%M')
+    if kind == 'withdraw':
+        return f"#{row['request_id']} · {row['user_id']} · {row['amount']:.2f} টাকা · {row['wallet_address']} · {requested_at}"
+    return f"#{row['request_id']} · {row['user_id']} · {row['method']} · {row['tnx_id']} · {requested_at}"
+
+
+async def _render_page(context, kind, cursor, direction, header=""):
+    """পেজ আনে, user_data-তে পেজের অবস্থা রাখে এবং (text, markup) দেয়।"""
+    page = await get_pending_page(kind, cursor, direction, QUEUE_PAGE_SIZE)
+    if page is None:
+        return "❌ ডেটাবেস সংযোগে সমস্যা হচ্ছে। পরে চেষ্টা করুন।", None
+
+    rows, has_more = page
+    if direction == 'next':
+        has_prev, has_next = cursor is not None, has_more
+    else:
+        has_prev, has_next = has_more, True
+
+    context.user_data['review_page'] = {
+        'kind': kind,
+        'cursor': cursor,
+        'direction': direction,
+        'ids': [row['request_id'] for row in rows],
+    }
+
+    lines = [_format_row(kind, row) for row in rows] or ["কোনো পেন্ডিং রিকোয়েস্ট নেই। ✅"]
+    text = (header + "\n\n" if header else "") + QUEUE_TITLES[kind] + "\n\n" + "\n".join(lines)
+
+    keyboard = []
+    nav = []
+    if has_prev and rows:
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"queue_{kind}_prev_{rows[0]['request_id']}"))
+    nav.append(InlineKeyboardButton("🔄", callback_data=f"queue_{kind}_reload_0"))
+    if has_next and rows:
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"queue_{kind}_next_{rows[-1]['request_id']}"))
+    keyboard.append(nav)
+    if rows:
+        keyboard.append([
+            InlineKeyboardButton(f"✅ পেজের {len(rows)}টি অনুমোদন", callback_data=f"queuebulk_{kind}_accept"),
+            InlineKeyboardButton(f"❌ পেজের {len(rows)}টি বাতিল", callback_data=f"queuebulk_{kind}_reject"),
+        ])
+    keyboard.append([
+        InlineKeyboardButton(QUEUE_TITLES['withdraw'], callback_data="queue_withdraw_first_0"),
+        InlineKeyboardButton(QUEUE_TITLES['verify'], callback_data="queue_verify_first_0"),
+    ])
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+async def _edit(query, text, markup):
+    try:
+        await query.edit_message_text(text, reply_markup=markup)
+    except BadRequest as e:
+        # 🔄 চাপার পর পেজ না বদলালে Telegram "message is not modified" দেয়
+        if "not modified" not in str(e).lower():
+            raise
+
+
+async def queue_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/queue [verify] — পেন্ডিং রিকোয়েস্টের প্রথম পেজ"""
+    if not _is_admin(update):
+        return
+    kind = 'verify' if context.args and context.args[0].lower().startswith('v') else 'withdraw'
+    text, markup = await _render_page(context, kind, None, 'next')
+    await update.message.reply_text(text, reply_markup=markup)
+
+
+async def _apply_bulk(context, kind, action, ids):
+    """একটি পেজের সিদ্ধান্ত এক ট্রানজেকশনে প্রয়োগ করে ইউজারদের নোটিফিকেশন কিউ করে। সফল সংখ্যা বা None।"""
+    withdraw_status, verify_status = BULK_STATUSES[action]
+    if kind == 'withdraw':
+        decided = await review_withdrawals(ids, withdraw_status)
+        if decided is None:
+            return None
+        for request_id, user_id, amount in decided:
+            await notify(context.bot, user_id, withdraw_decision_message(request_id, withdraw_status, amount))
+    else:
+        decided = await run_db(review_verifications, ids, verify_status)
+        if decided is None:
+            return None
+        for _, user_id in decided:
+            if verify_status == 'accept':
+                referral_graph.mark_active(user_id)
+            await notify(context.bot, user_id, verify_decision_message(verify_status), parse_mode=MARKDOWN_V2)
+    return len(decided)
+
+
+async def queue_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/queue মেসেজের পেজ নেভিগেশন ও পেজ-ভিত্তিক বাল্ক অনুমোদন/বাতিল"""
+    query = update.callback_query
+    if not _is_admin(update):
+        await query.answer("আপনি এই অ্যাকশনের জন্য অনুমোদিত নন।")
+        return
+
+    parts = query.data.split('_')
+    state = context.user_data.get('review_page') or {}
+
+    if parts[0] == 'queue':
+        _, kind, direction, cursor = parts
+        if direction == 'first':
+            cursor, direction = None, 'next'
+        elif direction == 'reload':
+            if state.get('kind') == kind:
+                cursor, direction = state['cursor'], state['direction']
+            else:
+                cursor, direction = None, 'next'
+        else:
+            cursor = int(cursor)
+        await query.answer()
+        text, markup = await _render_page(context, kind, cursor, direction)
+        await _edit(query, text, markup)
+        return
+
+    # queuebulk_<kind>_<action>[_ok]
+    kind, action = parts[1], parts[2]
+    if state.get('kind') != kind or not state.get('ids'):
+        await query.answer("পেজটি পুরনো হয়ে গেছে, 🔄 চাপুন।", show_alert=True)
+        return
+
+    if len(parts) == 3:
+        await query.answer()
+        label = "অনুমোদন" if action == 'accept' else "বাতিল"
+        confirm = InlineKeyboardMarkup([[
+            InlineKeyboardButton(f"⚠️ হ্যাঁ, {len(state['ids'])}টি {label}", callback_data=f"queuebulk_{kind}_{action}_ok"),
+            InlineKeyboardButton("↩️ না", callback_data=f"queue_{kind}_reload_0"),
+        ]])
+        await query.edit_message_reply_markup(reply_markup=confirm)
+        return
+
+    await query.answer("প্রসেস হচ্ছে...")
+    ids = state['ids']
+    decided = await _apply_bulk(context, kind, action, ids)
+    if decided is None:
+        header = "❌ ডেটাবেস সমস্যা — কোনো পরিবর্তন হয়নি।"
+    else:
+        skipped = len(ids) - decided
+        header = f"{'✅' if action == 'accept' else '❌'} {decided}টি রিকোয়েস্ট প্রসেস হয়েছে" + (
+            f" ({skipped}টি আগেই প্রক্রিয়াকৃত)" if skipped else ""
+        )
+        logger.info(f"Admin {update.effective_user.id} bulk {action} {kind}: {decided}/{len(ids)}")
+
+    text, markup = await _render_page(context, kind, state['cursor'], state['direction'], header)
+    await _edit(query, text, markup)
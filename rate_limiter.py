@@ -0,0 +1,196 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from notifier import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# --- ইনবাউন্ড রেট লিমিট (অ্যান্টি-স্প্যাম) ---
+# সব হ্যান্ডলারের আগে (group -1) একটি TypeHandler প্রতিটি আপডেট টোকেন বাকেটে মাপে: প্রথমে গ্লোবাল বাকেট
+# (মোট আপডেট/সেকেন্ড), তারপর ইউজারের সামগ্রিক বাকেট, তারপর কমান্ড/বাটনের নিজস্ব বাজেট (যেমন /start,
+# REFER, VERIFY — যেগুলো প্রতিবার DB-তে যায়)। বাজেট শেষ হলে ApplicationHandlerStop, তাই কোনো হ্যান্ডলার বা DB
+# কল চলে না; ইউজার একটি স্থির "ধীরে" উত্তর পান (প্রতি RATE_LIMIT_WARN_INTERVAL-এ সর্বোচ্চ একবার)।
+# স্টেট প্রসেস-লোকাল: প্রতি সক্রিয় ইউজারে কয়েকটি বাকেট (কমান্ডের সংখ্যায় সীমিত), RATE_LIMIT_IDLE সেকেন্ড
+# নিষ্ক্রিয় থাকলে (তখন বাকেট আবার পূর্ণ, তাই নতুন বাকেটের সমান) LRU ক্রমে মুছে যায়।
+#
+# বাজেটের ফরম্যাট "<সংখ্যা>/<সেকেন্ড>" — এত সেকেন্ডে এতগুলো (একসাথে সর্বোচ্চ <সংখ্যা>টি)।
+RATE_LIMIT_GLOBAL = os.environ.get("RATE_LIMIT_GLOBAL", "300/1")
+RATE_LIMIT_USER = os.environ.get("RATE_LIMIT_USER", "30/60")
+# কমান্ড/বাটন অনুযায়ী বাজেট: name=<সংখ্যা>/<সেকেন্ড>,...; নাম হলো কমান্ড (start, stats…), মেনু বাটনের নাম
+# (MENU_BUDGET_NAMES) বা callback
+RATE_LIMITS = os.environ.get(
+    "RATE_LIMITS",
+    "start=3/60,refer=5/60,verify=5/60,profile=5/60,withdraw=5/60,history=10/60,task=10/60,callback=30/60",
+)
+RATE_LIMIT_IDLE = float(os.environ.get("RATE_LIMIT_IDLE", "300"))  # সেকেন্ড
+RATE_LIMIT_MAX_USERS = int(os.environ.get("RATE_LIMIT_MAX_USERS", "50000"))
+RATE_LIMIT_WARN_INTERVAL = float(os.environ.get("RATE_LIMIT_WARN_INTERVAL", "10"))  # সেকেন্ড
+ADMIN_ID = os.environ.get("ADMIN_ID")
+
+# মেনু বাটনের লেবেল -> বাজেটের নাম (লেবেল bot.main_menu_keyboard-এর সাথে মিলতে হবে)
+MENU_BUDGET_NAMES = {
+    "👤 PROFILE 👤": 'profile',
+    "🏦 WITHDRAW 🏦": 'withdraw',
+    "🏅 TASK 🏅": 'task',
+    "📢 REFER 🎁": 'refer',
+    "💾 VERIFY ✅": 'verify',
+    "📜 HISTORY 📜": 'history',
+}
+
+SLOW_DOWN_TEXT = "⏳ একটু ধীরে! অনেক দ্রুত অনুরোধ আসছে, কয়েক সেকেন্ড পর আবার চেষ্টা করুন।"
+
+
+def parse_budget(spec):
+    """"<সংখ্যা>/<সেকেন্ড>" -> (rate প্রতি সেকেন্ডে, capacity)।"""
+    count, _, seconds = spec.partition("/")
+    count, seconds = int(count), float(seconds or 1)
+    if count <= 0 or seconds <= 0:
+        raise ValueError(f"অবৈধ রেট লিমিট: {spec!r}")
+    return count / seconds, count
+
+
+def parse_budgets(spec):
+    """"name=<সংখ্যা>/<সেকেন্ড>,..." -> {name: (rate, capacity)}।"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, budget = item.partition("=")
+        budgets[name.strip().lower()] = parse_budget(budget.strip())
+    return budgets
+
+
+def budget_name(update):
+    """আপডেটের বাজেটের নাম: কমান্ড (স্ল্যাশ ছাড়া), মেনু বাটনের নাম, 'callback' বা None (শুধু সামগ্রিক বাজেট)।"""
+    if update.callback_query is not None:
+        return 'callback'
+    message = update.effective_message
+    if message is None or not message.text:
+        return None
+    if message.text.startswith("/"):
+        return message.text[1:].split(maxsplit=1)[0].split("@")[0].lower() if len(message.text) > 1 else None
+    return MENU_BUDGET_NAMES.get(message.text)
+
+
+class _UserState:
+    __slots__ = ("seen", "overall", "buckets", "warned_at")
+
+    def __init__(self, now, overall):
+        self.seen = now
+        self.overall = overall
+        self.buckets = {}
+        self.warned_at = 0.0
+
+
+class RateLimiter:
+    """গ্লোবাল + per-user + per-command টোকেন বাকেট; ইভেন্ট লুপ থেকেই ব্যবহৃত হয়, তাই লক নেই।"""
+
+    def __init__(self, global_budget, user_budget, budgets, idle=300.0, max_users=50000, warn_interval=10.0):
+        self._global = TokenBucket(*global_budget)
+        self._user_budget = user_budget
+        self._budgets = budgets
+        self.idle = idle
+        self.max_users = max_users
+        self.warn_interval = warn_interval
+        self._users = OrderedDict()  # user_id -> _UserState (পুরনো থেকে নতুন)
+        self._stats = {'allowed': 0, 'throttled': 0, 'throttled_global': 0, 'warned': 0, 'evictions': 0}
+        self._throttled_by = {}
+
+    def _evict(self, now):
+        """নিষ্ক্রিয় ইউজার সামনে থেকে মুছে ফেলা (প্রতি কলে শুধু মেয়াদোত্তীর্ণগুলো, তাই অ্যামর্টাইজড O(1))।"""
+        users = self._users
+        while users:
+            user_id, state = next(iter(users.items()))
+            if now - state.seen < self.idle and len(users) <= self.max_users:
+                break
+            del users[user_id]
+            self._stats['evictions'] += 1
+
+    def _user_state(self, user_id, now):
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState(now, TokenBucket(*self._user_budget))
+            self._evict(now)
+        else:
+            state.seen = now
+            self._users.move_to_end(user_id)
+        return state
+
+    def allow(self, user_id, name):
+        """
+        আপডেট চলতে পারবে কি না। রিটার্ন: (allowed, state) — state ইউজারের স্টেট
+        (গ্লোবাল সীমায় আটকালে None, তখন উত্তরও পাঠানো হয় না)।
+        """
+        if not self._global.try_take():
+            self._stats['throttled_global'] += 1
+            return False, None
+        now = time.monotonic()
+        state = self._user_state(user_id, now)
+        allowed = state.overall.try_take()
+        budget = self._budgets.get(name)
+        if allowed and budget is not None:
+            bucket = state.buckets.get(name)
+            if bucket is None:
+                bucket = state.buckets[name] = TokenBucket(*budget)
+            allowed = bucket.try_take()
+        if allowed:
+            self._stats['allowed'] += 1
+        else:
+            self._stats['throttled'] += 1
+            key = name or 'other'
+            self._throttled_by[key] = self._throttled_by.get(key, 0) + 1
+        return allowed, state
+
+    def should_warn(self, state):
+        """এই ইউজারকে এখন "ধীরে" উত্তর দেওয়া হবে কি না (প্রতি warn_interval-এ একবার)।"""
+        now = time.monotonic()
+        if now - state.warned_at < self.warn_interval:
+            return False
+        state.warned_at = now
+        self._stats['warned'] += 1
+        return True
+
+    async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """group -1-এর TypeHandler: বাজেট শেষ হলে বাকি সব হ্যান্ডলার বাদ (ApplicationHandlerStop)।"""
+        user = update.effective_user
+        if user is None or str(user.id) == str(ADMIN_ID):
+            return
+        allowed, state = self.allow(user.id, budget_name(update))
+        if allowed:
+            return
+        if state is not None and self.should_warn(state):
+            try:
+                if update.callback_query is not None:
+                    await update.callback_query.answer(SLOW_DOWN_TEXT)
+                elif update.effective_message is not None:
+                    await update.effective_message.reply_text(SLOW_DOWN_TEXT)
+            except Exception as e:
+                logger.debug(f"Could not send slow-down reply to {user.id}: {e}")
+        elif update.callback_query is not None:
+            # উত্তর না দিলে বাটনের লোডিং চিহ্ন থেকে যায়; answer() খালি হলেও DB লাগে না
+            try:
+                await update.callback_query.answer()
+            except Exception:
+                pass
+        raise ApplicationHandlerStop
+
+    def stats(self):
+        return {
+            **self._stats,
+            'users': len(self._users),
+            'by_budget': dict(self._throttled_by),
+        }
+
+
+rate_limiter = RateLimiter(
+    parse_budget(RATE_LIMIT_GLOBAL),
+    parse_budget(RATE_LIMIT_USER),
+    parse_budgets(RATE_LIMITS),
+    idle=RATE_LIMIT_IDLE,
+    max_users=RATE_LIMIT_MAX_USERS,
+    warn_interval=RATE_LIMIT_WARN_INTERVAL,
+)
+rate_limit_updates = rate_limiter.check
@@ -1,96 +1,97 @@
 import os
-import psycopg2
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 
 logger = logging.getLogger(__name__)
 
-# --- ১. ডেটাবেস সংযোগ ফাংশন (Circular Import ফিক্স) ---
-# bot.py থেকে import না করে এখানে নিজস্ব সংযোগ তৈরি করা হলো
-def connect_db():
-    DATABASE_URL = os.environ.get("DATABASE_URL")
-    try:
-        conn = psycopg2.connect(DATABASE_URL, sslmode="require")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection error in refer_handler: {e}")
-        return None
+# --- ১. ডেটাবেস অ্যাক্সেস (db_handler-এর ক্যাশড ইউজার স্ন্যাপশট) ---
+# bot.py থেকে import না করে db_handler থেকে নেওয়া হলো (Circular Import এড়াতে)
+from db_handler import get_user_snapshot
+from async_db import run_db
+from message_templates import Template, MARKDOWN_V2
+from commission_handler import COMMISSION_RATES
 
 # ফ্রেচিং দ্য রেফারাল বোনাস কনস্ট্যান্ট
 REFERRAL_BONUS_JOINING = 40.00 
 
-# --- ২. রেফারাল কমান্ড হ্যান্ডলার ---
+# REFER স্ক্রিন (message_templates.py): একবার কম্পাইল; বোনাস ও প্রথম লেভেলের কমিশন স্থির, তাই আগেই বসানো
+REFER_TEMPLATE = Template(
+    "🚀 রেফার করে উপার্জন করুন এবং বোটের \n"
+    "যত বৈশিষ্টে তত বেশী ইনকাম করুন 💰\n"
+    "🔥 *REFER REWARDS* 🔥\n"
+    "\n"
+    "1️⃣ *NEW MEMBER JOINING*:\n"
+    "   *REWARD*:: *{bonus:.2f} ৳*\n"
+    "2️⃣ PREMIUM SUBSCRIPTION\n"
+    "   *REWARD* : *{commission:.0%}*\n"
+    "\n"
+    "🆕 *FREE MEMBERS*:: *{free_referrals}*\n"
+    "👑 *PREMIUM MEMBES*:: *{premium_referrals}*\n"
+    "📌 *TOTAL REFERALS*:: *{referral_count}*\n"
+    "\n"
+    "💲 *YOUR REFER BALANCE*:: *{refer_balance:.2f} ৳*\n"
+    "\n"
+    "🔗 *YOUR REFER LINK* 🔗\n"
+    "`{referral_link}`\n"
+    "\n"
+    "👉 এই লিঙ্ককে বন্ধুদের সঙ্গে শেয়ার করুন"
+).bind(bonus=REFERRAL_BONUS_JOINING, commission=float(COMMISSION_RATES[0]) if COMMISSION_RATES else 0.0)
+REFER_ERROR = Template("❌ রেফারেল তথ্য দেখাতে সমস্যা হচ্ছে।")
+
+# --- ২. রেফারাল ডেটা (সিঙ্ক্রোনাস, async_db এক্সিকিউটরে চালানো হয়) ---
+def fetch_refer_stats(user_id):
+    """
+    ইউজারের রেফার ব্যালেন্স এবং free/premium রেফারালের সংখ্যা দেয়।
+    সংযোগ ব্যর্থ হলে None।
+    """
+    # ব্যালেন্স ও ইনক্রিমেন্টাল কাউন্টার একই সারিতে — COUNT(*) স্ক্যান লাগে না
+    snapshot = get_user_snapshot(user_id)
+    if snapshot is None:
+        return None
+    if not snapshot:
+        return 0.00, 0, 0
+    return (
+        snapshot['refer_balance'] or 0.00,
+        snapshot['free_referrals'] or 0,
+        snapshot['premium_referrals'] or 0,
+    )
+
+
+# --- ৩. রেফারাল কমান্ড হ্যান্ডলার ---
 async def refer_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handles the 📢 REFER 'button'
     """
     user = update.effective_user
     user_id = user.id
-    
-    conn = connect_db()
-    
-    if not conn:
-        await update.message.reply_text("❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।")
-        return
-
-    cursor = conn.cursor()
     message = ""
-    
+
     try:
-        # ১. ইউজারের রেফারাল ব্যালেন্স ফ্রেচ করা
-        cursor.execute(
-            "SELECT refer_balance FROM users WHERE user_id = %s",
-            (user_id,)
-        )
-        result = cursor.fetchone()
-        
-        if result:
-            refer_balance = result[0]
-        else:
-            refer_balance = 0.00
-            
-        # ২. মোট রেফারালের সংখ্যা গণনা করা
-        cursor.execute(
-            "SELECT COUNT(user_id) FROM users WHERE referrer_id = %s",
-            (user_id,)
-        )
-        referral_count = cursor.fetchone()[0]
+        stats = await run_db(fetch_refer_stats, user_id)
+        if stats is None:
+            await update.message.reply_text("❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।")
+            return
+        refer_balance, free_referrals, premium_referrals = stats
+        referral_count = free_referrals + premium_referrals
         
         # রেফারাল লিংক তৈরি করা
         referral_link = f"https://t.me/{context.bot.username}?start={user_id}"
 
         # ৩. মেসেজ তৈরি করা (আপনার ইমোজি ও স্টাইল অনুযায়ী)
-        message = (
-            "🚀 রেফার করে উপার্জন করুন এবং বোটের \n"
-            "যত বৈশিষ্টে তত বেশী ইনকাম করুন 💰\n"
-            "🔥 **REFER REWARDS** 🔥\n"
-            "\n"
-            "1️⃣ **NEW **MEMBER JOINING**:\n"
-            f"   **REWARD**:: **{REFERRAL_BONUS_JOINING:.2f} ৳**\n"
-            "2️⃣ PREMIUM SUBSCRIPTION\n"
-            "   **REWARD** : **25%**\n"
-            "\n"
-            f"🆕 **FREE MEMBERS**:: **{referral_count}**\n"
-            "👑 **PREMIUM MEMBES**:: **0**\n"
-            f"📌 **TOTAL REFERALS**:: **{referral_count}**\n"
-            "\n"
-            f"💲 **YOUR REFER BALANCE**:: **{refer_balance:.2f} ৳**\n"
-            "\n"
-            f"🔗 **YOUR REFER LINK** 🔗\n"
-            f"`{referral_link}`\n"
-            "\n"
-            "👉 এই লিঙ্ককে বন্ধুদের সঙ্গে শেয়ার করুন"
+        message = REFER_TEMPLATE.render(
+            free_referrals=free_referrals,
+            premium_referrals=premium_referrals,
+            referral_count=referral_count,
+            refer_balance=refer_balance,
+            referral_link=referral_link,
         )
         
     except Exception as e:
         logger.error(f"Referral data fetch error: {e}")
-        message = "❌ রেফারেল তথ্য দেখাতে সমস্যা হচ্ছে।"
-    finally:
-        if conn:
-            conn.close()
-            
+        message = str(REFER_ERROR)
+
     await update.message.reply_text(
         message, 
-        parse_mode='Markdown'
+        parse_mode=MARKDOWN_V2
     )
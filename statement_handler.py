@@ -0,0 +1,227 @@
+import os
+import csv
+import logging
+import datetime
+import tempfile
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db
+from async_db import run_db
+from notifier import notify
+from fraud_handler import referral_graph
+from message_templates import MARKDOWN_V2
+from verify_handler import VERIFY_AMOUNT, normalize_tnx_id, review_verifications, verify_decision_message
+
+logger = logging.getLogger(__name__)
+
+# --- 🧾 পেমেন্ট স্টেটমেন্ট মিলিয়ে ভেরিফাই অটো-অনুমোদন ---
+# bKash/Nagad মার্চেন্ট স্টেটমেন্টের CSV এক্সপোর্ট লাইন ধরে স্ট্রিম করা হয়। হ্যাশ ইনডেক্স বানানো হয় পেন্ডিং
+# রিকোয়েস্টের (tnx_key -> রিকোয়েস্ট) — স্টেটমেন্টের নয় — তাই মেমোরি পেন্ডিং সংখ্যার সমানুপাতিক, স্টেটমেন্ট
+# যত লম্বাই হোক; প্রতিটি সারি একটি dict লুকআপ (রৈখিক সময়)। TrxID, টাকা ও (থাকলে) সময় মিললে রিকোয়েস্টটি মিলেছে।
+# মিলে যাওয়া সব রিকোয়েস্ট review_verifications-এর একটি সেট-ভিত্তিক স্টেটমেন্টে accept হয় (verify_expiry একসাথে);
+# না মেলাগুলো পেন্ডিং থাকে, অ্যাডমিন আগের মতো হাতে (/queue বা ACCEPT/REJECT বাটন) দেখেন।
+STATEMENT_MATCH_WINDOW_HOURS = int(os.environ.get("STATEMENT_MATCH_WINDOW_HOURS", "72"))
+# স্টেটমেন্টের সময়ে টাইমজোন না থাকলে এই অফসেট ধরা হয় (বাংলাদেশ UTC+6)
+STATEMENT_UTC_OFFSET_HOURS = float(os.environ.get("STATEMENT_UTC_OFFSET_HOURS", "6"))
+ADMIN_ID = os.environ.get("ADMIN_ID")
+
+METHODS = {'bkash': 'Bkash', 'nagad': 'Nagad'}
+
+# হেডারের নাম (ছোট হাতের, শুধু অক্ষর/সংখ্যা) -> কলাম; দুই প্রোভাইডারের এক্সপোর্টে নাম আলাদা
+HEADER_ALIASES = {
+    'trx': ('trxid', 'transactionid', 'txnid', 'trnxid', 'trxno', 'transactionno'),
+    'amount': ('amount', 'amountbdt', 'creditamount', 'credit', 'receivedamount'),
+    'time': ('datetime', 'transactiondate', 'transactiontime', 'dateandtime', 'createdat', 'date', 'time'),
+}
+TIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M',
+    '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %I:%M %p', '%d-%b-%Y %I:%M:%S %p', '%d %b %Y %I:%M %p',
+)
+PENDING_FETCH_SIZE = 5000
+
+
+def _header_key(name):
+    return "".join(ch for ch in name.lower() if ch.isalnum())
+
+
+def _find_columns(header):
+    """হেডার সারি থেকে {'trx': i, 'amount': i, 'time': i বা None}; TrxID/টাকার কলাম না পেলে None।"""
+    keys = [_header_key(name) for name in header]
+    columns = {}
+    for column, aliases in HEADER_ALIASES.items():
+        columns[column] = next((keys.index(alias) for alias in aliases if alias in keys), None)
+    if columns['trx'] is None or columns['amount'] is None:
+        return None
+    return columns
+
+
+def _parse_amount(value):
+    try:
+        return round(float(value.replace(",", "").replace("৳", "").strip()), 2)
+    except ValueError:
+        return None
+
+
+def _parse_time(value):
+    value = value.strip()
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in TIME_FORMATS:
+            try:
+                parsed = datetime.datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=STATEMENT_UTC_OFFSET_HOURS)))
+    return parsed
+
+
+def iter_statement(lines):
+    """
+    CSV লাইন (ফাইল অবজেক্ট বা যেকোনো iterable) থেকে (tnx_key, amount_text, time_text) একটি করে দেয়।
+    হেডারের আগের বাড়তি লাইন (রিপোর্টের শিরোনাম ইত্যাদি) বাদ যায়; TrxID ফরম্যাট না মেলা সারিও বাদ।
+    টাকা ও সময় কাঁচা টেক্সট থাকে — বেশিরভাগ সারি কোনো রিকোয়েস্ট মেলায় না, তাই শুধু মিললে পার্স করা হয়।
+    time কলাম না থাকলে time_text None।
+    """
+    reader = csv.reader(lines)
+    columns = None
+    for row in reader:
+        if columns is None:
+            columns = _find_columns(row)
+            continue
+        if len(row) <= max(columns['trx'], columns['amount']):
+            continue
+        tnx_key = normalize_tnx_id(row[columns['trx']])
+        if tnx_key is None:
+            continue
+        when = row[columns['time']] if columns['time'] is not None and columns['time'] < len(row) else None
+        yield tnx_key, row[columns['amount']], when
+
+
+def load_pending_index(method):
+    """মেথডের পেন্ডিং রিকোয়েস্ট: {tnx_key: (request_id, amount, requested_at)}; ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    pending = {}
+    try:
+        with conn.cursor(name="statement_pending") as cur:
+            cur.itersize = PENDING_FETCH_SIZE
+            cur.execute(
+                "SELECT tnx_key, request_id, amount, requested_at FROM verify_requests "
+                "WHERE status = 'pending' AND method = %s AND tnx_key IS NOT NULL",
+                (method,)
+            )
+            for tnx_key, request_id, amount, requested_at in cur:
+                pending[tnx_key] = (request_id, float(amount if amount is not None else VERIFY_AMOUNT), requested_at)
+        conn.rollback()
+        return pending
+    except Exception as e:
+        logger.error(f"Error loading pending verify requests for {method}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def match_statement(rows, pending, window_hours=STATEMENT_MATCH_WINDOW_HOURS):
+    """
+    স্টেটমেন্ট সারিগুলো পেন্ডিং ইনডেক্সে মেলায় (pending থেকে মিলে যাওয়া কী সরানো হয়, তাই একটি পেমেন্ট একটিই
+    রিকোয়েস্ট মেলায়)। রিটার্ন: (matched_request_ids, stats)।
+    মিলের শর্ত: একই TrxID, টাকা রিকোয়েস্টের টাকার সমান বা বেশি, আর সময় পড়া গেলে পেমেন্ট রিকোয়েস্টের আগের
+    window_hours ঘণ্টার মধ্যে (সর্বোচ্চ ১ ঘণ্টা পরে, ঘড়ির পার্থক্যের জন্য)।
+    """
+    window = datetime.timedelta(hours=window_hours)
+    slack = datetime.timedelta(hours=1)
+    matched = []
+    stats = {'rows': 0, 'matched': 0, 'amount_mismatch': 0, 'time_mismatch': 0}
+    for tnx_key, amount_text, time_text in rows:
+        stats['rows'] += 1
+        request = pending.get(tnx_key)
+        if request is None:
+            continue
+        request_id, expected, requested_at = request
+        amount = _parse_amount(amount_text)
+        if amount is None or amount + 0.005 < expected:
+            stats['amount_mismatch'] += 1
+            continue
+        when = _parse_time(time_text) if time_text else None
+        if when is not None and requested_at is not None and not (requested_at - window <= when <= requested_at + slack):
+            stats['time_mismatch'] += 1
+            continue
+        del pending[tnx_key]
+        matched.append(request_id)
+    stats['matched'] = len(matched)
+    stats['unmatched'] = len(pending)
+    return matched, stats
+
+
+def reconcile_statement(lines, method):
+    """
+    একটি মেথডের স্টেটমেন্ট মিলিয়ে মিলে যাওয়া রিকোয়েস্ট accept করে।
+    রিটার্ন: (decided[(request_id, user_id)], stats); DB ত্রুটিতে (None, None)।
+    """
+    pending = load_pending_index(method)
+    if pending is None:
+        return None, None
+    matched, stats = match_statement(iter_statement(lines), pending)
+    # অ্যাডমিন এর মধ্যে কিছু হাতে সিদ্ধান্ত দিলে review_verifications সেগুলো বাদ দেয় (শুধু পেন্ডিং আপডেট হয়)
+    decided = review_verifications(matched, 'accept')
+    if decided is None:
+        return None, None
+    stats['accepted'] = len(decided)
+    logger.info(f"Statement reconciliation ({method}): {stats}")
+    return decided, stats
+
+
+def reconcile_statement_file(path, method):
+    """ডিস্কের CSV ফাইল স্ট্রিম করে reconcile_statement চালায় (UTF-8, BOM থাকলেও)।"""
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as lines:
+        return reconcile_statement(lines, method)
+
+
+def format_reconcile_summary(method, stats):
+    return (
+        f"🧾 {method} স্টেটমেন্ট মেলানো শেষ\n"
+        f"সারি: {stats['rows']}\n"
+        f"✅ অটো-অনুমোদিত: {stats['accepted']}\n"
+        f"⚠️ টাকা মেলেনি: {stats['amount_mismatch']} · সময় মেলেনি: {stats['time_mismatch']}\n"
+        f"⏳ হাতে রিভিউয়ের জন্য পেন্ডিং: {stats['unmatched']}"
+    )
+
+
+async def notify_accepted(bot, decided):
+    for _, user_id in decided:
+        referral_graph.mark_active(user_id)
+        await notify(bot, user_id, verify_decision_message('accept'), parse_mode=MARKDOWN_V2)
+
+
+async def reconcile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/reconcile <bkash|nagad> — স্টেটমেন্টের CSV ডকুমেন্টের রিপ্লাইয়ে দিলে পেন্ডিং ভেরিফাই মিলিয়ে অনুমোদন (অ্যাডমিন)"""
+    if str(update.effective_user.id) != str(ADMIN_ID):
+        return
+    usage = "ব্যবহার: স্টেটমেন্টের CSV ফাইলের রিপ্লাইয়ে /reconcile <bkash|nagad>"
+    reply = update.message.reply_to_message
+    method = METHODS.get(context.args[0].lower()) if context.args else None
+    if method is None or reply is None or reply.document is None:
+        await update.message.reply_text(usage)
+        return
+
+    # Bot API-র ফাইল সীমার মধ্যের এক্সপোর্টের জন্য; বড় ফাইল: python manage.py reconcile-statement
+    telegram_file = await reply.document.get_file()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "statement.csv")
+        await telegram_file.download_to_drive(path)
+        decided, stats = await run_db(reconcile_statement_file, path, method)
+
+    if decided is None:
+        await update.message.reply_text("❌ স্টেটমেন্ট মেলানো ব্যর্থ হয়েছে (DB ত্রুটি)।")
+        return
+    await notify_accepted(context.bot, decided)
+    await update.message.reply_text(format_reconcile_summary(method, stats))
+
@@ -0,0 +1,501 @@
+import os
+import time
+import logging
+import threading
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from db_handler import connect_db, release_db, get_user_snapshot
+from user_cache import user_cache
+from async_db import run_db
+from notifier import notify
+
+logger = logging.getLogger(__name__)
+
+# --- 🏅 TASK ---
+# টাস্কের তালিকা খুব কম বদলায়, কিন্তু ক্যাম্পেইনে প্রতি মিনিটে হাজারো ইউজার খোলে। তাই সক্রিয় টাস্কগুলো
+# প্রসেসে ক্যাশ থাকে, প্রতিটি tier-এর যোগ্য তালিকা আগেই হিসাব করা (TaskCatalog)। লিস্ট খুলতে লাগে
+# ক্যাশ লুকআপ + task_completions-এর প্রাইমারি কী-তে একটি ইনডেক্স-অনলি কুয়েরি।
+# সম্পন্ন করা একটি স্টেটমেন্ট: completion INSERT ... ON CONFLICT DO NOTHING এবং সফল হলে একই
+# স্টেটমেন্টে free_income লেজার এন্ট্রি — দুবার চাপ দিলে বা একসাথে দুটি আপডেট এলেও রিওয়ার্ড একবারই।
+# রিওয়ার্ডের আগে যাচাই (tasks.verify_kind): 'channel' টাস্কে বট getChatMember দিয়ে দেখে ইউজার
+# verify_target চ্যানেলের সদস্য কি না; 'manual' টাস্কের completion 'pending' থাকে, অ্যাডমিন অনুমোদন দিলে ক্রেডিট।
+ADMIN_ID = os.environ.get("ADMIN_ID")
+TASK_CATALOG_TTL = float(os.environ.get("TASK_CATALOG_TTL", "60"))  # সেকেন্ড
+TASK_LIST_LIMIT = int(os.environ.get("TASK_LIST_LIMIT", "10"))
+
+TIERS = ('free', 'verified', 'premium')
+# ইউজারের tier -> কোন tier-এর টাস্ক দেখতে পায়
+TIER_ACCESS = {
+    'free': ('free',),
+    'verified': ('free', 'verified'),
+    'premium': ('free', 'verified', 'premium'),
+}
+TASK_COLUMNS = ("task_id", "title", "url", "reward", "tier", "verify_kind", "verify_target")
+# getChatMember-এর যেসব স্ট্যাটাস মানে ইউজার চ্যানেলে আছেন
+MEMBER_STATUSES = ('member', 'administrator', 'creator', 'owner')
+
+
+def user_tier(snapshot):
+    """ইউজার স্ন্যাপশটের ফ্ল্যাগ থেকে tier (মেয়াদ শেষ হলে expiry_handler ফ্ল্যাগ বন্ধ করে)।"""
+    if snapshot.get('is_premium'):
+        return 'premium'
+    if snapshot.get('is_verified'):
+        return 'verified'
+    return 'free'
+
+
+class TaskCatalog:
+    """সক্রিয় টাস্কের TTL ক্যাশ; প্রতিটি tier-এর যোগ্য টাস্ক আগেই আলাদা tuple-এ রাখা (থ্রেড-সেফ)।"""
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._by_tier = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._loads = 0
+
+    def _load(self):
+        conn = connect_db()
+        if not conn:
+            return None
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE is_active ORDER BY task_id"
+                )
+                tasks = [dict(zip(TASK_COLUMNS, row)) for row in cur.fetchall()]
+            conn.rollback()
+        except Exception as e:
+            logger.error(f"Error loading task catalog: {e}")
+            conn.rollback()
+            return None
+        finally:
+            release_db(conn)
+        return {
+            tier: tuple(task for task in tasks if task['tier'] in allowed)
+            for tier, allowed in TIER_ACCESS.items()
+        }
+
+    def for_tier(self, tier):
+        """
+        tier-এর যোগ্য সক্রিয় টাস্ক; DB ব্যর্থ হলে আগের (পুরনো) তালিকা, তাও না থাকলে None।
+        DB থেকে লোড লকের বাইরে হয়; লক শুধু নতুন স্ন্যাপশট বসানোর জন্য। একটি থ্রেড রিলোড
+        করার সময় বাকিরা অপেক্ষা না করে পুরনো তালিকা পায়।
+        """
+        with self._lock:
+            by_tier = self._by_tier
+            if by_tier is not None and (self._reloading or time.monotonic() < self._expires_at):
+                return by_tier[tier]
+            self._reloading = True
+
+        loaded = None
+        try:
+            loaded = self._load()
+        finally:
+            with self._lock:
+                self._reloading = False
+                if loaded is not None:
+                    self._by_tier = loaded
+                    self._loads += 1
+                # ব্যর্থ হলেও কিছুক্ষণ আবার চেষ্টা না করে পুরনো তালিকা দেখানো হয়
+                self._expires_at = time.monotonic() + self.ttl
+                by_tier = self._by_tier
+        if by_tier is None:
+            return None
+        return by_tier[tier]
+
+    def find(self, task_id):
+        """সক্রিয় টাস্ক (ক্যাশ থেকে); না থাকলে বা DB ব্যর্থ হলে None।"""
+        tasks = self.for_tier('premium')
+        return next((task for task in tasks or () if task['task_id'] == task_id), None)
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loads': self._loads,
+                'tasks': len(self._by_tier['premium']) if self._by_tier else 0,
+            }
+
+
+task_catalog = TaskCatalog(ttl=TASK_CATALOG_TTL)
+
+
+# --- ডেটাবেস ---
+
+def get_open_tasks(user_id):
+    """
+    ইউজারের tier অনুযায়ী যোগ্য কিন্তু এখনো জমা না দেওয়া টাস্ক (যাচাইয়ের অপেক্ষায় থাকাগুলোও বাদ)।
+    রিটার্ন: (tier, open_tasks, credited_count) — ইউজার না থাকলে {}; ত্রুটিতে None।
+    """
+    snapshot = get_user_snapshot(user_id)
+    if not snapshot:
+        return snapshot
+    tier = user_tier(snapshot)
+    eligible = task_catalog.for_tier(tier)
+    if eligible is None:
+        return None
+    if not eligible:
+        return tier, [], 0
+
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT task_id, status FROM task_completions WHERE user_id = %s AND task_id = ANY(%s)",
+                (user_id, [task['task_id'] for task in eligible])
+            )
+            done = dict(cur.fetchall())
+        conn.rollback()
+    except Exception as e:
+        logger.error(f"Error loading task completions for {user_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+    credited = sum(1 for status in done.values() if status == 'credited')
+    return tier, [task for task in eligible if task['task_id'] not in done], credited
+
+
+# tier শর্ত এখানেও — পুরনো মেসেজের বাটন বা tier বদলের পরও অযোগ্য টাস্কে রিওয়ার্ড যায় না।
+# সরাসরি ক্রেডিট শুধু 'channel' টাস্কে এবং কলার সদস্যপদ যাচাই করলে (%(verified)s); বাকিগুলো 'pending'।
+COMPLETE_TASK_SQL = """
+    WITH task AS (
+        SELECT task_id, reward,
+               CASE WHEN verify_kind = 'channel' AND %(verified)s THEN 'credited' ELSE 'pending' END AS status
+        FROM tasks
+        WHERE task_id = %(task_id)s AND is_active AND tier = ANY(%(tiers)s)
+    ), done AS (
+        INSERT INTO task_completions (user_id, task_id, reward, status)
+        SELECT %(user_id)s, task_id, reward, status FROM task
+        ON CONFLICT (user_id, task_id) DO NOTHING
+        RETURNING task_id, reward, status
+    ), credit AS (
+        INSERT INTO ledger_entries (user_id, kind, amount, ref)
+        SELECT %(user_id)s, 'free_income', reward, 'task:' || task_id FROM done WHERE status = 'credited'
+    )
+    SELECT (SELECT reward FROM done), (SELECT status FROM done), EXISTS (SELECT 1 FROM task)
+"""
+
+
+def complete_task(user_id, task_id, verified=False):
+    """
+    টাস্ক সম্পন্ন রেকর্ড করে। verified=True (চ্যানেল সদস্যপদ যাচাই হয়েছে) হলে 'channel' টাস্কে একই
+    স্টেটমেন্টে free_income-এ রিওয়ার্ড; অন্যথায় completion অ্যাডমিন অনুমোদনের জন্য 'pending'।
+    রিটার্ন: ('credited', reward), ('pending', reward), ('duplicate', None — আগেই জমা),
+    ('unavailable', None — নেই/বন্ধ/অযোগ্য); ইউজার না থাকলে বা ত্রুটিতে (None, None)।
+    """
+    snapshot = get_user_snapshot(user_id)
+    if not snapshot:
+        return (None, None)
+    conn = connect_db()
+    if not conn:
+        return (None, None)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(COMPLETE_TASK_SQL, {
+                'user_id': user_id,
+                'task_id': task_id,
+                'tiers': list(TIER_ACCESS[user_tier(snapshot)]),
+                'verified': verified,
+            })
+            reward, status, available = cur.fetchone()
+        conn.commit()
+        if status == 'credited':
+            user_cache.invalidate(user_id)
+        if status is not None:
+            return (status, reward)
+        return ('duplicate', None) if available else ('unavailable', None)
+    except Exception as e:
+        logger.error(f"Error completing task {task_id} for {user_id}: {e}")
+        conn.rollback()
+        return (None, None)
+    finally:
+        release_db(conn)
+
+
+# অ্যাডমিনের সিদ্ধান্ত: pending completion-এর স্ট্যাটাস এবং অনুমোদন হলে একই স্টেটমেন্টে লেজার এন্ট্রি
+REVIEW_TASK_SQL = """
+    WITH decided AS (
+        UPDATE task_completions SET status = %(status)s
+        WHERE user_id = %(user_id)s AND task_id = %(task_id)s AND status = 'pending'
+        RETURNING task_id, reward
+    ), credit AS (
+        INSERT INTO ledger_entries (user_id, kind, amount, ref)
+        SELECT %(user_id)s, 'free_income', reward, 'task:' || task_id FROM decided WHERE %(status)s = 'credited'
+    )
+    SELECT reward FROM decided
+"""
+
+
+def review_task_completion(user_id, task_id, approve):
+    """
+    pending completion অনুমোদন (ক্রেডিট) বা বাতিল করে।
+    রিটার্ন: (True, reward) — সিদ্ধান্ত হয়েছে; (False, None) — আগেই সিদ্ধান্ত হয়েছে/নেই; ত্রুটিতে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(REVIEW_TASK_SQL, {
+                'user_id': user_id, 'task_id': task_id, 'status': 'credited' if approve else 'rejected',
+            })
+            row = cur.fetchone()
+        conn.commit()
+        if row is None:
+            return (False, None)
+        if approve:
+            user_cache.invalidate(user_id)
+        return (True, row[0])
+    except Exception as e:
+        logger.error(f"Error reviewing task {task_id} for {user_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def create_task(title, reward, tier, url=None, channel=None):
+    """নতুন সক্রিয় টাস্ক তৈরি করে task_id দেয় (channel দিলে সদস্যপদ যাচাই, নইলে অ্যাডমিন অনুমোদন); ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO tasks (title, url, reward, tier, verify_kind, verify_target) "
+                "VALUES (%s, %s, %s, %s, %s, %s) RETURNING task_id",
+                (title, url, reward, tier, 'channel' if channel else 'manual', channel)
+            )
+            task_id = cur.fetchone()[0]
+        conn.commit()
+        task_catalog.invalidate()
+        return task_id
+    except Exception as e:
+        logger.error(f"Error creating task: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def deactivate_task(task_id):
+    """টাস্ক বন্ধ করে (সম্পন্নের রেকর্ড থেকে যায়)। রিটার্ন: বন্ধ হলে True, না পেলে False, ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE tasks SET is_active = FALSE WHERE task_id = %s AND is_active", (task_id,))
+            changed = cur.rowcount > 0
+        conn.commit()
+        task_catalog.invalidate()
+        return changed
+    except Exception as e:
+        logger.error(f"Error deactivating task {task_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+# --- হ্যান্ডলার ---
+
+TIER_LABELS = {'free': "ফ্রি", 'verified': "ভেরিফাইড", 'premium': "প্রিমিয়াম"}
+
+
+async def _render_tasks(user_id, header=""):
+    result = await run_db(get_open_tasks, user_id)
+    if result is None:
+        return "❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।", None
+    if not result:
+        return "আপনার অ্যাকাউন্ট পাওয়া যায়নি। অনুগ্রহ করে /start দিন।", None
+
+    tier, open_tasks, completed = result
+    lines = [header] if header else []
+    lines.append(f"🏅 টাস্ক ({TIER_LABELS[tier]} ইউজার) — সম্পন্ন: {completed}টি")
+    if not open_tasks:
+        lines.append("\nএই মুহূর্তে আপনার জন্য নতুন কোনো টাস্ক নেই। ✅")
+        return "\n".join(lines), None
+
+    keyboard = []
+    for task in open_tasks[:TASK_LIST_LIMIT]:
+        lines.append(f"\n#{task['task_id']} {task['title']} — {task['reward']:.2f} টাকা")
+        row = []
+        if task['url']:
+            row.append(InlineKeyboardButton(f"🔗 #{task['task_id']}", url=task['url']))
+        row.append(InlineKeyboardButton(f"✅ #{task['task_id']} সম্পন্ন", callback_data=f"task_done_{task['task_id']}"))
+        keyboard.append(row)
+    if len(open_tasks) > TASK_LIST_LIMIT:
+        lines.append(f"\n…আরও {len(open_tasks) - TASK_LIST_LIMIT}টি, এগুলো শেষ করলে দেখা যাবে।")
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+async def task_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """🏅 TASK বাটন — ইউজারের যোগ্য, অসম্পন্ন টাস্ক"""
+    text, markup = await _render_tasks(update.effective_user.id)
+    await update.message.reply_text(text, reply_markup=markup)
+
+
+async def is_channel_member(bot, channel, user_id):
+    """ইউজার চ্যানেলের সদস্য কি না (getChatMember; বটকে চ্যানেলে অ্যাডমিন হতে হবে)। যাচাই করা না গেলে None।"""
+    try:
+        member = await bot.get_chat_member(channel, user_id)
+    except BadRequest as e:
+        if "user not found" in str(e).lower() or "participant_id_invalid" in str(e).lower():
+            return False
+        logger.error(f"Cannot check membership of {user_id} in {channel}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Cannot check membership of {user_id} in {channel}: {e}")
+        return None
+    return member.status in MEMBER_STATUSES or bool(getattr(member, 'is_member', False))
+
+
+def _task_review_markup(task_id, user_id):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ অনুমোদন", callback_data=f"taskrev_ok_{task_id}_{user_id}"),
+        InlineKeyboardButton("❌ বাতিল", callback_data=f"taskrev_no_{task_id}_{user_id}"),
+    ]])
+
+
+async def task_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """task_done_<task_id> — যাচাই করে টাস্ক সম্পন্ন করে (চ্যানেল: সদস্যপদ; বাকিগুলো অ্যাডমিন অনুমোদন)"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    task_id = int(query.data.rsplit('_', 1)[1])
+
+    task = await run_db(task_catalog.find, task_id)
+    verified = False
+    if task is not None and task['verify_kind'] == 'channel':
+        member = await is_channel_member(context.bot, task['verify_target'], user_id)
+        if member is None:
+            await query.answer("❌ এখন যাচাই করা যাচ্ছে না, পরে চেষ্টা করুন।", show_alert=True)
+            return
+        if not member:
+            await query.answer(f"আগে {task['verify_target']} চ্যানেলে জয়েন করুন, তারপর ✅ চাপুন।", show_alert=True)
+            return
+        verified = True
+
+    status, reward = await run_db(complete_task, user_id, task_id, verified)
+    if status is None:
+        await query.answer("❌ ডেটাবেস সমস্যা, পরে চেষ্টা করুন।", show_alert=True)
+        return
+    if status == 'credited':
+        await query.answer(f"🎉 {reward:.2f} টাকা ফ্রি ইনকামে যোগ হয়েছে!")
+        header = f"✅ টাস্ক #{task_id} সম্পন্ন: +{reward:.2f} টাকা\n"
+    elif status == 'pending':
+        await query.answer("⏳ জমা হয়েছে — অ্যাডমিন যাচাই করলে রিওয়ার্ড যোগ হবে।")
+        header = f"⏳ টাস্ক #{task_id} যাচাইয়ের অপেক্ষায় ({reward:.2f} টাকা)\n"
+        user = update.effective_user
+        if ADMIN_ID:
+            await notify(
+                context.bot, ADMIN_ID,
+                f"🏅 টাস্ক যাচাই: #{task_id} {task['title'] if task else ''}\n"
+                f"👤 {user.full_name} ({user_id}) — {reward:.2f} টাকা",
+                reply_markup=_task_review_markup(task_id, user_id),
+            )
+    elif status == 'duplicate':
+        await query.answer("এই টাস্কটি আগেই সম্পন্ন করেছেন।")
+        header = ""
+    else:
+        await query.answer("এই টাস্কটি আর পাওয়া যাচ্ছে না।", show_alert=True)
+        header = ""
+
+    text, markup = await _render_tasks(user_id, header)
+    try:
+        await query.edit_message_text(text, reply_markup=markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+
+
+def _is_admin(update):
+    return str(update.effective_user.id) == str(ADMIN_ID)
+
+
+async def task_review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """taskrev_<ok|no>_<task_id>_<user_id> — pending টাস্ক অনুমোদন/বাতিল (অ্যাডমিন)"""
+    query = update.callback_query
+    if not _is_admin(update):
+        await query.answer("আপনি এই অ্যাকশনের জন্য অনুমোদিত নন।")
+        return
+    _, action, task_id, user_id = query.data.split('_')
+    task_id, user_id, approve = int(task_id), int(user_id), action == 'ok'
+
+    result = await run_db(review_task_completion, user_id, task_id, approve)
+    if result is None:
+        await query.answer("❌ ডেটাবেস সমস্যা, পরে চেষ্টা করুন।", show_alert=True)
+        return
+    decided, reward = result
+    await query.answer()
+    if not decided:
+        await query.edit_message_text(f"টাস্ক #{task_id} / {user_id}: আগেই সিদ্ধান্ত হয়েছে।")
+        return
+    if approve:
+        await query.edit_message_text(f"✅ টাস্ক #{task_id} / {user_id} অনুমোদিত (+{reward:.2f} টাকা)।")
+        await notify(context.bot, user_id, f"🎉 টাস্ক #{task_id} অনুমোদিত: {reward:.2f} টাকা ফ্রি ইনকামে যোগ হয়েছে!")
+    else:
+        await query.edit_message_text(f"❌ টাস্ক #{task_id} / {user_id} বাতিল।")
+        await notify(context.bot, user_id, f"❌ টাস্ক #{task_id} যাচাইয়ে বাতিল হয়েছে।")
+
+
+async def add_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /addtask <reward> <free|verified|premium> <title> [| url] [| @channel] — নতুন টাস্ক (অ্যাডমিন)।
+    @channel দিলে রিওয়ার্ডের আগে চ্যানেল সদস্যপদ যাচাই হয় (বটকে সেখানে অ্যাডমিন করুন); না দিলে প্রতিটি
+    completion অ্যাডমিন অনুমোদন করেন।
+    """
+    if not _is_admin(update):
+        return
+    usage = "ব্যবহার: /addtask <reward> <free|verified|premium> <title> [| url] [| @channel]"
+    try:
+        reward = float(context.args[0])
+        tier = context.args[1].lower()
+        title, _, rest = " ".join(context.args[2:]).partition("|")
+        url, _, channel = rest.partition("|")
+        title, url, channel = title.strip(), url.strip() or None, channel.strip() or None
+    except (IndexError, ValueError):
+        await update.message.reply_text(usage)
+        return
+    if tier not in TIERS or not title or reward < 0 or (channel and not channel.startswith(("@", "-100"))):
+        await update.message.reply_text(usage)
+        return
+    if channel and await is_channel_member(context.bot, channel, context.bot.id) is not True:
+        await update.message.reply_text(f"❌ {channel}-এ বটের সদস্যপদ দেখা যাচ্ছে না — বটকে চ্যানেলে অ্যাডমিন করুন।")
+        return
+
+    task_id = await run_db(create_task, title, reward, tier, url, channel)
+    if task_id is None:
+        await update.message.reply_text("❌ টাস্ক তৈরি ব্যর্থ হয়েছে।")
+    else:
+        check = f"চ্যানেল যাচাই: {channel}" if channel else "অ্যাডমিন অনুমোদন"
+        await update.message.reply_text(f"✅ টাস্ক #{task_id} তৈরি হয়েছে ({TIER_LABELS[tier]}, {reward:.2f} টাকা, {check})।")
+
+
+async def end_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/endtask <task_id> — টাস্ক বন্ধ করে (অ্যাডমিন)"""
+    if not _is_admin(update):
+        return
+    try:
+        task_id = int(context.args[0])
+    except (IndexError, ValueError):
+        await update.message.reply_text("ব্যবহার: /endtask <task_id>")
+        return
+
+    changed = await run_db(deactivate_task, task_id)
+    if changed is None:
+        await update.message.reply_text("❌ আপডেট ব্যর্থ হয়েছে।")
+    elif changed:
+        await update.message.reply_text(f"✅ টাস্ক #{task_id} বন্ধ করা হয়েছে।")
+    else:
+        await update.message.reply_text(f"টাস্ক #{task_id} পাওয়া যায়নি বা আগেই বন্ধ।")
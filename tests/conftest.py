@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# টেস্ট রুট-লেভেল মডিউল (db_handler, bot …) সরাসরি import করে
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "1:test")
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """
+    আসল Postgres (TEST_DATABASE_URL) — না থাকলে টেস্ট skip। মাইগ্রেশন চালিয়ে শেয়ার্ড পুল খোলে,
+    শেষে পুল ও এক্সিকিউটর বন্ধ করে। প্রতিটি টেস্ট নিজের বানানো সারি নিজেই মোছে।
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    import db_handler
+    import async_db
+    import migrator
+
+    db_handler.close_pool()
+    monkeypatch.setattr(db_handler, "DATABASE_URL", TEST_DATABASE_URL)
+    monkeypatch.setattr(db_handler, "DB_POOL_MAX_SIZE", 20)
+    assert db_handler.init_pool() is not None
+    assert migrator.migrate() is not None
+    yield db_handler
+    async_db.shutdown_executor()
+    db_handler.close_pool()
@@ -0,0 +1,114 @@
+import pytest
+import psycopg2.extensions
+
+import db_handler
+from db_handler import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.close_calls = 0
+
+    def close(self):
+        self.close_calls += 1
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        pass
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__("postgresql://fake", **kwargs)
+        self.connections = []
+
+    def _connect(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    """ফেক পুল, db_handler-এর গ্লোবাল পুল হিসেবে বসানো (release_db যেমন প্রোডাকশনে এটিতেই যায়)।"""
+    def make(**kwargs):
+        pool = FakePool(**kwargs)
+        monkeypatch.setattr(db_handler, "_pool", pool)
+        return pool
+    return make
+
+
+def assert_counters_sane(pool):
+    stats = pool.stats()
+    assert stats['size'] >= 0
+    assert stats['in_use'] >= 0
+    assert stats['size'] <= pool.max_size
+
+
+def test_evicted_idle_connection_is_closed(make_pool):
+    pool = make_pool(min_size=0, max_size=2, max_idle=0.0)
+    conn = pool.acquire()
+    pool.release(conn)
+    other = pool.acquire()  # max_idle=0: আগেরটি evict হয়ে নতুন কানেকশন
+
+    assert conn.close_calls == 1
+    assert other is not conn
+    assert_counters_sane(pool)
+    assert pool.stats()['idle'] == 0
+
+
+def test_unhealthy_connection_is_closed_not_requeued(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.closed = 2  # সার্ভার সংযোগ কেটে দিয়েছে
+    pool.release(conn)
+
+    assert conn.close_calls == 1
+    assert pool.stats()['idle'] == 0
+    assert_counters_sane(pool)
+
+
+def test_close_closes_idle_connections_once(make_pool):
+    pool = make_pool(min_size=3, max_size=3)
+    pool.open()
+    pool.close()
+
+    assert [conn.close_calls for conn in pool.connections] == [1, 1, 1]
+    stats = pool.stats()
+    assert stats['size'] == 0
+    assert stats['discarded'] == 3
+    assert_counters_sane(pool)
+
+
+def test_release_after_close_closes_connection(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    pool.close()
+    db_handler.release_db(conn)
+
+    assert conn.close_calls == 1
+    assert pool.stats()['size'] == 0
+    assert_counters_sane(pool)
+
+
+def test_max_size_still_enforced_after_discards(make_pool):
+    pool = make_pool(min_size=0, max_size=2, acquire_timeout=0.01)
+    for _ in range(5):
+        conn = pool.acquire()
+        conn.closed = 2
+        pool.release(conn)
+    held = [pool.acquire(), pool.acquire()]
+    try:
+        pool.acquire()
+    except db_handler.PoolTimeout:
+        pass
+    else:
+        raise AssertionError("pool opened more than max_size connections")
+    assert pool.stats()['in_use'] == 2
+    for conn in held:
+        pool.release(conn)
+    assert_counters_sane(pool)
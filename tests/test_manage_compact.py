@@ -0,0 +1,22 @@
+import db_handler
+import manage
+
+
+def fake_batches(monkeypatch, results):
+    results = iter(results)
+    monkeypatch.setattr(db_handler, "compact_ledger", lambda: next(results))
+
+
+def test_compact_ledger_exits_zero_when_all_batches_succeed(monkeypatch):
+    fake_batches(monkeypatch, [(500, 0), (20, 0), (0, 0)])
+    assert manage.compact_ledger(None) == 0
+
+
+def test_compact_ledger_exits_nonzero_on_failed_batch(monkeypatch):
+    fake_batches(monkeypatch, [(500, 0), (120, 1)])
+    assert manage.compact_ledger(None) == 1
+
+
+def test_compact_ledger_exits_nonzero_without_connection(monkeypatch):
+    fake_batches(monkeypatch, [(0, 1)])
+    assert manage.compact_ledger(None) == 1
@@ -0,0 +1,32 @@
+import pytest
+
+from menu_router import MenuRouter
+
+KEYBOARD = [["👤 প্রোফাইল", "🔗 রেফার"], ["💰 ব্যালেন্স"]]
+
+
+async def show_balance(update, context):
+    return "balance"
+
+
+def test_register_with_callback():
+    router = MenuRouter(KEYBOARD)
+    assert router.register("💰 ব্যালেন্স", show_balance) is show_balance
+    assert router.unrouted() == ["👤 প্রোফাইল", "🔗 রেফার"]
+
+
+def test_register_as_decorator():
+    router = MenuRouter(KEYBOARD)
+
+    @router.register("🔗 রেফার")
+    async def refer(update, context):
+        return "refer"
+
+    assert refer.__name__ == "refer"
+    assert router.unrouted() == ["👤 প্রোফাইল", "💰 ব্যালেন্স"]
+
+
+def test_register_decorator_rejects_unknown_label():
+    router = MenuRouter(KEYBOARD)
+    with pytest.raises(ValueError):
+        router.register("❓ নেই")(show_balance)
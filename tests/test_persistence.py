@@ -0,0 +1,85 @@
+import asyncio
+import datetime
+from decimal import Decimal
+
+import persistence
+from persistence import PostgresPersistence, conversation_key, decode_data, encode_data
+
+
+class FakeConversationHandler:
+    def __init__(self, name):
+        from telegram.ext._utils.trackingdict import TrackingDict
+        self.name = name
+        self._conversations = TrackingDict()
+
+
+def test_json_round_trips_decimal_and_datetimes():
+    data = {
+        'amount': Decimal("150.50"),
+        'cursor': datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2026, 1, 2),
+        'ids': [1, 2],
+    }
+    assert decode_data(encode_data(data)) == data
+
+
+def test_unknown_types_are_not_persisted():
+    store = PostgresPersistence()
+
+    async def queue():
+        await store.update_user_data(1, {'bad': object()})
+
+    asyncio.run(queue())
+    assert store._pending == {}
+
+
+def test_refresh_picks_up_other_workers_writes(monkeypatch):
+    store = PostgresPersistence()
+    handler = FakeConversationHandler("verify_conversation")
+    store.track_conversations(handler)
+    rows = {
+        ('user_data', '', '7'): (encode_data({'payment_method': "Bkash"}), 3),
+        ('conversation', 'verify_conversation', conversation_key(7)): (encode_data(1), 2),
+    }
+    monkeypatch.setattr(persistence, "load_user_rows", lambda user_id, names: dict(rows))
+    user_data = {'stale': True}
+
+    asyncio.run(store.refresh_user_data(7, user_data))
+    assert user_data == {'payment_method': "Bkash"}
+    assert handler._conversations[(7, 7)] == 1
+    assert handler._conversations.pop_accessed_keys() == set()
+
+    # অন্য ওয়ার্কার কনভার্সেশন শেষ করেছে ও user_data বদলেছে
+    del rows[('conversation', 'verify_conversation', conversation_key(7))]
+    rows[('user_data', '', '7')] = (encode_data({'withdraw_amount': Decimal("200")}), 4)
+    asyncio.run(store.refresh_user_data(7, user_data))
+    assert user_data == {'withdraw_amount': Decimal("200")}
+    assert (7, 7) not in handler._conversations
+
+
+def test_refresh_keeps_unflushed_local_changes(monkeypatch):
+    store = PostgresPersistence()
+    monkeypatch.setattr(
+        persistence, "load_user_rows",
+        lambda user_id, names: {('user_data', '', '7'): (encode_data({'old': 1}), 5)},
+    )
+    store._pending[('user_data', '', '7')] = encode_data({'new': 1})
+    user_data = {'new': 1}
+
+    asyncio.run(store.refresh_user_data(7, user_data))
+    assert user_data == {'new': 1}
+
+
+def test_unchanged_data_is_not_rewritten(monkeypatch):
+    store = PostgresPersistence()
+    saved = []
+    monkeypatch.setattr(persistence, "save_rows", lambda pending: saved.append(dict(pending)) or {key: 1 for key in pending})
+
+    async def cycle():
+        await store.update_user_data(7, {'a': 1})
+        await store.flush()
+        await store.update_user_data(7, {'a': 1})
+        await store.flush()
+
+    asyncio.run(cycle())
+    assert len(saved) == 1
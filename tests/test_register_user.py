@@ -0,0 +1,54 @@
+import asyncio
+import random
+
+import bot
+from async_db import run_db
+
+CONCURRENT_STARTS = 16
+
+
+def _cleanup(db, user_ids):
+    conn = db.connect_db()
+    try:
+        with conn.cursor() as cur:
+            refs = [f"join:{user_id}" for user_id in user_ids]
+            cur.execute("DELETE FROM ledger_entries WHERE ref = ANY(%s) OR user_id = ANY(%s)", (refs, list(user_ids)))
+            cur.execute("DELETE FROM user_balances WHERE user_id = ANY(%s)", (list(user_ids),))
+            cur.execute("DELETE FROM users WHERE user_id = ANY(%s)", (list(user_ids),))
+        conn.commit()
+    finally:
+        db.release_db(conn)
+
+
+def test_parallel_start_pays_one_referral_bonus(db):
+    """একই ইউজারের একসাথে আসা N টি /start: users-এ একটি সারি, join:<id> লেজার এন্ট্রি ঠিক একটি।"""
+    referrer_id = random.randint(9_000_000_000, 9_499_999_999)
+    user_id = referrer_id + 500_000_000
+    try:
+        assert bot.register_user(referrer_id) == (True, False)
+
+        async def storm():
+            return await asyncio.gather(*(
+                run_db(bot.register_user, user_id, referrer_id) for _ in range(CONCURRENT_STARTS)
+            ))
+
+        results = asyncio.run(storm())
+        assert results.count((True, True)) == 1
+        assert results.count((False, False)) == CONCURRENT_STARTS - 1
+
+        conn = db.connect_db()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM users WHERE user_id = %s", (user_id,))
+                assert cur.fetchone()[0] == 1
+                cur.execute("SELECT COUNT(*), SUM(amount) FROM ledger_entries WHERE ref = %s", (f"join:{user_id}",))
+                count, total = cur.fetchone()
+                assert count == 1
+                assert float(total) == bot.REFERRAL_BONUS_JOINING
+                cur.execute("SELECT free_referrals FROM users WHERE user_id = %s", (referrer_id,))
+                assert cur.fetchone()[0] == 1
+            conn.rollback()
+        finally:
+            db.release_db(conn)
+    finally:
+        _cleanup(db, [user_id, referrer_id])
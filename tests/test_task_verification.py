@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import task_handler
+
+
+class FakeBot:
+    id = 99
+
+    def __init__(self, status):
+        self.status = status
+        self.sent = []
+
+    async def get_chat_member(self, chat_id, user_id):
+        return SimpleNamespace(status=self.status)
+
+    async def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+class FakeQuery:
+    data = "task_done_3"
+
+    def __init__(self):
+        self.answers = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+
+def _tap(monkeypatch, task, member_status, result, admin_id="1"):
+    calls = []
+    monkeypatch.setattr(task_handler, "ADMIN_ID", admin_id)
+    monkeypatch.setattr(task_handler.task_catalog, "find", lambda task_id: task)
+    monkeypatch.setattr(task_handler, "complete_task", lambda user_id, task_id, verified: calls.append(verified) or result)
+
+    async def render(user_id, header=""):
+        return header or "tasks", None
+
+    monkeypatch.setattr(task_handler, "_render_tasks", render)
+    bot = FakeBot(member_status)
+    query = FakeQuery()
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=7, full_name="User"))
+    asyncio.run(task_handler.task_callback(update, SimpleNamespace(bot=bot)))
+    return calls, query, bot
+
+
+CHANNEL_TASK = {'task_id': 3, 'title': "Join", 'verify_kind': 'channel', 'verify_target': "@chan"}
+MANUAL_TASK = {'task_id': 3, 'title': "Review", 'verify_kind': 'manual', 'verify_target': None}
+
+
+def test_channel_task_is_not_credited_without_membership(monkeypatch):
+    calls, query, _ = _tap(monkeypatch, CHANNEL_TASK, 'left', ('credited', 5))
+    assert calls == []
+    assert "@chan" in query.answers[0]
+
+
+def test_channel_task_credits_members(monkeypatch):
+    calls, _, _ = _tap(monkeypatch, CHANNEL_TASK, 'member', ('credited', 5))
+    assert calls == [True]
+
+
+def test_manual_task_goes_to_admin_review(monkeypatch):
+    calls, _, bot = _tap(monkeypatch, MANUAL_TASK, 'member', ('pending', 5))
+    assert calls == [False]
+    assert bot.sent and bot.sent[0]['reply_markup'].inline_keyboard[0][0].callback_data == "taskrev_ok_3_7"
+
+
+def test_manual_task_skips_admin_notice_without_admin_id(monkeypatch):
+    calls, query, bot = _tap(monkeypatch, MANUAL_TASK, 'member', ('pending', 5), admin_id=None)
+    assert calls == [False]
+    assert bot.sent == []
+    assert query.answers[0].startswith("⏳")
+
+
+def test_catalog_reload_runs_outside_the_lock(monkeypatch):
+    catalog = task_handler.TaskCatalog(ttl=60)
+    snapshot = {tier: () for tier in task_handler.TIER_ACCESS}
+
+    def load():
+        # লোড চলাকালীন লক খালি থাকতে হবে
+        assert catalog._lock.acquire(blocking=False)
+        catalog._lock.release()
+        return snapshot
+
+    monkeypatch.setattr(catalog, "_load", load)
+    assert catalog.for_tier('premium') == ()
+    assert catalog.stats()['loads'] == 1
+
+
+def test_catalog_serves_stale_snapshot_while_another_reload_runs(monkeypatch):
+    catalog = task_handler.TaskCatalog(ttl=60)
+    stale = {tier: ({'task_id': 1},) for tier in task_handler.TIER_ACCESS}
+    catalog._by_tier = stale
+    catalog._reloading = True
+    monkeypatch.setattr(catalog, "_load", lambda: pytest.fail("second reload started"))
+    assert catalog.for_tier('premium') == ({'task_id': 1},)
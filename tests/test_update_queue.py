@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from telegram import Update
+
+from update_processor import BoundedUpdateQueue, UpdateQueueFull
+
+
+def test_full_queue_rejects_with_503_instead_of_dropping():
+    async def scenario():
+        queue = BoundedUpdateQueue(max_pending=1, put_timeout=0.01)
+        await queue.put(Update(update_id=1))
+        with pytest.raises(UpdateQueueFull) as excinfo:
+            await queue.put(Update(update_id=2))
+        return queue, excinfo.value
+
+    queue, error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.update_id == 2
+    assert queue.qsize() == 1
+    assert queue.stats()['rejected'] == 1
+
+
+def test_released_slot_accepts_the_redelivered_update():
+    async def scenario():
+        queue = BoundedUpdateQueue(max_pending=1, put_timeout=0.01)
+        await queue.put(Update(update_id=1))
+        with pytest.raises(UpdateQueueFull):
+            await queue.put(Update(update_id=2))
+        await queue.get()
+        queue.release_slot()
+        await queue.put(Update(update_id=2))
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.qsize() == 1
+    assert queue.stats()['pending'] == 1
@@ -0,0 +1,55 @@
+import verify_handler
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, row):
+        self.cur = FakeCursor(row)
+        self.rollbacks = 0
+        self.commits = 0
+
+    def cursor(self):
+        return self.cur
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+def _decide(monkeypatch, row, action='accept'):
+    conn = FakeConnection(row)
+    released = []
+    monkeypatch.setattr(verify_handler, "connect_db", lambda: conn)
+    monkeypatch.setattr(verify_handler, "release_db", released.append)
+    return verify_handler.apply_verify_decision(7, action, 42), conn, released
+
+
+def test_unknown_request_is_missing_and_rolled_back(monkeypatch):
+    status, conn, released = _decide(monkeypatch, None)
+    assert status == 'missing'
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert len(conn.cur.queries) == 1
+    assert released == [conn]
+
+
+def test_already_decided_request_is_left_alone(monkeypatch):
+    status, conn, released = _decide(monkeypatch, ('reject', None))
+    assert status == 'reject'
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert released == [conn]
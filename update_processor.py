@@ -0,0 +1,254 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import deque
+from http import HTTPStatus
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+# tornado শুধু run_webhook-এ লাগে; bot.py এই মডিউল কেবল ওয়েবহুক মোডে ইম্পোর্ট করে (সার্ভারলেসে নয়)
+from tornado.web import HTTPError
+
+logger = logging.getLogger(__name__)
+
+# --- ওয়েবহুক ইনজেশন ও সমান্তরাল আপডেট প্রসেসিং ---
+# ওয়েবহুক হ্যান্ডলার আপডেট কিউতে রাখার পরেই Telegram-কে 200 দেয়; এখানে কিউটি সীমিত রাখা হয়
+# (ব্যাকপ্রেশার: কিউ ভর্তি হলে 503, Telegram আপডেটটি আবার পাঠায়) এবং প্রসেসর একসাথে কয়েকটি আপডেট চালায়। একই ইউজারের আপডেট একটি
+# per-user লকে সিরিয়াল থাকে, তাই ConversationHandler-এর স্টেট ক্রম ঠিক থাকে; আলাদা
+# ইউজারের আপডেট একে অপরকে আটকায় না। after_update (যেমন persistence-এর write-through) লক ছাড়ার আগে চলে।
+UPDATE_CONCURRENCY = int(os.environ.get("UPDATE_CONCURRENCY", "16"))
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", "1000"))
+# কিউ ভর্তি থাকলে ওয়েবহুক রিকোয়েস্ট কত সেকেন্ড অপেক্ষা করবে; এরপর 503 দিয়ে ফেরত যায়
+UPDATE_QUEUE_PUT_TIMEOUT = float(os.environ.get("UPDATE_QUEUE_PUT_TIMEOUT", "5"))
+
+# লেটেন্সি মেট্রিক্সে কতগুলো আলাদা রুট রাখা হবে (বাকিগুলো "other")
+MAX_ROUTE_LABELS = 64
+# p95 হিসাবের জন্য প্রতি রুটে সাম্প্রতিক কতগুলো স্যাম্পল রাখা হয়
+LATENCY_SAMPLES = 256
+
+_CALLBACK_ID_RE = re.compile(r"_[\d.]+.*$")
+
+
+def route_label(update):
+    """মেট্রিক্সের জন্য আপডেটের রুট: /command, cb:<prefix> বা আপডেটের ধরন।"""
+    if not isinstance(update, Update):
+        return type(update).__name__
+    if update.callback_query is not None:
+        data = update.callback_query.data or ""
+        # verify_accept_12_50 -> cb:verify_accept (আইডি/অ্যামাউন্ট বাদ দিয়ে)
+        return "cb:" + _CALLBACK_ID_RE.sub("", data)
+    message = update.effective_message
+    if message is not None and message.text and message.text.startswith("/"):
+        return message.text.split()[0].split("@")[0]
+    for kind in ("message", "edited_message", "my_chat_member", "chat_member", "inline_query"):
+        if getattr(update, kind, None) is not None:
+            return kind
+    return "other"
+
+
+def _ordering_key(update):
+    """একই কী-এর আপডেটগুলো ক্রমানুসারে চলে; None হলে কোনো লক নেই।"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return ("user", update.effective_user.id)
+    if update.effective_chat is not None:
+        return ("chat", update.effective_chat.id)
+    return None
+
+
+class UpdateQueueFull(HTTPError):
+    """কিউ ভর্তি: PTB-র ওয়েবহুক হ্যান্ডলার (tornado) এটিকে 503 রেসপন্সে পরিণত করে, ফলে Telegram রিট্রাই করে।"""
+
+    def __init__(self, update_id):
+        super().__init__(HTTPStatus.SERVICE_UNAVAILABLE, reason="Update queue full")
+        self.update_id = update_id
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """
+    Application.update_queue-এর সীমিত সংস্করণ। কিউতে থাকা এবং প্রসেস হতে থাকা মিলিয়ে
+    max_pending-এর বেশি আপডেট থাকলে put() অপেক্ষা করে (ওয়েবহুক রিকোয়েস্টও অপেক্ষা করে,
+    ফলে Telegram-এর max_connections পূর্ণ হয়ে নতুন ডেলিভারি ধীর হয়)। put_timeout পার হলে
+    UpdateQueueFull ওঠে — আপডেটটি acknowledge হয় না, Telegram পরে আবার পাঠায়, তাই হারায় না।
+    """
+
+    def __init__(self, max_pending=1000, put_timeout=5.0):
+        # PTB নিজের স্টপ সিগন্যালও এই কিউতে রাখে, তাই মূল কিউ অসীম; সীমা slots দিয়ে
+        super().__init__()
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending = 0
+        self._rejected = 0
+        self._put_waits = 0
+        self._max_depth = 0
+
+    async def put(self, item):
+        if not isinstance(item, Update):
+            await super().put(item)
+            return
+
+        if self._slots.locked():
+            self._put_waits += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            logger.warning(f"Update queue full ({self.max_pending}), rejected update {item.update_id} with 503")
+            raise UpdateQueueFull(item.update_id) from None
+
+        self._pending += 1
+        self._max_depth = max(self._max_depth, self._pending)
+        await super().put(item)
+
+    def release_slot(self):
+        """প্রসেসর একটি আপডেট শেষ করলে কল করে।"""
+        if self._pending > 0:
+            self._pending -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {
+            'depth': self.qsize(),
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'max_depth': self._max_depth,
+            'put_waits': self._put_waits,
+            'rejected': self._rejected,
+        }
+
+
+class _RouteLatency:
+    __slots__ = ("count", "errors", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, elapsed, failed):
+        self.count += 1
+        self.errors += failed
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.samples.append(elapsed)
+
+    def p95(self):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    সর্বোচ্চ `concurrency`টি আপডেট একসাথে চালায়, তবে একই ইউজারের আপডেট ক্রমানুসারে।
+
+    PTB-র নিজস্ব সেমাফোর (process_update) ইউজার লকের আগে নেওয়া হয়, তাই সেটি কিউ সাইজের
+    সমান রাখা হয় এবং আসল সীমা এখানে ইউজার লক পাওয়ার পরে প্রয়োগ হয় — এক ইউজারের
+    জমে থাকা আপডেট ওয়ার্কার স্লট আটকে রাখে না।
+    """
+
+    def __init__(self, concurrency, update_queue):
+        super().__init__(max(concurrency, update_queue.max_pending, 2))
+        self.concurrency = concurrency
+        self.update_queue = update_queue
+        self._workers = asyncio.Semaphore(concurrency)
+        self._locks = {}  # key -> [asyncio.Lock, waiter_count]
+        self.after_update = None  # async callable: প্রতিটি আপডেট শেষে, একই ইউজারের পরের আপডেটের আগে
+        self._running = 0
+        self._processed = 0
+        self._routes = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._locks.clear()
+
+    async def do_process_update(self, update, coroutine):
+        key = _ordering_key(update)
+        try:
+            if key is None:
+                await self._run(update, coroutine)
+                return
+
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    await self._run(update, coroutine)
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+        finally:
+            if isinstance(update, Update):
+                self.update_queue.release_slot()
+
+    async def _run(self, update, coroutine):
+        async with self._workers:
+            self._running += 1
+            started = time.monotonic()
+            failed = False
+            try:
+                await coroutine
+            except Exception:
+                failed = True
+                raise
+            finally:
+                if self.after_update is not None:
+                    try:
+                        await self.after_update()
+                    except Exception as e:
+                        logger.error(f"after_update failed for update {getattr(update, 'update_id', None)}: {e}")
+                self._running -= 1
+                self._processed += 1
+                self._record(route_label(update), time.monotonic() - started, failed)
+
+    def _record(self, label, elapsed, failed):
+        route = self._routes.get(label)
+        if route is None:
+            if len(self._routes) >= MAX_ROUTE_LABELS:
+                label = "other"
+                route = self._routes.get(label)
+            if route is None:
+                route = self._routes[label] = _RouteLatency()
+        route.add(elapsed, failed)
+
+    def stats(self):
+        routes = {
+            label: {
+                'count': route.count,
+                'errors': route.errors,
+                'avg_ms': (route.total / route.count) * 1000 if route.count else 0.0,
+                'p95_ms': route.p95() * 1000,
+                'max_ms': route.max * 1000,
+            }
+            for label, route in self._routes.items()
+        }
+        return {
+            'concurrency': self.concurrency,
+            'running': self._running,
+            'active_keys': len(self._locks),
+            'processed': self._processed,
+            'routes': routes,
+            **self.update_queue.stats(),
+        }
+
+
+def build_update_pipeline(concurrency=None, queue_size=None, put_timeout=None):
+    """ApplicationBuilder-এর জন্য (update_queue, update_processor) জোড়া তৈরি করে।"""
+    update_queue = BoundedUpdateQueue(
+        max_pending=queue_size or UPDATE_QUEUE_SIZE,
+        put_timeout=UPDATE_QUEUE_PUT_TIMEOUT if put_timeout is None else put_timeout,
+    )
+    processor = PerUserUpdateProcessor(concurrency or UPDATE_CONCURRENCY, update_queue)
+    return update_queue, processor
@@ -0,0 +1,80 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# --- ইউজার স্ন্যাপশট ক্যাশ ---
+# মেনু নেভিগেশনে (PROFILE, REFER, VERIFY, WITHDRAW) একই users সারি বারবার পড়া হয়।
+# এখানে user_id অনুযায়ী সারির কপি TTL + LRU নিয়মে রাখা হয়; লেখার সময় db_handler
+# ও হ্যান্ডলারগুলো invalidate() কল করে। ক্যাশ প্রসেস-লোকাল, তাই একাধিক ওয়ার্কারে
+# অন্য ওয়ার্কারের লেখা সর্বোচ্চ TTL সময় পর্যন্ত পুরনো দেখাতে পারে।
+USER_CACHE_MAX_SIZE = int(os.environ.get("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))  # সেকেন্ড
+
+
+class UserCache:
+    """থ্রেড-সেফ TTL + LRU ক্যাশ (DB এক্সিকিউটরের থ্রেড থেকে ব্যবহৃত হয়)।"""
+
+    def __init__(self, max_size=10000, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # user_id -> (expires_at, snapshot)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, user_id):
+        """ক্যাশে থাকলে স্ন্যাপশটের কপি, না থাকলে বা মেয়াদ শেষ হলে None।"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, snapshot = entry
+            if expires_at <= now:
+                del self._data[user_id]
+                self._misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self._hits += 1
+            return dict(snapshot)
+
+    def set(self, user_id, snapshot):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, dict(snapshot))
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                if user_id is not None and self._data.pop(user_id, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+user_cache = UserCache(max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
@@ -1,5 +1,5 @@
 import os
-import psycopg2
+import re
 import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler
@@ -9,15 +9,15 @@ from telegram.ext.filters import TEXT # এটি আপনার স্ক্
 
 logger = logging.getLogger(__name__)
 
-# --- ১. ডেটাবেস সংযোগ ফাংশন (Circular Import ফিক্স) ---
-def connect_db():
-    DATABASE_URL = os.environ.get("DATABASE_URL")
-    try:
-        conn = psycopg2.connect(DATABASE_URL, sslmode="require")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
-        return None
+# --- ১. ডেটাবেস সংযোগ (db_handler-এর শেয়ার্ড পুল) ---
+from db_handler import connect_db, release_db, get_user_snapshot
+from user_cache import user_cache
+from async_db import run_db
+from notifier import notify
+from bloom import BloomFilter
+from fraud_handler import referral_graph
+from commission_handler import settle_commissions
+from message_templates import Template, MARKDOWN_V2
 
 # --- ২. কনভার্সেশন স্টেটস ও কনস্ট্যান্ট ---
 SELECT_METHOD, SUBMIT_TNX = range(2)
@@ -27,6 +27,90 @@ VERIFY_AMOUNT = 50.00
 VERIFY_DAYS = 30
 PAYMENT_NUMBER = "01338553254" # বকিশ/নগদ (আপনার স্ক্রিনশট অনুযায়ী)
 
+# --- TrxID যাচাই ও ডুপ্লিকেট শনাক্তকরণ ---
+# জমা দেওয়া TrxID স্বাভাবিক করে (ফাঁকা জায়গা/'-' বাদ, বড় হাতের) ফরম্যাট মেলানো হয়। আগে ব্যবহৃত
+# (method, TrxID)-এর হিসাব প্রসেসের Bloom ফিল্টারে থাকে (স্টার্টআপে DB থেকে লোড): "নতুন" হলে সরাসরি
+# INSERT, "সম্ভবত পুরনো" হলে শুধু একটি ইনডেক্স লুকআপে নিশ্চিত করা হয়। ডুপ্লিকেট বা ভুল ফরম্যাট INSERT ও
+# অ্যাডমিন নোটিফিকেশনের আগেই ফেরত যায়। আসল গ্যারান্টি ইউনিক ইনডেক্স (migrations/0011_tnx_dedup.sql)।
+TNX_ID_PATTERN = re.compile(os.environ.get("TNX_ID_PATTERN", r"^[A-Z0-9]{8,12}$"))
+TNX_BLOOM_CAPACITY = int(os.environ.get("TNX_BLOOM_CAPACITY", "200000"))
+TNX_BLOOM_ERROR_RATE = float(os.environ.get("TNX_BLOOM_ERROR_RATE", "0.001"))
+TNX_WARM_BATCH = 5000
+
+seen_tnx_ids = BloomFilter(capacity=TNX_BLOOM_CAPACITY, error_rate=TNX_BLOOM_ERROR_RATE)
+
+# --- স্ক্রিন টেমপ্লেট ও স্থির কিবোর্ড (message_templates.py, MarkdownV2) ---
+# মডিউল লোডের সময় একবার তৈরি; প্রতিটি কলে শুধু ডাইনামিক ফিল্ড (নাম, Tnx ID ইত্যাদি) escape হয়।
+VERIFY_PREMIUM_TEMPLATE = Template(
+    "✨ *PREMIUM USER* ✨\n"
+    "*PREMIUM TIME* : *{days}* দিন বাকি\n"
+    "আপনার অ্যাকাউন্ট *ভেরিফাইড* আছে, প্রিমিয়াম সময় বাড়াতে VERIFY করুন।\n"
+)
+VERIFY_ACTIVE_TEMPLATE = Template(
+    "✅ *ভেরিফাইড ইউজার* ✅\n"
+    "Verify Time: *{days}* দিন বাকি\n"
+    "আপনার উইথড্র অপশনটি চালু আছে।"
+)
+VERIFY_MISSING_TEXT = str(Template(
+    "⚠️ *আপনার একাউন্টটি ভেরিফাই করা নেই!*\n"
+    "আপনার Withdraw অপশনটি ভেরিফাই না করলে লক থাকবে। দয়া করে ভেরিফাই করুন।"
+))
+VERIFY_DB_ERROR_TEXT = str(Template("❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।"))
+VERIFY_STATUS_ERROR_TEXT = str(Template("ভেরিফাই স্ট্যাটাস আনতে সমস্যা হচ্ছে।"))
+VERIFY_START_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("✅ VERIFY", callback_data="verify_start")]])
+
+SELECT_METHOD_TEXT = str(Template("*Method সিলেক্ট করুন*"))
+PAYMENT_METHOD_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton(f"💸 Bkash - {PAYMENT_NUMBER}", callback_data="method_Bkash")],
+    [InlineKeyboardButton(f"💰 Nagad - {PAYMENT_NUMBER}", callback_data="method_Nagad")]
+])
+TNX_FORM_TEMPLATE = Template(
+    "⛔ এই *{method}* Personal নাম্বারে *৳{amount:.2f}* টাকা পরিশোধ করুন এবং *trxID পূরণ* করুন।\n"
+    "🚫 অন্য কোনো *{method}* Personal নাম্বারে টাকা পাঠাবেন না!\n"
+    "👇 এই নম্বরে টাকা পাঠানোর পর *trX ID* টি কপি করে এখানে মেসেজ দিন।"
+).bind(amount=VERIFY_AMOUNT)
+
+ADMIN_VERIFY_TEMPLATE = Template(
+    "🔔 *নতুন ভেরিফাই রিকোয়েস্ট!* 🔔\n"
+    "👤 *ইউজার* : *{first_name}*\n"
+    "🆔 *ইউজার ID* : `{user_id}`\n"
+    "🗓️ *Date* : {date}\n"
+    "💳 *Method* : {method}\n"
+    "💸 *Amount* : *{amount:.2f} ৳*\n"
+    "🔑 *Tnx ID* : `{tnx_id}`"
+).bind(amount=VERIFY_AMOUNT)
+TNX_INVALID_TEXT = str(Template(
+    "⚠️ *TrxID সঠিক ফরম্যাটে নেই!*\n"
+    "পেমেন্টের SMS থেকে শুধু TrxID টি (যেমন: 8N7A6B5C4D) কপি করে আবার পাঠান।"
+))
+TNX_DUPLICATE_TEXT = str(Template(
+    "🚫 *এই TrxID টি আগেই জমা দেওয়া হয়েছে!*\n"
+    "একটি পেমেন্টের TrxID একবারই ব্যবহার করা যায়। নতুন পেমেন্টের TrxID পাঠান।"
+))
+VERIFY_THANKS_TEXT = str(Template(
+    "🎉 *ধন্যবাদ!* আপনার VERIFY রিকোয়েস্টটি সফলভাবে জমা দেওয়া হয়েছে।\n"
+    "*📝 Status*: *pending*\n"
+    "⏳ দয়া করে অপেক্ষণ করুন।"
+))
+
+VERIFY_DECISION_TEXTS = {
+    'accept': str(Template(
+        "✅ *অভিনন্দন!* আপনার ভেরিফাই রিকোয়েস্টটি *ACCEPT* করা হয়েছে।\n"
+        "💰 মেয়াদ: *{days} দিন*\n"
+        "আপনি এখন সফলভাবে উইথড্র করতে পারবেন।"
+    ).bind(days=VERIFY_DAYS)),
+    'reject': str(Template(
+        "❌ *দুঃখিত!* আপনার ভেরিফাই রিকোয়েস্টটি *REJECT* করা হয়েছে।\n"
+        "⚠️ *কারণ*: আপনার Tnx ID টি সঠিক নয়।\n"
+        " অনুগ্রহ করে সঠিক Tnx ID দিয়ে আবার চেষ্টা করুন।"
+    )),
+}
+ADMIN_ALREADY_DECIDED_TEMPLATE = Template("🚫 রিকোয়েস্টটি ইতিমধ্যেই *{status}* করা হয়েছে!\nBy: {admin}")
+ADMIN_DECIDED_TEMPLATES = {
+    'accept': Template("✅ রিকোয়েস্টটি *ACCEPT* করা হয়েছে!\nBy: {admin}"),
+    'reject': Template("❌ রিকোয়েস্টটি *REJECT* করা হয়েছে!\nBy: {admin}"),
+}
+
 # --- ৩. সাহায্যকারী ফাংশন ---
 
 # **Circular Import ফিক্সের জন্য ডামি/ফিক্সড menu_home**
@@ -50,70 +134,227 @@ def format_verify_status(user_id):
     """
     ইউজারের ভেরিফাই স্ট্যাটাস চেক করে মেসেজ ও বাটন তৈরি করে।
     """
-    conn = connect_db()
-    if not conn:
-        return "❌ দুঃখিত! ডেটাবেস সংযোগে সমস্যা হচ্ছে।", None
+    snapshot = get_user_snapshot(user_id)
+    if snapshot is None:
+        return VERIFY_DB_ERROR_TEXT, None
     
-    cursor = conn.cursor()
     message = ""
     reply_markup = None
     
     try:
-        cursor.execute(
-            """
-            SELECT is_premium, expiry_date, verify_expiry
-            FROM users 
-            WHERE user_id = %s
-            """, (user_id,)
-        )
-        status = cursor.fetchone()
-        
-        if status:
-            is_premium, expiry_date, verify_expiry = status
+        if snapshot:
+            is_premium, expiry_date, is_verified, verify_expiry = (
+                snapshot['is_premium'], snapshot['expiry_date'], snapshot['is_verified'], snapshot['verify_expiry']
+            )
             now = datetime.datetime.now(datetime.timezone.utc)
             
             # ১. যদি প্রিমিয়াম থাকে (আপনার স্ক্রিনশট লজিক)
-            if is_premium and expiry_date and expiry_date > now:
-                remaining_time = expiry_date - now
-                days = remaining_time.days
-                message += (
-                    f"✨ **PREMIUM USER** ✨\n"
-                    f"**PREMIUM TIME** : **{days}** দিন বাকি\n"
-                    "আপনার অ্যাকাউন্ট **ভেরিফাইড** আছে, প্রিমিয়াম সময় বাড়াতে VERIFY করুন।\n"
-                )
+            # মেয়াদ শেষ হলে expiry_handler-এর সুইপার ফ্ল্যাগ বন্ধ করে, তাই এখানে শুধু ফ্ল্যাগ দেখা হয়;
+            # তারিখ শুধু বাকি দিন দেখানোর জন্য
+            if is_premium and expiry_date:
+                message += VERIFY_PREMIUM_TEMPLATE.render(days=max((expiry_date - now.date()).days, 0))
             
             # ২. যদি ভেরিফাই থাকে (আপনার স্ক্রিনশট লজিক)
-            elif verify_expiry and verify_expiry > now:
-                remaining_time = verify_expiry - now
-                days = remaining_time.days
-                message += (
-                    f"✅ **ভেরিফাইড ইউজার** ✅\n"
-                    f"Verify Time: **{days}** দিন বাকি\n"
-                    "আপনার উইথড্র অপশনটি চালু আছে।"
-                )
+            elif is_verified and verify_expiry:
+                message += VERIFY_ACTIVE_TEMPLATE.render(days=max((verify_expiry - now).days, 0))
                 
             # ৩. যদি ভেরিফাই না করা থাকে (আপনার স্ক্রিনশট লজিক)
             else:
-                message += (
-                    "⚠️ **আপনার একাউন্টটি ভেরিফাই করা নেই!**\n"
-                    "আপনার Withdraw অপশনটি ভেরিফাই না করলে লক থাকবে। দয়া করে ভেরিফাই করুন।"
-                )
-                # VERIFY বাটন তৈরি
-                keyboard = [
-                    [InlineKeyboardButton("✅ VERIFY", callback_data="verify_start")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                message += VERIFY_MISSING_TEXT
+                reply_markup = VERIFY_START_MARKUP
 
     except Exception as e:
         logger.error(f"Error formatting verify status for user {user_id}: {e}")
-        message = "ভেরিফাই স্ট্যাটাস আনতে সমস্যা হচ্ছে।"
-    finally:
-        if conn:
-            conn.close()
+        message = VERIFY_STATUS_ERROR_TEXT
             
     return message, reply_markup
 
 
+def normalize_tnx_id(raw):
+    """ইউজারের লেখা TrxID -> tnx_key (ফাঁকা জায়গা ও '-' বাদ, বড় হাতের); ফরম্যাট না মিললে None।"""
+    key = re.sub(r"[\s-]", "", raw).upper()
+    return key if TNX_ID_PATTERN.match(key) else None
+
+
+def _bloom_key(method, tnx_key):
+    return f"{method}:{tnx_key}"
+
+
+def warm_tnx_filter():
+    """
+    আগে জমা পড়া সব (method, tnx_key) Bloom ফিল্টারে লোড করে (স্টার্টআপে একবার)।
+    সার্ভার-সাইড কার্সরে ব্যাচে পড়া হয়, তাই মেমোরিতে পুরো তালিকা আসে না। লোড হওয়া সংখ্যা; ত্রুটিতে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+    loaded = 0
+    try:
+        with conn.cursor(name="tnx_warm") as cur:
+            cur.itersize = TNX_WARM_BATCH
+            cur.execute("SELECT method, tnx_key FROM verify_requests WHERE tnx_key IS NOT NULL")
+            for method, tnx_key in cur:
+                seen_tnx_ids.add(_bloom_key(method, tnx_key))
+                loaded += 1
+        conn.rollback()
+        return loaded
+    except Exception as e:
+        logger.error(f"Error warming TrxID filter: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def tnx_id_exists(method, tnx_key):
+    """(method, tnx_key) আগে জমা পড়েছে কি না (ইউনিক ইনডেক্সে লুকআপ); ত্রুটিতে None।"""
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT EXISTS (SELECT 1 FROM verify_requests WHERE method = %s AND tnx_key = %s)",
+                (method, tnx_key)
+            )
+            exists = cur.fetchone()[0]
+        conn.rollback()
+        return exists
+    except Exception as e:
+        logger.error(f"Error checking TrxID {method}:{tnx_key}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_db(conn)
+
+
+def save_verify_request(user_id, username, method, tnx_id, tnx_key):
+    """
+    নতুন ভেরিফাই রিকোয়েস্ট সেভ করে। রিটার্ন: ('saved', request_id), একই (method, tnx_key) আগে থাকলে
+    ('duplicate', None) — ইউনিক ইনডেক্সে ON CONFLICT, তাই একসাথে দুটি জমা এলেও একটিই সেভ হয়।
+    সংযোগ ব্যর্থ হলে (None, None)।
+    """
+    conn = connect_db()
+    if not conn:
+        return None, None
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO verify_requests (user_id, username, amount, method, tnx_id, tnx_key, status)
+            VALUES (%s, %s, %s, %s, %s, %s, 'pending')
+            ON CONFLICT (method, tnx_key) DO NOTHING
+            RETURNING request_id;
+            """, (user_id, username, VERIFY_AMOUNT, method, tnx_id, tnx_key)
+        )
+        row = cursor.fetchone()
+        conn.commit()
+        seen_tnx_ids.add(_bloom_key(method, tnx_key))
+        if row is None:
+            return 'duplicate', None
+        return 'saved', row[0]
+    finally:
+        cursor.close()
+        release_db(conn)
+
+
+def apply_verify_decision(request_id, action, target_user_id):
+    """
+    পেন্ডিং রিকোয়েস্টে অ্যাডমিনের সিদ্ধান্ত (accept/reject) প্রয়োগ করে।
+    ACCEPT হলে ইউজারের verify_expiry ও is_verified সেট হয়। আগের স্ট্যাটাস রিটার্ন করে
+    ('pending' হলে আপডেট হয়েছে); রিকোয়েস্ট না থাকলে 'missing'; সংযোগ ব্যর্থ হলে None।
+    """
+    conn = connect_db()
+    if not conn:
+        return None
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT status, amount FROM verify_requests WHERE request_id = %s FOR UPDATE", (request_id,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            return 'missing'
+        current_status, amount = row
+        if current_status != 'pending':
+            conn.rollback()
+            return current_status
+
+        cursor.execute("UPDATE verify_requests SET status = %s WHERE request_id = %s", (action, request_id))
+        if action == 'accept':
+            new_expiry_date = datetime.datetime.now(datetime.timezone.utc) + timedelta(days=VERIFY_DAYS)
+            cursor.execute(
+                """
+                UPDATE users 
+                SET verify_expiry = %s, is_verified = TRUE
+                WHERE user_id = %s
+                """, (new_expiry_date, target_user_id)
+            )
+        conn.commit()
+        user_cache.invalidate(target_user_id)
+    finally:
+        cursor.close()
+        release_db(conn)
+    if action == 'accept':
+        # কমিশন সিদ্ধান্তের পরে আলাদা লেখা; ব্যর্থ হলে নাইটলি অডিট বসিয়ে দেয়
+        settle_commissions([(f"verify:{request_id}", target_user_id, amount if amount is not None else VERIFY_AMOUNT)])
+    return current_status
+
+
+# /queue-এর পেজ সিদ্ধান্ত: একটি স্টেটমেন্টে রিকোয়েস্টের স্ট্যাটাস ও (accept হলে) ইউজারের verify_expiry
+REVIEW_VERIFICATIONS_SQL = """
+    WITH decided AS (
+        UPDATE verify_requests SET status = %(action)s
+        WHERE request_id = ANY(%(ids)s) AND status = 'pending'
+        RETURNING request_id, user_id, amount
+    ), verified AS (
+        UPDATE users SET verify_expiry = %(expiry)s, is_verified = TRUE
+        WHERE %(action)s = 'accept' AND user_id IN (SELECT user_id FROM decided)
+    )
+    SELECT request_id, user_id, amount FROM decided ORDER BY request_id
+"""
+
+
+def review_verifications(request_ids, action):
+    """
+    একাধিক পেন্ডিং ভেরিফাই রিকোয়েস্টে এক ট্রানজেকশনে accept/reject প্রয়োগ করে; accept হলে সবগুলোর
+    রেফার কমিশন একটি ব্যাচে সেটল হয়। রিটার্ন: যেগুলো পেন্ডিং ছিল তাদের [(request_id, user_id)]; সংযোগ বা কুয়েরি ব্যর্থ হলে None।
+    """
+    if not request_ids:
+        return []
+    conn = connect_db()
+    if not conn:
+        return None
+
+    rows = []
+    cursor = conn.cursor()
+    try:
+        new_expiry_date = datetime.datetime.now(datetime.timezone.utc) + timedelta(days=VERIFY_DAYS)
+        cursor.execute(REVIEW_VERIFICATIONS_SQL, {'action': action, 'ids': list(request_ids), 'expiry': new_expiry_date})
+        rows = cursor.fetchall()
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error reviewing verify requests: {e}")
+        conn.rollback()
+        return None
+    finally:
+        user_cache.invalidate(*(user_id for _, user_id, _ in rows))
+        cursor.close()
+        release_db(conn)
+    if action == 'accept':
+        settle_commissions([
+            (f"verify:{request_id}", user_id, amount if amount is not None else VERIFY_AMOUNT)
+            for request_id, user_id, amount in rows
+        ])
+    return [(request_id, user_id) for request_id, user_id, _ in rows]
+
+
+def verify_decision_message(action):
+    """অ্যাডমিনের সিদ্ধান্তের পর ইউজারকে পাঠানো মেসেজ (MarkdownV2)।"""
+    return VERIFY_DECISION_TEXTS['accept' if action == 'accept' else 'reject']
+
+
 # --- ৪. মূল হ্যান্ডলার ফাংশন (আপনার স্ক্রিনশট অনুযায়ী ফ্লো) ---
 
 # ১. VERIFY কমান্ড হ্যান্ডলার (ENTRY POINT)
@@ -121,12 +362,12 @@ async def verify_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """VERIFY বাটন চাপলে ইউজারের স্ট্যাটাস দেখায়"""
     user_id = update.effective_user.id
     
-    message, reply_markup = format_verify_status(user_id)
+    message, reply_markup = await run_db(format_verify_status, user_id)
     
     await update.message.reply_text(
         message, 
         reply_markup=reply_markup, 
-        parse_mode='Markdown'
+        parse_mode=MARKDOWN_V2
     )
     
     return ConversationHandler.END
@@ -138,20 +379,12 @@ async def start_verify_flow(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    keyboard = [
-        [InlineKeyboardButton(f"💸 Bkash - {PAYMENT_NUMBER}", callback_data="method_Bkash")],
-        [InlineKeyboardButton(f"💰 Nagad - {PAYMENT_NUMBER}", callback_data="method_Nagad")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    # আপনার স্ক্রিনশট অনুযায়ী স্টাইল
-    text = f"**Method সিলেক্ট করুন**"
-    
+    # আপনার স্ক্রিনশট অনুযায়ী স্টাইল (টেক্সট ও কিবোর্ড স্থির, মডিউল লোডের সময় তৈরি)
     await context.bot.send_message(
         chat_id=query.message.chat_id,
-        text=text,
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
+        text=SELECT_METHOD_TEXT,
+        reply_markup=PAYMENT_METHOD_MARKUP,
+        parse_mode=MARKDOWN_V2
     )
     
     return SELECT_METHOD
@@ -167,18 +400,12 @@ async def submit_tnx_form(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['payment_method'] = method
     
     # আপনার স্ক্রিনশট অনুযায়ী আসল মেসেজ স্টাইল
-    message = (
-        f"⛔ এই **{method}** Personal নাম্বারে **৳{VERIFY_AMOUNT:.2f}** টাকা পরিশোধ করুন এবং **trxID পূরণ** করুন।\n"
-        f"🚫 অন্য কোনো **{method}** Personal নাম্বারে টাকা পাঠাবেন না!\n"
-        f"👇 এই নম্বরে টাকা পাঠানোর পর **trX ID** টি কপি করে এখানে মেসেজ দিন।"
-    )
-    
     # পূর্বের মেসেজ এডিট করা
     await context.bot.edit_message_text(
         chat_id=query.message.chat_id,
         message_id=query.message.message_id,
-        text=message,
-        parse_mode='Markdown'
+        text=TNX_FORM_TEMPLATE.render(method=method),
+        parse_mode=MARKDOWN_V2
     )
     
     return SUBMIT_TNX
@@ -196,35 +423,34 @@ async def handle_tnx_submission(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("❌ দুঃখিত, পেমেন্ট মেথড খুঁজে পাওয়া যায়নি। আবার চেষ্টা করুন।")
         return ConversationHandler.END
 
-    conn = connect_db()
-    if not conn:
-        await update.message.reply_text("❌ দুঃখিত, বর্তমানে ডেটাবেস সংযোগে সমস্যা হচ্ছে। পরে চেষ্টা করুন।")
-        return ConversationHandler.END
-    
-    cursor = conn.cursor()
-    request_id = None
-    
+    # ০. ফরম্যাট ও ডুপ্লিকেট যাচাই — INSERT বা অ্যাডমিন নোটিফিকেশনের আগেই
+    tnx_key = normalize_tnx_id(tnx_id)
+    if tnx_key is None:
+        await update.message.reply_text(TNX_INVALID_TEXT, parse_mode=MARKDOWN_V2)
+        return SUBMIT_TNX
+
     try:
+        # Bloom ফিল্টারে না থাকলে নিশ্চিতভাবে নতুন; থাকলে (সম্ভবত পুরনো) শুধু পড়ে নিশ্চিত করা হয়
+        if _bloom_key(method, tnx_key) in seen_tnx_ids and await run_db(tnx_id_exists, method, tnx_key):
+            await update.message.reply_text(TNX_DUPLICATE_TEXT, parse_mode=MARKDOWN_V2)
+            return SUBMIT_TNX
+
         # ১. ভেরিফাই রিকোয়েস্ট সেভ করা 
-        cursor.execute(
-            """
-            INSERT INTO verify_requests (user_id, username, amount, method, tnx_id, status)
-            VALUES (%s, %s, %s, %s, %s, 'pending')
-            RETURNING request_id;
-            """, (user.id, user.username, VERIFY_AMOUNT, method, tnx_id)
-        )
-        request_id = cursor.fetchone()[0]
-        conn.commit()
+        saved, request_id = await run_db(save_verify_request, user.id, user.username, method, tnx_id, tnx_key)
+        if saved is None:
+            await update.message.reply_text("❌ দুঃখিত, বর্তমানে ডেটাবেস সংযোগে সমস্যা হচ্ছে। পরে চেষ্টা করুন।")
+            return ConversationHandler.END
+        if saved == 'duplicate':
+            await update.message.reply_text(TNX_DUPLICATE_TEXT, parse_mode=MARKDOWN_V2)
+            return SUBMIT_TNX
         
         # ২. অ্যাডমিন নোটিফিকেশন মেসেজ তৈরি (আপনার স্ক্রিনশট অনুযায়ী স্টাইল)
-        admin_message = (
-            f"🔔 **নতুন ভেরিফাই রিকোয়েস্ট!** 🔔\n"
-            f"👤 **ইউজার** : **{user.first_name}**\n"
-            f"🆔 **ইউজার ID** : `{user.id}`\n"
-            f"🗓️ **Date** : {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"💳 **Method** : {method}\n"
-            f"💸 **Amount** : **{VERIFY_AMOUNT:.2f} ৳**\n"
-            f"🔑 **Tnx ID** : `{tnx_id}`"
+        admin_message = ADMIN_VERIFY_TEMPLATE.render(
+            first_name=user.first_name,
+            user_id=user.id,
+            date=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            method=method,
+            tnx_id=tnx_key,
         )
         
         # ৩. অ্যাডমিন বাটন তৈরি
@@ -236,32 +462,26 @@ async def handle_tnx_submission(update: Update, context: ContextTypes.DEFAULT_TY
         ]
         admin_markup = InlineKeyboardMarkup(keyboard)
 
-        # ৪. অ্যাডমিনকে মেসেজ পাঠানো
+        # ৪. অ্যাডমিনকে মেসেজ পাঠানো (কিউ করা হয়; ইউজারের রিপ্লাই এর জন্য অপেক্ষা করে না)
         if admin_id:
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=admin_message,
+            await notify(
+                context.bot,
+                admin_id,
+                admin_message,
+                digest=('verify', f"#{request_id} · {user.first_name} ({user.id}) · {method} · {tnx_key}"),
                 reply_markup=admin_markup,
-                parse_mode='Markdown'
+                parse_mode=MARKDOWN_V2
             )
         
         # ৫. ইউজারকে ধন্যবাদ মেসেজ পাঠানো (আপনার স্ক্রিনশট অনুযায়ী স্টাইল)
-        user_thanks_message = (
-            "🎉 **ধন্যবাদ!** আপনার VERIFY রিকোয়েস্টটি সফলভাবে জমা দেওয়া হয়েছে।\n"
-            f"**📝 Status**: **pending**\n"
-            f"⏳ দয়া করে অপেক্ষণ করুন।"
-        )
         await update.message.reply_text(
-            user_thanks_message,
-            parse_mode='Markdown'
+            VERIFY_THANKS_TEXT,
+            parse_mode=MARKDOWN_V2
         )
 
     except Exception as e:
         logger.error(f"Error saving verify request: {e}")
         await update.message.reply_text("❌ দুঃখিত, রিকোয়েস্ট সেভ করতে সমস্যা হয়েছে। আবার চেষ্টা করুন।")
-    finally:
-        if conn:
-            conn.close()
             
     return ConversationHandler.END
 
@@ -283,90 +503,51 @@ async def admin_verify_callback(update: Update, context: ContextTypes.DEFAULT_TY
     action = data[1] 
     request_id = int(data[2])
     target_user_id = int(data[3])
-    requester_name = query.effective_user.first_name 
+    requester_name = query.from_user.first_name 
 
-    conn = connect_db()
-    if not conn:
-        await query.message.reply_text("DB সংযোগ ব্যর্থ।")
-        return
-
-    cursor = conn.cursor()
-    
     try:
-        # ১. রিকোয়েস্ট স্ট্যাটাস চেক
-        cursor.execute("SELECT status FROM verify_requests WHERE request_id = %s", (request_id,))
-        current_status = cursor.fetchone()[0]
-        
+        # ১-২. রিকোয়েস্ট স্ট্যাটাস চেক ও আপডেট (একই ট্রানজেকশনে)
+        current_status = await run_db(apply_verify_decision, request_id, action, target_user_id)
+
+        if current_status is None:
+            await query.message.reply_text("DB সংযোগ ব্যর্থ।")
+            return
+
+        if current_status == 'missing':
+            await query.edit_message_text(f"রিকোয়েস্ট #{request_id} খুঁজে পাওয়া যায়নি (মুছে ফেলা হয়েছে বা আইডি ভুল)।")
+            return
+
         if current_status != 'pending':
             await context.bot.edit_message_text(
                 chat_id=query.message.chat_id,
                 message_id=query.message.message_id,
-                text=f"🚫 রিকোয়েস্টটি ইতিমধ্যেই **{current_status}** করা হয়েছে!\nBy: {requester_name}",
-                parse_mode='Markdown'
+                text=ADMIN_ALREADY_DECIDED_TEMPLATE.render(status=current_status, admin=requester_name),
+                parse_mode=MARKDOWN_V2
             )
             return
 
-        # ২. রিকোয়েস্ট স্ট্যাটাস আপডেট
-        cursor.execute("UPDATE verify_requests SET status = %s WHERE request_id = %s", (action, request_id))
-        conn.commit()
-        
-        user_message = ""
-        
+        # ৩-৪. ACCEPT হলে EXPIRY DATE apply_verify_decision-এ সেট হয়েছে; ইউজারকে জানানো (আপনার স্টাইল)
+        user_message = verify_decision_message(action)
         if action == 'accept':
-            # ৩. যদি ACCEPT হয়: EXPIRY DATE সেট করা
-            new_expiry_date = datetime.datetime.now(datetime.timezone.utc) + timedelta(days=VERIFY_DAYS)
-            
-            cursor.execute(
-                """
-                UPDATE users 
-                SET verify_expiry = %s
-                WHERE user_id = %s
-                """, (new_expiry_date, target_user_id)
-            )
-            conn.commit()
-            
-            # ইউজারকে জানানো (আপনার স্টাইল)
-            user_message = (
-                f"✅ **অভিনন্দন!** আপনার ভেরিফাই রিকোয়েস্টটি **ACCEPT** করা হয়েছে।\n"
-                f"💰 মেয়াদ: **{VERIFY_DAYS} দিন**\n"
-                f"আপনি এখন সফলভাবে উইথড্র করতে পারবেন।"
-            )
-            
-            # অ্যাডমিন মেসেজ আপডেট
-            admin_new_text = f"✅ রিকোয়েস্টটি **ACCEPT** করা হয়েছে!\nBy: {requester_name}"
-
-        elif action == 'reject':
-            # ৪. যদি REJECT হয়: 
-            user_message = (
-                f"❌ **দুঃখিত!** আপনার ভেরিফাই রিকোয়েস্টটি **REJECT** করা হয়েছে।\n"
-                f"⚠️ **কারণ**: আপনার Tnx ID টি সঠিক নয়।\n"
-                f" অনুগ্রহ করে সঠিক Tnx ID দিয়ে আবার চেষ্টা করুন।"
-            )
-            
-            # অ্যাডমিন মেসেজ আপডেট
-            admin_new_text = f"❌ রিকোয়েস্টটি **REJECT** করা হয়েছে!\nBy: {requester_name}"
+            referral_graph.mark_active(target_user_id)
+
+        # অ্যাডমিন মেসেজ আপডেট
+        admin_new_text = ADMIN_DECIDED_TEMPLATES['accept' if action == 'accept' else 'reject'].render(admin=requester_name)
 
         # ৫. অ্যাডমিন মেসেজ এডিট করা
         await context.bot.edit_message_text(
             chat_id=query.message.chat_id,
             message_id=query.message.message_id,
             text=admin_new_text,
-            parse_mode='Markdown'
+            parse_mode=MARKDOWN_V2
         )
         
         # ৬. টার্গেট ইউজারকে মেসেজ পাঠানো
-        await context.bot.send_message(
-            chat_id=target_user_id,
-            text=user_message,
-            parse_mode='Markdown'
-        )
+        await notify(context.bot, target_user_id, user_message, parse_mode=MARKDOWN_V2)
 
     except Exception as e:
         logger.error(f"Error processing admin verify callback: {e}")
         await query.message.reply_text("প্রসেসিং এ বড় ধরনের সমস্যা হয়েছে। লগ চেক করুন।")
-    finally:
-        if conn:
-            conn.close()
 
 
 # ৭. কনভার্সেশন হ্যান্ডলার তৈরি (আপনার স্ক্রিনশট অনুযায়ী)
@@ -1,8 +1,11 @@
 import os
+import uuid
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters, CommandHandler
-from db_handler import connect_db, update_balance, get_user_balance, record_withdraw_request, get_pending_withdrawals, update_withdraw_status
+# DB কল async_db দিয়ে await করা হয় যাতে ইভেন্ট লুপ ব্লক না হয়
+from async_db import get_user_balance, get_user_data, withdraw, review_withdrawals
+from notifier import notify
 
 # Logging সেটআপ
 logger = logging.getLogger(__name__)
@@ -12,15 +15,20 @@ WITHDRAW_AMOUNT_INPUT, WITHDRAW_WALLET_INPUT = range(2)
 
 # অ্যাডমিন আইডি আপনার bot.py ফাইল থেকে আসছে। এখানেও সেট করে নিতে পারেন বা os.environ ব্যবহার করতে পারেন।
 ADMIN_ID = os.environ.get("ADMIN_ID") # নিশ্চিত করুন যে এটি আপনার আসল অ্যাডমিন আইডি
+# /withdrawbulk একবারে সর্বোচ্চ কতগুলো অনুরোধ নেবে
+WITHDRAW_BULK_MAX = int(os.environ.get("WITHDRAW_BULK_MAX", "5000"))
 
 # --- কমাণ্ড ফাংশন ---
 async def withdraw_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    balance = get_user_balance(user_id)
+    balance = await get_user_balance(user_id)
     
     if balance is None or balance <= 0:
         await update.message.reply_text("আপনার অ্যাকাউন্টে কোনো ব্যালেন্স নেই।")
         return ConversationHandler.END
+
+    # এই কনভার্সেশনের idempotency key — রিট্রাই হওয়া আপডেট যেন দ্বিতীয়বার টাকা না কাটে
+    context.user_data['withdraw_key'] = uuid.uuid4().hex
         
     # মেনু বাটন তৈরি
     keyboard = [[InlineKeyboardButton("❌ বাতিল করুন", callback_data="cancel")]]
@@ -37,7 +45,7 @@ async def handle_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_T
     try:
         amount = float(update.message.text)
         user_id = update.effective_user.id
-        balance = get_user_balance(user_id)
+        balance = await get_user_balance(user_id)
         
         # বৈধতা পরীক্ষা
         if amount < 100:
@@ -51,7 +59,7 @@ async def handle_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_T
         context.user_data['withdraw_amount'] = amount
         
         # ওয়ালেট ঠিকানা যাচাই (যদি প্রোফাইলে থাকে)
-        user_data = get_user_data(user_id)
+        user_data = await get_user_data(user_id)
         current_wallet = user_data.get('wallet_address')
         
         if current_wallet:
@@ -103,11 +111,25 @@ async def handle_withdraw_wallet(update: Update, context: ContextTypes.DEFAULT_T
     else:
         return WITHDRAW_WALLET_INPUT # কোনো ইনপুট নেই
 
-    # নিশ্চিতকরণের পর, রিকোয়েস্ট সেভ করুন
-    request_id = record_withdraw_request(user_id, amount, wallet_address)
-    
-    # ব্যালেন্স আপডেট
-    update_balance(user_id, -amount) # ব্যালেন্স থেকে টাকা কেটে নেওয়া
+    # নিশ্চিতকরণের পর, এক ট্রানজেকশনে ব্যালেন্স কেটে রিকোয়েস্ট সেভ করুন
+    withdraw_key = context.user_data.get('withdraw_key')
+    if amount is None or withdraw_key is None:
+        return await cancel_withdraw_conversation(update, context)
+
+    status, request_id = await withdraw(user_id, amount, wallet_address, withdraw_key)
+
+    if status == 'insufficient':
+        await update.effective_chat.send_message("আপনার অ্যাকাউন্টে যথেষ্ট ব্যালেন্স নেই। উত্তোলন অনুরোধটি বাতিল করা হলো।")
+        return ConversationHandler.END
+    if status == 'duplicate':
+        # একই কনভার্সেশনের রিট্রাই — অনুরোধ আগেই তৈরি ও অ্যাডমিনকে পাঠানো হয়েছে
+        logger.info(f"Duplicate withdraw submission ignored for user {user_id} (request {request_id})")
+        return ConversationHandler.END
+    if status is None:
+        await update.effective_chat.send_message("❌ দুঃখিত, বর্তমানে ডেটাবেস সংযোগে সমস্যা হচ্ছে। পরে চেষ্টা করুন।")
+        return ConversationHandler.END
+
+    context.user_data.pop('withdraw_key', None)
 
     await update.effective_chat.send_message(
         f"✅ উত্তোলন অনুরোধ সফল!\nটাকার পরিমাণ: {amount:.2f} টাকা\nওয়ালেট: {wallet_address}\n\nআপনার অনুরোধটি প্রক্রিয়াকরণের জন্য অ্যাডমিনকে পাঠানো হয়েছে। কিছুক্ষণের মধ্যেই আপনি টাকা পেয়ে যাবেন।"
@@ -123,9 +145,11 @@ async def handle_withdraw_wallet(update: Update, context: ContextTypes.DEFAULT_T
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     if ADMIN_ID:
-        await context.bot.send_message(
-            chat_id=ADMIN_ID,
-            text=admin_message,
+        await notify(
+            context.bot,
+            ADMIN_ID,
+            admin_message,
+            digest=('withdraw', f"#{request_id} · {user_id} · {amount:.2f} টাকা · {wallet_address}"),
             reply_markup=reply_markup
         )
     
@@ -142,6 +166,12 @@ async def cancel_withdraw_conversation(update: Update, context: ContextTypes.DEF
     return ConversationHandler.END
 
 # --- অ্যাডমিন অ্যাকশন হ্যান্ডলার ---
+def withdraw_decision_message(request_id, status, amount):
+    """অ্যাডমিনের সিদ্ধান্তের ('completed'/'rejected') পর ইউজারকে পাঠানো মেসেজ।"""
+    if status == 'completed':
+        return f"✅ অভিনন্দন! আপনার উত্তোলন অনুরোধ (ID: {request_id}) সফলভাবে সম্পন্ন হয়েছে। আপনি {amount:.2f} টাকা পেয়েছেন।"
+    return f"❌ দুঃখিত, আপনার উত্তোলন অনুরোধ (ID: {request_id}) বাতিল করা হয়েছে। আপনার {amount:.2f} টাকা অ্যাকাউন্টে ফেরত দেওয়া হয়েছে।"
+
 async def withdraw_admin_action_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -158,23 +188,16 @@ async def withdraw_admin_action_handler(update: Update, context: ContextTypes.DE
         await query.answer("আপনি এই অ্যাকশনের জন্য অনুমোদিত নন।")
         return
 
-    # ডেটাবেস আপডেট করুন
+    # ডেটাবেস আপডেট করুন: স্ট্যাটাস ও লেজার (বাতিল হলে রিফান্ড) এক ট্রানজেকশনে
     new_status = 'completed' if status == 'accept' else 'rejected'
-    success, user_id = update_withdraw_status(request_id, new_status)
-
-    if success:
-        # ইউজারকে নোটিফাই করুন
-        if new_status == 'completed':
-            user_message = f"✅ অভিনন্দন! আপনার উত্তোলন অনুরোধ (ID: {request_id}) সফলভাবে সম্পন্ন হয়েছে। আপনি {amount:.2f} টাকা পেয়েছেন।"
-        else: # rejected
-            user_message = f"❌ দুঃখিত, আপনার উত্তোলন অনুরোধ (ID: {request_id}) বাতিল করা হয়েছে। আপনার {amount:.2f} টাকা অ্যাকাউন্টে ফেরত দেওয়া হয়েছে।"
-            # টাকা ফেরত দেওয়া
-            update_balance(user_id, amount)
-
-        try:
-            await context.bot.send_message(chat_id=user_id, text=user_message)
-        except Exception as e:
-            logger.error(f"Error sending message to user {user_id}: {e}")
+    decided = await review_withdrawals([request_id], new_status)
+
+    if decided is None:
+        await query.message.reply_text("❌ ডেটাবেস সংযোগে সমস্যা হচ্ছে। আবার চেষ্টা করুন।")
+    elif decided:
+        # ইউজারকে নোটিফাই করুন (পরিমাণ ডেটাবেস থেকে, বাটনের ডেটা থেকে নয়)
+        _, user_id, amount = decided[0]
+        await notify(context.bot, user_id, withdraw_decision_message(request_id, new_status, amount))
 
         # অ্যাডমিন মেসেজ আপডেট
         await query.edit_message_text(f"✅ অনুরোধ (ID: {request_id}) সফলভাবে '{new_status}' করা হয়েছে।")
@@ -182,6 +205,84 @@ async def withdraw_admin_action_handler(update: Update, context: ContextTypes.DE
     else:
         await query.edit_message_text(f"ত্রুটি: অনুরোধ (ID: {request_id}) আগে থেকেই প্রক্রিয়াকৃত।")
 
+
+def parse_request_ids(args):
+    """'12 15,16 20-40' ধরনের আর্গুমেন্ট থেকে ক্রমানুসারে ইউনিক request_id; ভুল ফরম্যাটে ValueError।"""
+    ids = set()
+    for token in ",".join(args).split(","):
+        token = token.strip()
+        if not token:
+            continue
+        if "-" in token:
+            start, end = (int(part) for part in token.split("-", 1))
+            if end < start or end - start >= WITHDRAW_BULK_MAX:
+                raise ValueError(token)
+            ids.update(range(start, end + 1))
+        else:
+            ids.add(int(token))
+    return sorted(ids)
+
+
+async def withdraw_bulk_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/withdrawbulk <accept|reject> <ids> — অনেকগুলো অনুরোধ এক ট্রানজেকশনে (কনফার্মের পর)"""
+    if str(update.effective_user.id) != ADMIN_ID:
+        return
+
+    usage = "ব্যবহার: /withdrawbulk <accept|reject> <id, id-id ...>\nযেমন: /withdrawbulk accept 12,15,20-40"
+    if len(context.args) < 2 or context.args[0] not in ('accept', 'reject'):
+        await update.message.reply_text(usage)
+        return
+    try:
+        ids = parse_request_ids(context.args[1:])
+    except ValueError:
+        await update.message.reply_text(usage)
+        return
+    if not ids or len(ids) > WITHDRAW_BULK_MAX:
+        await update.message.reply_text(f"১ থেকে {WITHDRAW_BULK_MAX}টি অনুরোধ দিন।")
+        return
+
+    new_status = 'completed' if context.args[0] == 'accept' else 'rejected'
+    context.user_data['withdraw_bulk'] = {'status': new_status, 'ids': ids}
+    keyboard = [[
+        InlineKeyboardButton(f"⚠️ হ্যাঁ, {len(ids)}টি '{new_status}'", callback_data="wbulk_ok"),
+        InlineKeyboardButton("↩️ না", callback_data="wbulk_cancel"),
+    ]]
+    await update.message.reply_text(
+        f"{len(ids)}টি অনুরোধ (#{ids[0]} … #{ids[-1]}) '{new_status}' করা হবে। পেন্ডিং নয় এমনগুলো বাদ যাবে।",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+
+async def withdraw_bulk_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    if str(query.from_user.id) != ADMIN_ID:
+        await query.answer("আপনি এই অ্যাকশনের জন্য অনুমোদিত নন।")
+        return
+
+    pending = context.user_data.pop('withdraw_bulk', None)
+    if query.data == 'wbulk_cancel' or pending is None:
+        await query.answer()
+        await query.edit_message_text("বাল্ক অ্যাকশন বাতিল করা হলো।" if pending else "এই বাল্ক অ্যাকশনটি আর সক্রিয় নেই।")
+        return
+
+    await query.answer("প্রসেস হচ্ছে...")
+    status, ids = pending['status'], pending['ids']
+    decided = await review_withdrawals(ids, status)
+    if decided is None:
+        await query.edit_message_text("❌ ডেটাবেস সমস্যা — কোনো পরিবর্তন হয়নি।")
+        return
+
+    # ইউজার নোটিফিকেশন থ্রটলড কিউতে যায়; অ্যাডমিনের রিপ্লাই অপেক্ষা করে না
+    for request_id, user_id, amount in decided:
+        await notify(context.bot, user_id, withdraw_decision_message(request_id, status, amount))
+
+    total = sum(amount for _, _, amount in decided)
+    logger.info(f"Admin {query.from_user.id} bulk {status} withdrawals: {len(decided)}/{len(ids)}")
+    await query.edit_message_text(
+        f"✅ {len(decided)}টি অনুরোধ '{status}' করা হয়েছে (মোট {total:.2f} টাকা)।\n"
+        f"বাদ পড়েছে (পেন্ডিং নয়/নেই): {len(ids) - len(decided)}টি"
+    )
+
 # --- ConversationHandler তৈরি ---
 withdraw_conversation_handler = ConversationHandler(
     entry_points=[CommandHandler("withdraw", withdraw_command)],